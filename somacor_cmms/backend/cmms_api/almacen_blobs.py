@@ -0,0 +1,194 @@
+# cmms_api/almacen_blobs.py
+# Almacén de blobs direccionado por contenido (sha256) bajo MEDIA_ROOT
+
+import base64
+import binascii
+import hashlib
+import io
+import os
+import tempfile
+from collections import namedtuple
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    from PIL import Image
+except ImportError:  # Sin Pillow no se generan miniaturas
+    Image = None
+
+BlobGuardado = namedtuple('BlobGuardado', ['ref', 'tamano', 'mime'])
+# Contenido ya escrito en un archivo temporal, pendiente de moverse a su ruta definitiva
+BlobPendiente = namedtuple('BlobPendiente', ['temporal', 'ref', 'tamano', 'mime'])
+
+# Firmas de los formatos de imagen que suben las tablets
+FIRMAS_MIME = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'BM', 'image/bmp'),
+]
+
+TAMANO_BLOQUE = 64 * 1024
+
+# Lado máximo (en píxeles) de las miniaturas que acompañan a los listados
+LADO_MINIATURA = getattr(settings, 'LADO_MINIATURA', 240)
+
+
+def detectar_mime(cabecera, mime_declarado=None):
+    """Detecta el tipo MIME por los primeros bytes, con el declarado como respaldo."""
+    for firma, mime in FIRMAS_MIME:
+        if cabecera.startswith(firma):
+            return mime
+    if cabecera[:4] == b'RIFF' and cabecera[8:12] == b'WEBP':
+        return 'image/webp'
+    return mime_declarado or 'application/octet-stream'
+
+
+class AlmacenBlobs:
+    """
+    Guarda cada blob una sola vez en `<raiz>/<ab>/<cd>/<sha256>`, donde la
+    referencia es el sha256 del contenido. Subir dos veces la misma imagen no
+    ocupa espacio adicional.
+
+    La escritura es en streaming: los bloques se hashean y escriben a un
+    archivo temporal que se renombra atómicamente a su ruta definitiva.
+    """
+
+    def __init__(self, raiz=None):
+        self._raiz = raiz
+
+    @property
+    def raiz(self):
+        return Path(self._raiz or Path(settings.MEDIA_ROOT) / 'blobs')
+
+    def ruta(self, ref):
+        return self.raiz / ref[:2] / ref[2:4] / ref
+
+    def existe(self, ref):
+        return self.ruta(ref).is_file()
+
+    def abrir(self, ref):
+        return open(self.ruta(ref), 'rb')
+
+    def generar_miniatura(self, ref):
+        """
+        Genera (una sola vez, al subir o desde el comando de relleno) una
+        miniatura JPEG del blob y la guarda también en el almacén. Retorna su
+        referencia, o None si el blob no es una imagen que Pillow pueda leer.
+        """
+        if Image is None:
+            return None
+        try:
+            with Image.open(self.ruta(ref)) as imagen:
+                imagen.thumbnail((LADO_MINIATURA, LADO_MINIATURA))
+                if imagen.mode != 'RGB':
+                    imagen = imagen.convert('RGB')
+                salida = io.BytesIO()
+                imagen.save(salida, format='JPEG', quality=70, optimize=True)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            return None
+        return self.guardar([salida.getvalue()], 'image/jpeg').ref
+
+    def guardar(self, bloques, mime=None):
+        """
+        Guarda el contenido recibido como iterable de bloques de bytes y
+        retorna un `BlobGuardado(ref, tamano, mime)`.
+        """
+        pendiente = self.preparar(bloques, mime)
+        return BlobGuardado(self.confirmar(pendiente), pendiente.tamano, pendiente.mime)
+
+    def preparar(self, bloques, mime=None):
+        """
+        Escribe el contenido a un archivo temporal del almacén y retorna un
+        `BlobPendiente`, que no queda visible hasta `confirmar` (o se borra con
+        `descartar`). Lanza `ValueError` si el contenido está vacío.
+        """
+        self.raiz.mkdir(parents=True, exist_ok=True)
+        hasher = hashlib.sha256()
+        tamano = 0
+        cabecera = b''
+
+        descriptor, temporal = tempfile.mkstemp(dir=self.raiz, prefix='.subida-')
+        try:
+            with os.fdopen(descriptor, 'wb') as archivo:
+                for bloque in bloques:
+                    if not bloque:
+                        continue
+                    hasher.update(bloque)
+                    archivo.write(bloque)
+                    tamano += len(bloque)
+                    if len(cabecera) < 16:
+                        cabecera += bloque[:16 - len(cabecera)]
+            if tamano == 0:
+                raise ValueError('El contenido está vacío')
+        except BaseException:
+            os.unlink(temporal)
+            raise
+
+        return BlobPendiente(temporal, hasher.hexdigest(), tamano, detectar_mime(cabecera, mime))
+
+    def confirmar(self, pendiente):
+        """Mueve un `BlobPendiente` a su ruta definitiva y retorna su referencia."""
+        destino = self.ruta(pendiente.ref)
+        if destino.exists():
+            self.descartar(pendiente)
+        else:
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(pendiente.temporal, destino)
+        return pendiente.ref
+
+    def descartar(self, pendiente):
+        """Borra el archivo temporal de un `BlobPendiente` que no se usará."""
+        if os.path.exists(pendiente.temporal):
+            os.unlink(pendiente.temporal)
+
+    def eliminar(self, ref):
+        """Borra un blob confirmado; quien llama verifica que ninguna fila lo referencie."""
+        ruta = self.ruta(ref)
+        if ruta.exists():
+            ruta.unlink()
+
+    def guardar_archivo(self, archivo):
+        """Guarda un `UploadedFile` de Django leyendo sus `chunks()`."""
+        return self.guardar(*self._bloques_archivo(archivo))
+
+    def preparar_archivo(self, archivo):
+        return self.preparar(*self._bloques_archivo(archivo))
+
+    def guardar_base64(self, texto):
+        """
+        Guarda una imagen en Base64, con o sin prefijo `data:<mime>;base64,`.
+        Se decodifica por bloques para no duplicar el contenido en memoria.
+        Lanza `ValueError` si el texto no es Base64 válido o está vacío.
+        """
+        return self.guardar(*self._bloques_base64(texto))
+
+    def preparar_base64(self, texto):
+        return self.preparar(*self._bloques_base64(texto))
+
+    @staticmethod
+    def _bloques_archivo(archivo):
+        return archivo.chunks(TAMANO_BLOQUE), getattr(archivo, 'content_type', None)
+
+    @staticmethod
+    def _bloques_base64(texto):
+        mime = None
+        if texto.startswith('data:'):
+            cabecera, _, texto = texto.partition(',')
+            mime = cabecera[5:].split(';')[0] or None
+        texto = ''.join(texto.split())
+
+        def bloques():
+            paso = TAMANO_BLOQUE // 3 * 4  # múltiplo de 4 caracteres
+            for inicio in range(0, len(texto), paso):
+                try:
+                    yield base64.b64decode(texto[inicio:inicio + paso], validate=True)
+                except binascii.Error as e:
+                    raise ValueError(f'Base64 inválido: {e}')
+
+        return bloques(), mime
+
+
+almacen = AlmacenBlobs()
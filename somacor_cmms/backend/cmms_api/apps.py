@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CmmsApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cmms_api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,189 @@
+# cmms_api/authentication.py
+# Autenticación por token con caché LRU en memoria de proceso, invalidada entre procesos por generaciones
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache as cache_compartida, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from .models import Usuarios
+from .roles import memorizar_rol
+
+# Con una caché de Django en memoria de proceso las generaciones no cruzan
+# workers: una revocación en uno no llega a los demás, así que las entradas
+# duran a lo más este plazo
+TTL_CACHE_LOCAL = getattr(settings, 'CACHE_TOKENS_TTL_LOCAL', 5)
+
+
+class CacheTokens:
+    """
+    LRU acotado con TTL: clave del token -> (usuario, token, nombre del rol).
+
+    Las entradas viven en la memoria del proceso, pero cada una guarda la
+    generación de su usuario (y la global) leída de la caché compartida de
+    Django. Invalidar incrementa esa generación, así que en los demás
+    procesos la entrada deja de ser válida en su siguiente lectura. Para
+    que esto cruce procesos (varios workers de gunicorn), la caché de Django
+    debe ser compartida (Redis, Memcached o base de datos); con LocMemCache
+    el TTL se acorta a `TTL_CACHE_LOCAL`.
+
+    Lleva contadores de aciertos, fallos y expulsiones para monitoreo.
+    """
+    PREFIJO = 'auth:tokens:generacion'
+
+    def __init__(self, maximo=10000, ttl=300, cache=None, ttl_local=TTL_CACHE_LOCAL):
+        self.maximo = maximo
+        self._ttl = ttl
+        self.ttl_local = ttl_local
+        self.cache = cache if cache is not None else cache_compartida
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+
+    @property
+    def ttl(self):
+        backend = caches['default'] if self.cache is cache_compartida else self.cache
+        if isinstance(backend, (LocMemCache, DummyCache)):
+            return min(self._ttl, self.ttl_local)
+        return self._ttl
+
+    def _claves_generacion(self, user_id):
+        return f'{self.PREFIJO}:todos', f'{self.PREFIJO}:usuario:{user_id}'
+
+    def _generacion(self, user_id):
+        claves = self._claves_generacion(user_id)
+        valores = self.cache.get_many(claves)
+        for clave in claves:
+            if clave not in valores:
+                # Un valor inicial único: si la clave se pierde, las entradas previas dejan de coincidir
+                self.cache.add(clave, time.time_ns(), timeout=None)
+                valores[clave] = self.cache.get(clave)
+        return tuple(valores[clave] for clave in claves)
+
+    def _incrementar(self, clave):
+        try:
+            self.cache.incr(clave)
+        except ValueError:
+            self.cache.set(clave, time.time_ns(), timeout=None)
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+        if entrada is not None and entrada[1] >= time.monotonic() and \
+                entrada[2] == self._generacion(entrada[0][0].pk):
+            with self._lock:
+                if clave in self._datos:
+                    self._datos.move_to_end(clave)
+                self.aciertos += 1
+            return entrada[0]
+
+        with self._lock:
+            if entrada is not None and self._datos.get(clave) is entrada:
+                del self._datos[clave]
+            self.fallos += 1
+        return None
+
+    def guardar(self, clave, valor):
+        generacion = self._generacion(valor[0].pk)
+        with self._lock:
+            self._datos[clave] = (valor, time.monotonic() + self.ttl, generacion)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+                self.expulsiones += 1
+
+    def invalidar(self, clave):
+        """Quita un token sólo de este proceso; para revocarlo en todos use `invalidar_usuario`."""
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def invalidar_usuario(self, user_id):
+        clave = self._claves_generacion(user_id)[1]
+        self._incrementar(clave)
+        # Otra vez al confirmar: un proceso que leyó el usuario antes del commit no debe guardarlo como vigente
+        transaction.on_commit(lambda: self._incrementar(clave))
+        with self._lock:
+            claves = [c for c, (valor, _, _) in self._datos.items() if valor[0].pk == user_id]
+            for clave in claves:
+                del self._datos[clave]
+
+    def limpiar(self):
+        clave = self._claves_generacion(None)[0]
+        self._incrementar(clave)
+        transaction.on_commit(lambda: self._incrementar(clave))
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._datos),
+                'maximo': self.maximo,
+                'ttl_segundos': self.ttl,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'expulsiones': self.expulsiones,
+                'tasa_aciertos': round(self.aciertos / consultas * 100, 2) if consultas else 0,
+            }
+
+
+cache_tokens = CacheTokens(
+    maximo=getattr(settings, 'CACHE_TOKENS_MAXIMO', 10000),
+    ttl=getattr(settings, 'CACHE_TOKENS_TTL', 300),
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    `TokenAuthentication` que evita consultar `authtoken_token` y `auth_user`
+    en cada request. En un fallo de caché resuelve token, usuario y rol con
+    una sola consulta; el rol queda memoizado en el request para los permisos.
+
+    Las señales invalidan las entradas del usuario, en todos los procesos,
+    al borrar su token (logout) y al modificar o desactivar el usuario o su
+    rol.
+    """
+
+    def authenticate(self, request):
+        resultado = super().authenticate(request)
+        if resultado is not None:
+            memorizar_rol(request, resultado[0]._cmms_nombre_rol)
+        return resultado
+
+    def authenticate_credentials(self, key):
+        entrada = cache_tokens.obtener(key)
+        if entrada is None:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user', 'user__usuarios__idrol').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+            try:
+                nombre_rol = token.user.usuarios.idrol.nombrerol
+            except Usuarios.DoesNotExist:
+                nombre_rol = None
+
+            entrada = (token.user, token, nombre_rol)
+            if token.user.is_active:
+                cache_tokens.guardar(key, entrada)
+
+        user, token, nombre_rol = entrada
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        # Cada request recibe su propia copia para no compartir estado entre hilos
+        user = copy.copy(user)
+        user._cmms_nombre_rol = nombre_rol
+        return (user, token)
@@ -0,0 +1,95 @@
+# cmms_api/cache_plantillas.py
+# Caché versionada de plantillas de checklist pre-serializadas por tipo de equipo
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .models import ChecklistTemplate
+from .serializers import ChecklistTemplateSerializer
+
+PREFIJO = 'checklist_templates'
+TIMEOUT = getattr(settings, 'CACHE_PLANTILLAS_TIMEOUT', 60 * 60 * 24)
+# Con una caché en memoria de proceso, la invalidación sólo llega al proceso
+# que guardó el cambio: los demás ven la plantilla nueva al vencer este plazo
+TIMEOUT_CACHE_LOCAL = getattr(settings, 'CACHE_PLANTILLAS_TIMEOUT_LOCAL', 60)
+
+
+def _timeout():
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend.endswith('LocMemCache'):
+        return min(TIMEOUT, TIMEOUT_CACHE_LOCAL)
+    return TIMEOUT
+
+
+def _leer_version(clave):
+    version = cache.get(clave)
+    if version is None:
+        # `add` sólo escribe si la clave no existe, así que es seguro entre procesos
+        cache.add(clave, 1, timeout=None)
+        version = cache.get(clave, 1)
+    return version
+
+
+def _incrementar_version(clave):
+    try:
+        cache.incr(clave)
+    except ValueError:
+        # La clave no existía (o fue expulsada): cualquier valor nuevo invalida
+        cache.set(clave, 2, timeout=None)
+
+
+def _clave_snapshot(tipo_equipo_id):
+    generacion = _leer_version(f'{PREFIJO}:generacion')
+    version = _leer_version(f'{PREFIJO}:version:{tipo_equipo_id}')
+    return f'{PREFIJO}:snapshot:{generacion}:{tipo_equipo_id}:{version}'
+
+
+def obtener_snapshot(tipo_equipo_id):
+    """
+    Retorna el snapshot de las plantillas activas de un tipo de equipo como un
+    diccionario {'etag': str, 'templates': list}.
+
+    Las claves incluyen la versión del tipo de equipo, de modo que invalidar
+    consiste en incrementar un contador: los snapshots anteriores dejan de
+    leerse y expiran solos. Con un backend compartido (Redis, Memcached) la
+    invalidación llega a todos los procesos; con LocMemCache el snapshot dura
+    a lo más `TIMEOUT_CACHE_LOCAL` segundos.
+    """
+    clave = _clave_snapshot(tipo_equipo_id)
+    snapshot = cache.get(clave)
+    if snapshot is None:
+        templates = ChecklistTemplate.objects.filter(
+            tipo_equipo_id=tipo_equipo_id,
+            activo=True
+        ).select_related('tipo_equipo').prefetch_related('categories__items')
+
+        contenido = json.dumps(
+            ChecklistTemplateSerializer(templates, many=True).data,
+            sort_keys=True
+        )
+        snapshot = {
+            'etag': hashlib.sha1(contenido.encode('utf-8')).hexdigest(),
+            'templates': json.loads(contenido)
+        }
+        cache.set(clave, snapshot, timeout=_timeout())
+    return snapshot
+
+
+def _invalidar(clave):
+    _incrementar_version(clave)
+    # Otra vez al confirmar: un request concurrente pudo reconstruir el snapshot
+    # con los datos previos al commit bajo la versión nueva
+    transaction.on_commit(lambda: _incrementar_version(clave))
+
+
+def invalidar_tipo_equipo(tipo_equipo_id):
+    """Invalida el snapshot de un tipo de equipo."""
+    _invalidar(f'{PREFIJO}:version:{tipo_equipo_id}')
+
+
+def invalidar_todo():
+    """Invalida los snapshots de todos los tipos de equipo."""
+    _invalidar(f'{PREFIJO}:generacion')
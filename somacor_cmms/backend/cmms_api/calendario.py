@@ -0,0 +1,142 @@
+# cmms_api/calendario.py
+# Feed de eventos del calendario: proyección con values(), filtro por solapamiento y JSON en streaming
+
+import datetime
+import heapq
+import json
+from itertools import chain, islice
+from operator import itemgetter
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import Agendas
+from .recurrencia import Q_RECURRENTE, ocurrencias_en_rango
+
+CAMPOS_CALENDARIO = (
+    'idagenda', 'tituloevento', 'fechahorainicio', 'fechahorafin', 'descripcionevento',
+    'colorevento', 'esdiacompleto', 'tipoevento', 'idequipo__nombreequipo', 'idordentrabajo__numeroot'
+)
+# Sobre esta cantidad de eventos la respuesta se entrega en streaming
+EVENTOS_SIN_STREAMING = 1000
+TAMANO_LOTE_STREAMING = 2000
+
+
+def interpretar_fecha(valor):
+    """
+    Interpreta un parámetro `start` / `end` como fecha (inicio del día local)
+    o fecha y hora ISO 8601. Lanza `ValueError` si no es ninguna de las dos.
+    """
+    # En una URL sin codificar el '+' de la zona horaria llega como espacio
+    valor = valor.strip().replace(' ', '+')
+    fecha_hora = parse_datetime(valor)
+    if fecha_hora is None:
+        fecha = parse_date(valor)
+        if fecha is None:
+            raise ValueError(f'Fecha inválida: {valor}')
+        fecha_hora = datetime.datetime.combine(fecha, datetime.time.min)
+    if timezone.is_naive(fecha_hora):
+        fecha_hora = timezone.make_aware(fecha_hora)
+    return fecha_hora
+
+
+def _filtrar(eventos, tecnico_id, faena_id, equipo_id):
+    if tecnico_id is not None:
+        eventos = eventos.filter(
+            Q(idusuarioasignado_id=tecnico_id) | Q(idordentrabajo__idtecnicoasignado_id=tecnico_id)
+        )
+    if faena_id is not None:
+        eventos = eventos.filter(idequipo__idfaenaactual_id=faena_id)
+    if equipo_id is not None:
+        eventos = eventos.filter(idequipo_id=equipo_id)
+    return eventos
+
+
+def eventos_calendario(inicio=None, fin=None, tecnico_id=None, faena_id=None, equipo_id=None):
+    """
+    Eventos no recurrentes que se solapan con [inicio, fin) como
+    diccionarios de `values()` con los nombres de equipo y OT ya unidos,
+    ordenados por inicio.
+
+    Un evento se incluye si empieza antes de `fin` y termina después de
+    `inicio`, así que también aparecen los que cruzan los bordes del rango.
+    El técnico puede ser el asignado al evento o el de su OT.
+    """
+    eventos = Agendas.objects.exclude(Q_RECURRENTE)
+    if fin is not None:
+        eventos = eventos.filter(fechahorainicio__lt=fin)
+    if inicio is not None:
+        eventos = eventos.filter(fechahorafin__gt=inicio)
+    eventos = _filtrar(eventos, tecnico_id, faena_id, equipo_id)
+    return eventos.order_by('fechahorainicio', 'idagenda').values(*CAMPOS_CALENDARIO)
+
+
+def ocurrencias_calendario(inicio=None, fin=None, tecnico_id=None, faena_id=None, equipo_id=None):
+    """
+    Ocurrencias de los eventos recurrentes que se solapan con [inicio, fin),
+    con los mismos filtros y campos que `eventos_calendario` más
+    `ocurrencia` (inicio original según la regla), ordenadas por inicio.
+    Se calculan desde la regla de cada evento; no se guardan.
+    """
+    eventos = Agendas.objects.filter(Q_RECURRENTE)
+    if fin is not None:
+        # La regla puede seguir generando ocurrencias: solo se descartan los que empiezan después
+        eventos = eventos.filter(fechahorainicio__lt=fin)
+    eventos = _filtrar(eventos, tecnico_id, faena_id, equipo_id)
+    return ocurrencias_en_rango(
+        eventos.values(*CAMPOS_CALENDARIO, 'reglarecursividad'), inicio, fin
+    )
+
+
+def formato_evento(fila):
+    """Evento en el formato de FullCalendar."""
+    evento = {
+        'id': fila['idagenda'],
+        'title': fila['tituloevento'],
+        'start': fila['fechahorainicio'].isoformat(),
+        'end': fila['fechahorafin'].isoformat(),
+        'description': fila['descripcionevento'],
+        'color': fila['colorevento'],
+        'allDay': fila['esdiacompleto'],
+        'extendedProps': {
+            'equipo': fila['idequipo__nombreequipo'],
+            'tipo': fila['tipoevento'],
+            'orden_trabajo': fila['idordentrabajo__numeroot']
+        }
+    }
+    if 'ocurrencia' in fila:
+        # Identifica la ocurrencia al crear una excepción (POST agendas/<id>/excepciones/)
+        evento['extendedProps']['ocurrencia'] = fila['ocurrencia'].isoformat()
+    return evento
+
+
+def _json_en_streaming(eventos):
+    codificador = json.JSONEncoder(ensure_ascii=False)
+    yield '['
+    separador = ''
+    while True:
+        lote = list(islice(eventos, TAMANO_LOTE_STREAMING))
+        if not lote:
+            break
+        # Un encode por lote (sin los corchetes) es más rápido que uno por evento
+        yield separador + codificador.encode(lote)[1:-1]
+        separador = ','
+    yield ']'
+
+
+def feed_calendario(filas, ocurrencias=()):
+    """
+    Aplica `formato_evento` a las filas, intercaladas por inicio con las
+    `ocurrencias` de eventos recurrentes, y decide cómo entregarlas. Retorna
+    (lista, None) si son pocas, o (None, generador de JSON) si superan
+    `EVENTOS_SIN_STREAMING`. El queryset se recorre una sola vez con un
+    iterador, sin cargar todo el rango en memoria.
+    """
+    filas = filas.iterator(chunk_size=TAMANO_LOTE_STREAMING)
+    if ocurrencias:
+        filas = heapq.merge(filas, ocurrencias, key=itemgetter('fechahorainicio'))
+    eventos = map(formato_evento, filas)
+    primeros = list(islice(eventos, EVENTOS_SIN_STREAMING + 1))
+    if len(primeros) <= EVENTOS_SIN_STREAMING:
+        return primeros, None
+    return None, _json_en_streaming(chain(primeros, eventos))
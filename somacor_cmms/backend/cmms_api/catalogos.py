@@ -0,0 +1,83 @@
+# cmms_api/catalogos.py
+# Registro en memoria de los catálogos pequeños que usan los flujos de OT
+
+import threading
+import time
+
+from django.conf import settings
+from .models import EstadosOrdenTrabajo, TiposMantenimientoOT
+
+# Segundos que un proceso reutiliza el catálogo cargado. Las ediciones lo
+# invalidan de inmediato en el proceso que las hace (ver signals.py).
+TTL_CATALOGOS = getattr(settings, 'CACHE_CATALOGOS_TTL', 300)
+
+
+class RegistroCatalogo:
+    """
+    Carga una tabla de catálogo completa con una sola consulta y resuelve los
+    registros por nombre en memoria.
+
+    Si un nombre no existe se crea con `get_or_create` (seguro ante creaciones
+    concurrentes gracias a la restricción UNIQUE del nombre) usando la
+    descripción por defecto registrada para ese nombre.
+    """
+
+    def __init__(self, modelo, campo_nombre, descripciones):
+        self.modelo = modelo
+        self.campo_nombre = campo_nombre
+        self.descripciones = descripciones
+        self._por_nombre = None
+        self._expira = 0
+        self._lock = threading.Lock()
+
+    def _cargados(self):
+        with self._lock:
+            if self._por_nombre is None or self._expira < time.monotonic():
+                self._por_nombre = {
+                    getattr(registro, self.campo_nombre): registro
+                    for registro in self.modelo.objects.all()
+                }
+                self._expira = time.monotonic() + TTL_CATALOGOS
+            return self._por_nombre
+
+    def obtener(self, nombre):
+        """Retorna el registro con ese nombre, creándolo si todavía no existe."""
+        registro = self._cargados().get(nombre)
+        if registro is None:
+            # La señal post_save invalida el registro y la próxima lectura lo recarga
+            registro, _ = self.modelo.objects.get_or_create(
+                **{self.campo_nombre: nombre},
+                defaults={'descripcion': self.descripciones.get(nombre)}
+            )
+        return registro
+
+    def id(self, nombre):
+        return self.obtener(nombre).pk
+
+    def nombres(self):
+        """Nombres de todos los registros cargados, sin crear ninguno."""
+        return list(self._cargados())
+
+    def invalidar(self):
+        with self._lock:
+            self._por_nombre = None
+
+
+estados_ot = RegistroCatalogo(EstadosOrdenTrabajo, 'nombreestadoot', {
+    'Abierta': 'OT recién creada.',
+    'Asignada': 'OT asignada a un técnico.',
+    'En Progreso': 'OT en ejecución.',
+    'Completada': 'Orden de trabajo completada exitosamente.',
+    'Cancelada': 'OT cancelada.',
+})
+
+tipos_mantenimiento_ot = RegistroCatalogo(TiposMantenimientoOT, 'nombretipomantenimientoot', {
+    'Preventivo': 'Mantenimiento planificado.',
+    'Correctivo': 'Mantenimiento por falla no planificada.',
+    'Predictivo': 'Mantenimiento basado en condición.',
+})
+
+
+def invalidar_catalogos():
+    estados_ot.invalidar()
+    tipos_mantenimiento_ot.invalidar()
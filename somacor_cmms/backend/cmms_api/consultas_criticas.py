@@ -0,0 +1,95 @@
+# cmms_api/consultas_criticas.py
+# Consultas de ventana de tiempo del dashboard, calendario y reportes, con el
+# índice compuesto que cada una debe usar. Las comparten el test de EXPLAIN
+# y el comando `medir_consultas`.
+
+import datetime
+from collections import namedtuple
+
+from django.db.models import Count
+from django.utils import timezone
+from .models import OrdenesTrabajo, Agendas, ChecklistInstance, ChecklistAnswer
+
+ConsultaCritica = namedtuple('ConsultaCritica', ['nombre', 'queryset', 'indice'])
+
+
+def rango_dias(desde, hasta):
+    """
+    Rango [inicio, fin) en datetimes locales que cubre los días `desde`..`hasta`.
+    Equivale a `campo__date__range` pero sin envolver la columna en una función,
+    de modo que la base de datos puede usar el índice.
+    """
+    inicio = timezone.make_aware(datetime.datetime.combine(desde, datetime.time.min))
+    fin = timezone.make_aware(datetime.datetime.combine(hasta + datetime.timedelta(days=1), datetime.time.min))
+    return inicio, fin
+
+
+def consultas_criticas(equipo_id=None, plan_id=None, hoy=None):
+    """Retorna la lista de `ConsultaCritica` parametrizada con datos reales de la base."""
+    hoy = hoy or timezone.localdate()
+    if equipo_id is None:
+        equipo_id = OrdenesTrabajo.objects.order_by('pk').values_list('idequipo', flat=True).first() or 0
+    if plan_id is None:
+        plan_id = Agendas.objects.filter(idplanmantenimiento__isnull=False).order_by('pk').values_list(
+            'idplanmantenimiento', flat=True
+        ).first() or 0
+    inicio_semana, fin_semana = rango_dias(hoy, hoy + datetime.timedelta(days=7))
+    inicio_mes, fin_mes = rango_dias(hoy - datetime.timedelta(days=30), hoy)
+
+    return [
+        ConsultaCritica(
+            'dashboard_ots_vencidas',
+            OrdenesTrabajo.objects.filter(
+                fechaejecucion__lt=hoy,
+                idestadoot__nombreestadoot__in=['Abierta', 'Asignada']
+            ).order_by(),
+            'ot_estado_fejecucion_idx'
+        ),
+        ConsultaCritica(
+            'historial_ots_equipo',
+            OrdenesTrabajo.objects.filter(idequipo_id=equipo_id).order_by('-fechacreacionot')[:50],
+            'ot_equipo_fcreacion_idx'
+        ),
+        ConsultaCritica(
+            'dashboard_mantenimientos_proximos',
+            Agendas.objects.filter(
+                tipoevento='Mantenimiento Preventivo',
+                fechahorainicio__gte=inicio_semana,
+                fechahorainicio__lt=fin_semana
+            ).order_by(),
+            'agenda_tipo_inicio_idx'
+        ),
+        ConsultaCritica(
+            'calendario_eventos_plan',
+            Agendas.objects.filter(
+                idequipo_id=equipo_id,
+                idplanmantenimiento_id=plan_id,
+                fechahorainicio__gte=inicio_mes,
+                fechahorainicio__lt=fin_semana
+            ).order_by(),
+            'agenda_equipo_plan_ini_idx'
+        ),
+        ConsultaCritica(
+            'calendario_rango',
+            Agendas.objects.filter(
+                fechahorainicio__lt=fin_semana,
+                fechahorafin__gt=inicio_mes
+            ).order_by('fechahorainicio'),
+            'agenda_inicio_fin_idx'
+        ),
+        ConsultaCritica(
+            'checklists_equipo_periodo',
+            ChecklistInstance.objects.filter(
+                equipo_id=equipo_id,
+                fecha_inspeccion__range=[hoy - datetime.timedelta(days=30), hoy]
+            ).order_by(),
+            'chkinst_equipo_fecha_idx'
+        ),
+        ConsultaCritica(
+            'reporte_fallas_por_item',
+            ChecklistAnswer.objects.filter(estado='malo').order_by().values('item').annotate(
+                total=Count('id_answer')
+            ),
+            'chkans_estado_item_idx'
+        ),
+    ]
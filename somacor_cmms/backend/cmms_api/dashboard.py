@@ -0,0 +1,178 @@
+# cmms_api/dashboard.py
+# Snapshot del dashboard de mantenimiento: agregación condicional y caché compartida por secciones
+
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from .models import EstadosEquipo, TiposMantenimientoOT, Agendas
+from .consultas_criticas import rango_dias
+from .recurrencia import Q_RECURRENTE, CAMPOS_RECURRENCIA, ocurrencias_en_rango
+
+PREFIJO = 'dashboard'
+# Segundos que se reutiliza una sección aunque nadie la invalide (cambios
+# hechos con update() o bulk_update() no disparan señales)
+TTL = getattr(settings, 'CACHE_DASHBOARD_TTL', 60)
+# Mientras un proceso recalcula una sección, los demás sirven la copia anterior
+BLOQUEO_RECALCULO = 30
+
+ESTADOS_OT_ABIERTOS = ['Abierta', 'Asignada']
+DIAS_MANTENIMIENTOS_PROXIMOS = 7
+
+
+def _equipos(hoy):
+    """Equipos por estado, activos y operativos: una consulta."""
+    estados = list(
+        EstadosEquipo.objects.annotate(
+            cantidad=Count('equipos'),
+            activos=Count('equipos', filter=Q(equipos__activo=True))
+        ).order_by('nombreestado').values('nombreestado', 'cantidad', 'activos')
+    )
+    return {
+        'total_equipos': sum(estado['activos'] for estado in estados),
+        'equipos_operativos': sum(
+            estado['activos'] for estado in estados if estado['nombreestado'] == 'Operativo'
+        ),
+        'equipos_por_estado': [
+            {'nombreestado': estado['nombreestado'], 'cantidad': estado['cantidad']} for estado in estados
+        ],
+    }
+
+
+def _ordenes(hoy):
+    """OTs por tipo, abiertas y vencidas: una consulta agrupada por tipo."""
+    abiertas = Q(ordenestrabajo__idestadoot__nombreestadoot__in=ESTADOS_OT_ABIERTOS)
+    tipos = list(
+        TiposMantenimientoOT.objects.annotate(
+            cantidad=Count('ordenestrabajo'),
+            abiertas=Count('ordenestrabajo', filter=abiertas),
+            vencidas=Count('ordenestrabajo', filter=abiertas & Q(ordenestrabajo__fechaejecucion__lt=hoy))
+        ).order_by('nombretipomantenimientoot').values(
+            'nombretipomantenimientoot', 'cantidad', 'abiertas', 'vencidas'
+        )
+    )
+    return {
+        'ots_abiertas': sum(tipo['abiertas'] for tipo in tipos),
+        'ots_vencidas': sum(tipo['vencidas'] for tipo in tipos),
+        'ots_por_tipo': [
+            {'nombretipomantenimientoot': tipo['nombretipomantenimientoot'], 'cantidad': tipo['cantidad']}
+            for tipo in tipos
+        ],
+    }
+
+
+def _agenda(hoy):
+    """
+    Mantenimientos preventivos que empiezan en los próximos días: una
+    consulta (más la de excepciones si hay eventos recurrentes). Los
+    recurrentes cuentan una vez por cada ocurrencia del rango.
+    """
+    inicio, fin = rango_dias(hoy, hoy + datetime.timedelta(days=DIAS_MANTENIMIENTOS_PROXIMOS))
+    eventos = list(
+        Agendas.objects.filter(tipoevento='Mantenimiento Preventivo').filter(
+            Q(Q_RECURRENTE, fechahorainicio__lt=fin)
+            | Q(~Q_RECURRENTE, fechahorainicio__gte=inicio, fechahorainicio__lt=fin)
+        ).order_by().values(*CAMPOS_RECURRENCIA, 'recursivo')
+    )
+    recurrentes = [
+        evento for evento in eventos if evento['recursivo'] and (evento['reglarecursividad'] or '').strip()
+    ]
+    return {
+        'mantenimientos_proximos': len(eventos) - len(recurrentes) + sum(
+            1 for ocurrencia in ocurrencias_en_rango(recurrentes, inicio, fin)
+            if ocurrencia['fechahorainicio'] >= inicio
+        ),
+    }
+
+
+# Cada sección se invalida por separado: guardar una OT no recalcula los equipos
+SECCIONES = {
+    'equipos': _equipos,
+    'ordenes': _ordenes,
+    'agenda': _agenda,
+}
+
+
+def _version(seccion):
+    clave = f'{PREFIJO}:version:{seccion}'
+    version = cache.get(clave)
+    if version is None:
+        # `add` sólo escribe si la clave no existe, así que es seguro entre procesos
+        cache.add(clave, 1, timeout=None)
+        version = cache.get(clave, 1)
+    return version
+
+
+def _incrementar_versiones(secciones):
+    for seccion in secciones:
+        clave = f'{PREFIJO}:version:{seccion}'
+        try:
+            cache.incr(clave)
+        except ValueError:
+            cache.set(clave, 2, timeout=None)
+
+
+def invalidar(*secciones):
+    """
+    Invalida las secciones indicadas (por defecto todas) del snapshot, ahora
+    y otra vez al confirmar la transacción: una sección recalculada antes del
+    commit con los datos previos no se sirve después.
+    """
+    secciones = secciones or SECCIONES
+    _incrementar_versiones(secciones)
+    transaction.on_commit(lambda: _incrementar_versiones(secciones))
+
+
+def _seccion(seccion, hoy):
+    clave = f'{PREFIJO}:{seccion}:{hoy.isoformat()}'
+    version = _version(seccion)
+    guardada = cache.get(clave)
+    if guardada is not None and guardada['version'] == version and guardada['expira'] > timezone.now():
+        return guardada['datos']
+
+    # Un solo proceso recalcula; los demás usan la copia anterior si la hay
+    bloqueo = f'{clave}:recalculando'
+    bloqueado = cache.add(bloqueo, 1, timeout=BLOQUEO_RECALCULO)
+    if not bloqueado and guardada is not None:
+        return guardada['datos']
+    try:
+        datos = SECCIONES[seccion](hoy)
+        cache.set(clave, {
+            'version': version,
+            'expira': timezone.now() + datetime.timedelta(seconds=TTL),
+            'datos': datos,
+        }, timeout=24 * 60 * 60)
+    finally:
+        if bloqueado:
+            cache.delete(bloqueo)
+    return datos
+
+
+def snapshot_dashboard(hoy=None):
+    """
+    Retorna los indicadores del dashboard de mantenimiento con la forma de
+    la respuesta de `MantenimientoWorkflowViewSet.dashboard`.
+
+    Cada sección (equipos, OTs, agenda) se calcula con agregación condicional
+    en una consulta y se guarda en la caché de Django, compartida por todos
+    los supervisores, hasta que una señal la invalida o pasa `TTL`.
+    """
+    hoy = hoy or timezone.localdate()
+    datos = {}
+    for seccion in SECCIONES:
+        datos.update(_seccion(seccion, hoy))
+
+    return {
+        'estadisticas_generales': {
+            'total_equipos': datos['total_equipos'],
+            'equipos_operativos': datos['equipos_operativos'],
+            'ots_abiertas': datos['ots_abiertas'],
+            'ots_vencidas': datos['ots_vencidas'],
+            'mantenimientos_proximos': datos['mantenimientos_proximos']
+        },
+        'equipos_por_estado': datos['equipos_por_estado'],
+        'ots_por_tipo': datos['ots_por_tipo']
+    }
@@ -0,0 +1,135 @@
+# cmms_api/datos_prueba.py
+# Datos y utilidades compartidos por las pruebas de cmms_api
+
+import base64
+import datetime
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.test import override_settings
+from django.contrib.auth.models import User
+from .models import (
+    ActividadesOrdenTrabajo, ChecklistAnswer, ChecklistCategory, ChecklistInstance, ChecklistItem,
+    ChecklistTemplate, Equipos, EstadosEquipo, EstadosOrdenTrabajo, Faenas, OrdenesTrabajo,
+    PlanesMantenimiento, TareasEstandar, TiposEquipo, TiposMantenimientoOT, TiposTarea
+)
+
+
+class MediaTemporalMixin:
+    """Redirige MEDIA_ROOT (y por lo tanto el almacén de blobs) a un directorio temporal"""
+
+    def usar_media_temporal(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        ajuste = override_settings(MEDIA_ROOT=self.media_root)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+    def archivos_blobs(self):
+        """Nombres de los archivos del almacén, incluidos los temporales de subida."""
+        return sorted(p.name for p in Path(self.media_root, 'blobs').rglob('*') if p.is_file())
+
+
+class ChecklistDatosMixin:
+    """Crea un equipo con una plantilla de checklist (ítems críticos y no críticos)"""
+
+    def crear_datos_checklist(self, cantidad_items=4):
+        self.user = User.objects.create_user(username='operador', password='testpass')
+        self.tipo_equipo = TiposEquipo.objects.create(nombretipo="Minicargador")
+        self.estado_equipo = EstadosEquipo.objects.create(nombreestado="Operativo")
+        self.faena = Faenas.objects.create(nombrefaena="Faena Norte")
+        self.equipo = Equipos.objects.create(
+            nombreequipo="Minicargador 1",
+            codigointerno="MC-001",
+            idtipoequipo=self.tipo_equipo,
+            idestadoactual=self.estado_equipo,
+            idfaenaactual=self.faena
+        )
+        self.template = ChecklistTemplate.objects.create(
+            nombre="Check List Minicargador",
+            tipo_equipo=self.tipo_equipo
+        )
+        self.category = ChecklistCategory.objects.create(template=self.template, nombre="Motor", orden=1)
+        self.items = [
+            ChecklistItem.objects.create(
+                category=self.category,
+                texto=f"Ítem {i}",
+                es_critico=(i % 2 == 0),
+                orden=i
+            )
+            for i in range(cantidad_items)
+        ]
+
+    def crear_instancia(self, estados, equipo=None, fecha=None):
+        instance = ChecklistInstance.objects.create(
+            template=self.template,
+            equipo=equipo or self.equipo,
+            operador=self.user,
+            fecha_inspeccion=fecha or datetime.date.today(),
+            horometro_inspeccion=1000
+        )
+        ChecklistAnswer.objects.bulk_create([
+            ChecklistAnswer(instance=instance, item=item, estado=estado)
+            for item, estado in zip(self.items, estados)
+        ])
+        instance.actualizar_resumen()
+        return instance
+
+
+class OrdenesTrabajoDatosMixin(ChecklistDatosMixin):
+    """Agrega catálogos de OT, un plan y una tarea estándar al equipo de prueba"""
+
+    def crear_datos_ot(self):
+        self.crear_datos_checklist()
+        self.tecnico = User.objects.create_user(username='tecnico', first_name='Juan', last_name='Pérez')
+        self.estado_abierta = EstadosOrdenTrabajo.objects.create(nombreestadoot='Abierta')
+        self.tipo_preventivo = TiposMantenimientoOT.objects.create(nombretipomantenimientoot='Preventivo')
+        self.plan = PlanesMantenimiento.objects.create(nombreplan='Plan 250h', idtipoequipo=self.tipo_equipo)
+        self.tarea = TareasEstandar.objects.create(
+            nombretarea='Cambio de aceite',
+            idtipotarea=TiposTarea.objects.create(nombretipotarea='Lubricación')
+        )
+        self.numero_ot = 0
+
+    def crear_ot(self, cantidad_actividades=2, **extra):
+        self.numero_ot += 1
+        datos = {
+            'numeroot': f'OT-TEST-{self.numero_ot:04d}',
+            'idequipo': self.equipo,
+            'idplanorigen': self.plan,
+            'idtipomantenimientoot': self.tipo_preventivo,
+            'idestadoot': self.estado_abierta,
+            'idsolicitante': self.user,
+            'idtecnicoasignado': self.tecnico,
+        }
+        datos.update(extra)
+        orden = OrdenesTrabajo.objects.create(**datos)
+        ActividadesOrdenTrabajo.objects.bulk_create([
+            ActividadesOrdenTrabajo(
+                idordentrabajo=orden,
+                idtareaestandar=self.tarea,
+                secuencia=i,
+                descripcionactividad=f'Actividad {i}',
+                idtecnicoejecutor=self.tecnico
+            )
+            for i in range(cantidad_actividades)
+        ])
+        return orden
+
+
+PNG_1PX = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=='
+)
+
+
+def vencimientos_iterativos(horometro, intervalo, tasa, dias_horizonte):
+    """Versión de referencia del cálculo original, un vencimiento por iteración."""
+    horas_hasta_proximo = intervalo - horometro % intervalo
+    if horas_hasta_proximo == intervalo:
+        horas_hasta_proximo = 0
+    resultado = []
+    while int(horas_hasta_proximo / tasa) <= dias_horizonte:
+        resultado.append(int(horas_hasta_proximo / tasa))
+        horas_hasta_proximo += intervalo
+    return resultado
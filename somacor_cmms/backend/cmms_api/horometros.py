@@ -0,0 +1,129 @@
+# cmms_api/horometros.py
+# Historial de lecturas de horómetro y estimación de la tasa de uso de cada equipo
+
+import datetime
+from itertools import groupby, islice
+from operator import itemgetter
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from .models import Equipos, HistorialHorometro
+
+# Ventana (en días, hacia atrás desde la última lectura) de la regresión
+VENTANA_TASA_DIAS = getattr(settings, 'VENTANA_TASA_USO_DIAS', 90)
+MAXIMO_LECTURAS_TASA = 60
+# Con menos de un día entre la primera y la última lectura la pendiente no es confiable
+DIAS_MINIMOS_TASA = 1
+TASA_MAXIMA = 24.0
+
+
+def estimar_tasa_uso(lecturas, ventana_dias=VENTANA_TASA_DIAS):
+    """
+    Estima la tasa de uso de un equipo (horas de operación por día) con una
+    regresión lineal sobre las lecturas de la ventana que termina en la más
+    reciente. `lecturas` es un iterable de pares (fecha, horometro).
+
+    Las lecturas que repiten el valor de la anterior se descartan: suelen ser
+    copias del horómetro del equipo (p. ej. en OTs automáticas) y no una
+    medición nueva. Retorna None si no hay datos suficientes o si la pendiente
+    no es positiva (p. ej. tras un cambio de horómetro).
+    """
+    lecturas = sorted(lecturas)
+    if len(lecturas) < 2:
+        return None
+
+    ultima = lecturas[-1][0]
+    dias = np.array([(fecha - ultima).total_seconds() / 86400 for fecha, _ in lecturas])
+    horas = np.array([horometro for _, horometro in lecturas], dtype=float)
+
+    en_ventana = dias >= -ventana_dias
+    dias, horas = dias[en_ventana], horas[en_ventana]
+    nuevas = np.concatenate(([True], np.diff(horas) != 0))
+    dias, horas = dias[nuevas], horas[nuevas]
+    if len(dias) < 2 or dias[-1] - dias[0] < DIAS_MINIMOS_TASA:
+        return None
+
+    pendiente = np.polyfit(dias, horas, 1)[0]
+    if pendiente <= 0:
+        return None
+    return round(min(pendiente, TASA_MAXIMA), 2)
+
+
+def _resumen(lecturas):
+    """(horometro, fecha, tasa) a partir de lecturas ordenadas de la más reciente a la más antigua."""
+    fecha, horometro = lecturas[0]
+    return horometro, fecha, estimar_tasa_uso(lecturas)
+
+
+def recalcular_equipo(equipo_id):
+    """Actualiza el horómetro, su fecha y la tasa de uso guardados en el equipo."""
+    lecturas = list(
+        HistorialHorometro.objects.filter(idequipo_id=equipo_id)
+        .order_by('-fechalectura', '-idhistorial')
+        .values_list('fechalectura', 'horometro')[:MAXIMO_LECTURAS_TASA]
+    )
+    if not lecturas:
+        return
+    horometro, fecha, tasa = _resumen(lecturas)
+    Equipos.objects.filter(pk=equipo_id).update(
+        horometroactual=horometro, fechahorometro=fecha, tasausodiaria=tasa
+    )
+
+
+def recalcular_equipos(equipos=None):
+    """
+    Recalcula horómetro y tasa de uso de varios equipos (queryset; por
+    defecto todos) leyendo el historial en una sola pasada ordenada.
+    Retorna la cantidad de equipos actualizados.
+    """
+    lecturas = HistorialHorometro.objects.order_by('idequipo', '-fechalectura', '-idhistorial')
+    if equipos is not None:
+        lecturas = lecturas.filter(idequipo__in=equipos)
+
+    actualizados = []
+    filas = lecturas.values_list('idequipo', 'fechalectura', 'horometro').iterator(chunk_size=5000)
+    for equipo_id, grupo in groupby(filas, key=itemgetter(0)):
+        horometro, fecha, tasa = _resumen([
+            (fecha_lectura, valor) for _, fecha_lectura, valor in islice(grupo, MAXIMO_LECTURAS_TASA)
+        ])
+        actualizados.append(Equipos(
+            idequipo=equipo_id, horometroactual=horometro, fechahorometro=fecha, tasausodiaria=tasa
+        ))
+
+    Equipos.objects.bulk_update(
+        actualizados, ['horometroactual', 'fechahorometro', 'tasausodiaria'], batch_size=500
+    )
+    return len(actualizados)
+
+
+def registrar_lectura(equipo_id, horometro, origen, fecha=None, referencia=None,
+                      usuario_id=None, observaciones=None):
+    """
+    Agrega una lectura al historial y actualiza el horómetro y la tasa de
+    uso guardados en el equipo. Retorna la lectura creada.
+    """
+    lectura = HistorialHorometro.objects.create(
+        idequipo_id=equipo_id,
+        horometro=horometro,
+        fechalectura=fecha or timezone.now(),
+        origen=origen,
+        idreferencia=referencia,
+        idusuario_id=usuario_id,
+        observaciones=observaciones
+    )
+    recalcular_equipo(equipo_id)
+    return lectura
+
+
+def fecha_lectura_checklist(fecha_inspeccion, fecha_creacion):
+    """
+    Momento de la lectura de un checklist: la hora de registro si se
+    completó el mismo día de la inspección, o el mediodía de ese día si se
+    digitó después.
+    """
+    if isinstance(fecha_inspeccion, str):
+        fecha_inspeccion = datetime.date.fromisoformat(fecha_inspeccion)
+    if fecha_creacion and timezone.localtime(fecha_creacion).date() == fecha_inspeccion:
+        return fecha_creacion
+    return timezone.make_aware(datetime.datetime.combine(fecha_inspeccion, datetime.time(12, 0)))
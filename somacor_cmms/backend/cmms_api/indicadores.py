@@ -0,0 +1,356 @@
+# cmms_api/indicadores.py
+# Indicadores diarios por equipo (fallas, reparaciones, detención, checklists) y MTBF / MTTR / disponibilidad
+
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import OrdenesTrabajo, ChecklistInstance, IndicadoresDiariosEquipo, Equipos
+from .consultas_criticas import rango_dias
+
+TIPO_CORRECTIVO = 'Correctivo'
+ESTADO_COMPLETADA = 'Completada'
+ESTADO_CANCELADA = 'Cancelada'
+CAMPOS_INDICADORES = (
+    'fallas', 'reparaciones', 'minutosreparacion', 'minutosdetencion',
+    'horaspreventivo', 'horascorrectivo', 'checklists', 'checklistsconformes'
+)
+CAMPOS_OT = (
+    'idequipo', 'fechacreacionot', 'fechareportefalla', 'fechacompletado', 'tiempototalminutos',
+    'idtipomantenimientoot__nombretipomantenimientoot', 'idestadoot__nombreestadoot'
+)
+TAMANO_LOTE = 2000
+
+
+def _vacio():
+    return dict.fromkeys(CAMPOS_INDICADORES, 0)
+
+
+def _dia(fecha_hora):
+    return timezone.localtime(fecha_hora).date()
+
+
+def _minutos_por_dia(inicio, fin):
+    """
+    Reparte los minutos entre `inicio` y `fin` en los días locales que
+    abarcan: pares (día, minutos). Los minutos se cuentan desde `inicio`,
+    así que la suma por día es igual al total.
+    """
+    def transcurridos(momento):
+        return int((momento - inicio).total_seconds() // 60)
+
+    dia, ultimo = _dia(inicio), _dia(fin)
+    while dia <= ultimo:
+        desde, hasta = rango_dias(dia, dia)
+        minutos = transcurridos(min(fin, hasta)) - transcurridos(max(inicio, desde))
+        if minutos > 0:
+            yield dia, minutos
+        dia += datetime.timedelta(days=1)
+
+
+def dias_afectados_ot(ot):
+    """
+    (equipo, día) cuyos indicadores dependen de una OT (instancia o fila de
+    `values(*CAMPOS_OT)`): el de la falla y el del cierre y, si es
+    correctiva, los días intermedios, entre los que se reparte la detención.
+    """
+    if isinstance(ot, dict):
+        equipo_id, creacion, falla, completado = (
+            ot['idequipo'], ot['fechacreacionot'], ot['fechareportefalla'], ot['fechacompletado']
+        )
+        correctiva = ot['idtipomantenimientoot__nombretipomantenimientoot'] == TIPO_CORRECTIVO
+    else:
+        equipo_id, creacion, falla, completado = (
+            ot.idequipo_id, ot.fechacreacionot, ot.fechareportefalla, ot.fechacompletado
+        )
+        # Sin consultar el tipo: en una OT no correctiva sólo se recalculan días de más
+        correctiva = True
+    dias = set()
+    if falla or creacion:
+        dias.add((equipo_id, _dia(falla or creacion)))
+    if completado:
+        dias.add((equipo_id, _dia(completado)))
+    if correctiva and completado and (falla or creacion):
+        dias.update((equipo_id, dia) for dia, _ in _minutos_por_dia(falla or creacion, completado))
+    return dias
+
+
+def _acumular_ots(filas, indicadores):
+    """
+    Suma las OTs (filas de `values(*CAMPOS_OT)`) a `indicadores`, un
+    defaultdict {(equipo, día): {campo: valor}}.
+
+    Una OT correctiva es una falla el día en que se reportó (o se creó, si
+    no hay fecha de falla). Al completarse suma, el día del cierre, una
+    reparación y sus minutos (`tiempototalminutos`, o la detención si no se
+    informó); la detención, desde la falla hasta el cierre, se reparte entre
+    los días que abarca. Las demás OTs completadas suman horas de
+    mantenimiento preventivo. Las fallas abiertas se suman al consultar (ver
+    `confiabilidad`), porque su detención crece con el tiempo.
+    """
+    for ot in filas:
+        correctiva = ot['idtipomantenimientoot__nombretipomantenimientoot'] == TIPO_CORRECTIVO
+        inicio_falla = ot['fechareportefalla'] or ot['fechacreacionot']
+        if correctiva and inicio_falla:
+            indicadores[(ot['idequipo'], _dia(inicio_falla))]['fallas'] += 1
+
+        if ot['fechacompletado'] is None or ot['idestadoot__nombreestadoot'] != ESTADO_COMPLETADA:
+            continue
+        datos = indicadores[(ot['idequipo'], _dia(ot['fechacompletado']))]
+        minutos = ot['tiempototalminutos'] or 0
+        if correctiva:
+            detencion = 0
+            if inicio_falla:
+                for dia, minutos_dia in _minutos_por_dia(inicio_falla, ot['fechacompletado']):
+                    indicadores[(ot['idequipo'], dia)]['minutosdetencion'] += minutos_dia
+                    detencion += minutos_dia
+            datos['reparaciones'] += 1
+            datos['minutosreparacion'] += detencion if ot['tiempototalminutos'] is None else minutos
+            datos['horascorrectivo'] += minutos / 60
+        else:
+            datos['horaspreventivo'] += minutos / 60
+
+
+def _acumular_checklists(checklists, indicadores):
+    # Conforme: sin respuestas críticas malas, igual que en reportes/conformidad
+    filas = checklists.order_by().values('equipo', 'fecha_inspeccion').annotate(
+        total=Count('id_instance'),
+        conformes=Count('id_instance', filter=Q(respuestas_criticas_malas=0))
+    )
+    for fila in filas:
+        datos = indicadores[(fila['equipo'], fila['fecha_inspeccion'])]
+        datos['checklists'] += fila['total']
+        datos['checklistsconformes'] += fila['conformes']
+
+
+def _ots_del_dia(equipo_id, dia):
+    inicio, fin = rango_dias(dia, dia)
+    # También las correctivas que se reportaron antes y se cerraron después: su detención abarca el día
+    abarca_el_dia = Q(
+        Q(fechareportefalla__lt=inicio) | Q(fechareportefalla__isnull=True, fechacreacionot__lt=inicio),
+        fechacompletado__gte=fin,
+        idtipomantenimientoot__nombretipomantenimientoot=TIPO_CORRECTIVO
+    )
+    return OrdenesTrabajo.objects.filter(idequipo_id=equipo_id).filter(
+        Q(fechacompletado__gte=inicio, fechacompletado__lt=fin)
+        | Q(fechareportefalla__gte=inicio, fechareportefalla__lt=fin)
+        | Q(fechareportefalla__isnull=True, fechacreacionot__gte=inicio, fechacreacionot__lt=fin)
+        | abarca_el_dia
+    ).order_by().values(*CAMPOS_OT)
+
+
+def dia_checklist(checklist):
+    """(equipo, día) cuyos indicadores dependen de un checklist."""
+    fecha = checklist.fecha_inspeccion
+    if isinstance(fecha, str):
+        fecha = datetime.date.fromisoformat(fecha)
+    return checklist.equipo_id, fecha
+
+
+def recalcular_dias(dias):
+    """
+    Recalcula los indicadores de los pares (equipo, día) indicados desde las
+    OTs y los checklists de ese día; es lo que hacen las señales al guardar
+    o borrar una OT o un checklist. Un día sin actividad no deja fila.
+    """
+    for equipo_id, dia in set(dias):
+        indicadores = defaultdict(_vacio)
+        _acumular_ots(_ots_del_dia(equipo_id, dia), indicadores)
+        _acumular_checklists(
+            ChecklistInstance.objects.filter(equipo_id=equipo_id, fecha_inspeccion=dia), indicadores
+        )
+        datos = indicadores.get((equipo_id, dia))
+
+        with transaction.atomic():
+            if datos is None or not any(datos.values()):
+                IndicadoresDiariosEquipo.objects.filter(idequipo_id=equipo_id, fecha=dia).delete()
+            else:
+                IndicadoresDiariosEquipo.objects.update_or_create(
+                    idequipo_id=equipo_id, fecha=dia, defaults=datos
+                )
+
+
+def programar_recalculo(dias):
+    """
+    Recalcula los días indicados cuando se confirma la transacción en curso
+    (de inmediato si no hay una). Así se leen las OTs y checklists ya
+    guardados por completo, y la petición no toma bloqueos sobre la tabla
+    de indicadores.
+    """
+    dias = set(dias)
+    if dias:
+        transaction.on_commit(lambda: recalcular_dias(dias))
+
+
+def reconstruir_indicadores(equipos=None, desde=None):
+    """
+    Reconstruye los indicadores diarios desde cero (o desde la fecha `desde`)
+    para los equipos del queryset (por defecto todos), recorriendo las OTs y
+    los checklists una sola vez. Retorna la cantidad de filas creadas.
+    """
+    ots = OrdenesTrabajo.objects.order_by()
+    checklists = ChecklistInstance.objects.all()
+    existentes = IndicadoresDiariosEquipo.objects.all()
+    if equipos is not None:
+        ots = ots.filter(idequipo__in=equipos)
+        checklists = checklists.filter(equipo__in=equipos)
+        existentes = existentes.filter(idequipo__in=equipos)
+    if desde is not None:
+        inicio, _ = rango_dias(desde, desde)
+        ots = ots.filter(
+            Q(fechacompletado__gte=inicio) | Q(fechareportefalla__gte=inicio) | Q(fechacreacionot__gte=inicio)
+        )
+        checklists = checklists.filter(fecha_inspeccion__gte=desde)
+        existentes = existentes.filter(fecha__gte=desde)
+
+    indicadores = defaultdict(_vacio)
+    _acumular_ots(ots.values(*CAMPOS_OT).iterator(chunk_size=TAMANO_LOTE), indicadores)
+    _acumular_checklists(checklists, indicadores)
+
+    filas = [
+        IndicadoresDiariosEquipo(idequipo_id=equipo_id, fecha=dia, **datos)
+        for (equipo_id, dia), datos in sorted(indicadores.items())
+        if desde is None or dia >= desde
+    ]
+    with transaction.atomic():
+        existentes.delete()
+        IndicadoresDiariosEquipo.objects.bulk_create(filas, batch_size=TAMANO_LOTE)
+    return len(filas)
+
+
+def _fallas_abiertas(equipos, inicio, fin):
+    """
+    Detención de las fallas (OTs correctivas) aún no completadas ni
+    canceladas: {equipo: {'fallas_abiertas', 'minutosdetencion',
+    'minutosreparacion'}}. La detención se cuenta dentro de [inicio, fin) y
+    hasta ahora; la reparación, desde la falla hasta `min(ahora, fin)`.
+    """
+    hasta = min(timezone.now(), fin)
+    filas = OrdenesTrabajo.objects.filter(
+        idequipo__in=equipos,
+        idtipomantenimientoot__nombretipomantenimientoot=TIPO_CORRECTIVO
+    ).exclude(
+        idestadoot__nombreestadoot__in=[ESTADO_COMPLETADA, ESTADO_CANCELADA]
+    ).annotate(
+        inicio_falla=Coalesce('fechareportefalla', 'fechacreacionot')
+    ).filter(inicio_falla__lt=hasta).order_by().values(
+        'idequipo', 'idequipo__nombreequipo', 'idequipo__codigointerno', 'inicio_falla'
+    )
+
+    abiertas = {}
+    for fila in filas:
+        datos = abiertas.setdefault(fila['idequipo'], {
+            'equipo': fila['idequipo__nombreequipo'], 'codigo': fila['idequipo__codigointerno'],
+            'fallas_abiertas': 0, 'minutosdetencion': 0, 'minutosreparacion': 0,
+        })
+        datos['fallas_abiertas'] += 1
+        datos['minutosreparacion'] += int((hasta - fila['inicio_falla']).total_seconds() // 60)
+        datos['minutosdetencion'] += max(0, int((hasta - max(fila['inicio_falla'], inicio)).total_seconds() // 60))
+    return abiertas
+
+
+def _metricas(fallas, reparaciones, minutos_reparacion, minutos_detencion, horas_calendario, abiertas=None):
+    # Una falla abierta cuenta en el MTTR como una reparación que dura hasta ahora
+    abiertas = abiertas or {}
+    minutos_detencion += abiertas.get('minutosdetencion', 0)
+    en_curso = abiertas.get('fallas_abiertas', 0)
+    reparaciones_mttr = reparaciones + en_curso
+    minutos_reparacion += abiertas.get('minutosreparacion', 0)
+    horas_operacion = max(horas_calendario - minutos_detencion / 60, 0)
+    return {
+        'fallas': fallas,
+        'reparaciones': reparaciones,
+        'fallas_abiertas': en_curso,
+        'horas_detencion': round(minutos_detencion / 60, 2),
+        'mtbf_horas': round(horas_operacion / fallas, 2) if fallas else None,
+        'mttr_horas': round(minutos_reparacion / 60 / reparaciones_mttr, 2) if reparaciones_mttr else None,
+        'disponibilidad': round(100 * horas_operacion / horas_calendario, 2) if horas_calendario else None,
+    }
+
+
+def _fila_equipo(equipo_id, nombre, codigo, datos, horas_periodo, abiertas):
+    return {
+        'equipo_id': equipo_id,
+        'equipo': nombre,
+        'codigo': codigo,
+        **_metricas(
+            datos['fallas'], datos['reparaciones'], datos['minutosreparacion'],
+            datos['minutosdetencion'], horas_periodo, abiertas
+        ),
+        'horas_preventivo': round(datos['horaspreventivo'], 2),
+        'horas_correctivo': round(datos['horascorrectivo'], 2),
+        'checklists': datos['checklists'],
+        'checklists_conformes': datos['checklistsconformes'],
+    }
+
+
+def confiabilidad(fecha_inicio, fecha_fin, equipo_id=None, faena_id=None, tipo_equipo_id=None):
+    """
+    MTBF, MTTR (en horas) y disponibilidad (%) de los equipos activos en
+    [fecha_inicio, fecha_fin], desde los indicadores diarios más las fallas
+    que siguen abiertas: una consulta agrupada por equipo, una de fallas
+    abiertas y una que cuenta los equipos.
+
+    MTBF = horas de operación / fallas; MTTR = minutos de reparación /
+    reparaciones (las abiertas, hasta ahora); disponibilidad = horas de
+    operación / horas calendario, con horas de operación = horas calendario
+    - detención.
+    """
+    equipos = Equipos.objects.filter(activo=True)
+    if equipo_id:
+        equipos = equipos.filter(pk=equipo_id)
+    if faena_id:
+        equipos = equipos.filter(idfaenaactual_id=faena_id)
+    if tipo_equipo_id:
+        equipos = equipos.filter(idtipoequipo_id=tipo_equipo_id)
+
+    horas_periodo = ((fecha_fin - fecha_inicio).days + 1) * 24
+    filas = IndicadoresDiariosEquipo.objects.filter(
+        fecha__range=[fecha_inicio, fecha_fin], idequipo__in=equipos
+    ).values('idequipo', 'idequipo__nombreequipo', 'idequipo__codigointerno').annotate(
+        **{campo: Sum(campo) for campo in CAMPOS_INDICADORES}
+    ).order_by('idequipo__nombreequipo', 'idequipo')
+
+    abiertas = _fallas_abiertas(equipos, *rango_dias(fecha_inicio, fecha_fin))
+
+    por_equipo = []
+    totales = _vacio()
+    for fila in filas:
+        for campo in CAMPOS_INDICADORES:
+            totales[campo] += fila[campo]
+        por_equipo.append(_fila_equipo(
+            fila['idequipo'], fila['idequipo__nombreequipo'], fila['idequipo__codigointerno'],
+            fila, horas_periodo, abiertas.get(fila['idequipo'])
+        ))
+    # Equipos cuya única actividad en el período es una falla abierta
+    con_indicadores = {fila['equipo_id'] for fila in por_equipo}
+    for equipo, datos in abiertas.items():
+        if equipo not in con_indicadores:
+            por_equipo.append(_fila_equipo(equipo, datos['equipo'], datos['codigo'], _vacio(), horas_periodo, datos))
+    por_equipo.sort(key=lambda fila: (fila['equipo'], fila['equipo_id']))
+
+    totales_abiertas = {
+        campo: sum(datos[campo] for datos in abiertas.values())
+        for campo in ('fallas_abiertas', 'minutosdetencion', 'minutosreparacion')
+    }
+
+    # Los equipos sin actividad en el período cuentan como disponibles todo el tiempo
+    cantidad_equipos = equipos.count()
+    return {
+        'periodo': {'fecha_inicio': fecha_inicio, 'fecha_fin': fecha_fin},
+        'flota': {
+            'equipos': cantidad_equipos,
+            **_metricas(
+                totales['fallas'], totales['reparaciones'], totales['minutosreparacion'],
+                totales['minutosdetencion'], horas_periodo * cantidad_equipos, totales_abiertas
+            ),
+            'horas_preventivo': round(totales['horaspreventivo'], 2),
+            'horas_correctivo': round(totales['horascorrectivo'], 2),
+            'checklists': totales['checklists'],
+            'checklists_conformes': totales['checklistsconformes'],
+        },
+        'por_equipo': por_equipo,
+    }
@@ -1,13 +1,9 @@
 # cmms_api/management/commands/generar_agenda_preventiva.py
 
 from django.core.management.base import BaseCommand
-from django.utils import timezone
 from django.contrib.auth.models import User
-from cmms_api.models import (
-    PlanesMantenimiento, DetallesPlanMantenimiento, 
-    Equipos, Agendas, TiposEquipo
-)
-import datetime
+from cmms_api.models import Equipos
+from cmms_api.proyeccion_agenda import generar_agenda_preventiva
 
 class Command(BaseCommand):
     help = 'Genera agenda de mantenimiento preventivo basada en planes y horometros de equipos'
@@ -47,100 +43,15 @@ class Command(BaseCommand):
         if tipo_equipo_id:
             equipos_query = equipos_query.filter(idtipoequipo_id=tipo_equipo_id)
 
-        eventos_creados = 0
-        usuario_sistema = User.objects.first()  # Usuario por defecto para crear eventos
-
-        for equipo in equipos_query:
-            self.stdout.write(f'Procesando equipo: {equipo.nombreequipo}')
-            
-            # Obtener planes de mantenimiento para este tipo de equipo
-            planes = PlanesMantenimiento.objects.filter(
-                idtipoequipo=equipo.idtipoequipo,
-                activo=True
-            )
-
-            for plan in planes:
-                detalles = DetallesPlanMantenimiento.objects.filter(
-                    idplanmantenimiento=plan,
-                    activo=True
-                ).order_by('intervalohorasoperacion')
-
-                for detalle in detalles:
-                    # Calcular próximas fechas de mantenimiento
-                    eventos_generados = self._generar_eventos_para_detalle(
-                        equipo, plan, detalle, dias_adelante, horas_diarias, usuario_sistema
-                    )
-                    eventos_creados += eventos_generados
+        eventos_creados = generar_agenda_preventiva(
+            equipos=equipos_query,
+            dias_adelante=dias_adelante,
+            horas_diarias=horas_diarias,
+            usuario=User.objects.first()  # Usuario por defecto para crear eventos
+        )
 
         self.stdout.write(
             self.style.SUCCESS(
                 f'Agenda generada exitosamente. {eventos_creados} eventos creados.'
             )
         )
-
-    def _generar_eventos_para_detalle(self, equipo, plan, detalle, dias_adelante, horas_diarias, usuario):
-        """
-        Genera eventos de agenda para un detalle específico del plan de mantenimiento
-        """
-        eventos_creados = 0
-        horometro_actual = equipo.horometroactual
-        intervalo = detalle.intervalohorasoperacion
-        
-        # Calcular el próximo mantenimiento
-        horas_desde_ultimo = horometro_actual % intervalo
-        horas_hasta_proximo = intervalo - horas_desde_ultimo
-        
-        # Si ya es tiempo de mantenimiento
-        if horas_hasta_proximo == intervalo:
-            horas_hasta_proximo = 0
-
-        fecha_actual = timezone.now().date()
-        fecha_limite = fecha_actual + datetime.timedelta(days=dias_adelante)
-
-        # Generar eventos dentro del período especificado
-        while True:
-            # Calcular fecha estimada del mantenimiento
-            dias_estimados = horas_hasta_proximo / horas_diarias
-            fecha_mantenimiento = fecha_actual + datetime.timedelta(days=int(dias_estimados))
-            
-            if fecha_mantenimiento > fecha_limite:
-                break
-
-            # Verificar si ya existe un evento similar en esa fecha
-            evento_existente = Agendas.objects.filter(
-                idequipo=equipo,
-                idplanmantenimiento=plan,
-                fechahorainicio__date=fecha_mantenimiento,
-                tituloevento__icontains=detalle.idtareaestandar.nombretarea
-            ).exists()
-
-            if not evento_existente:
-                # Crear evento de agenda
-                hora_inicio = datetime.time(8, 0)  # 8:00 AM por defecto
-                fecha_hora_inicio = datetime.datetime.combine(fecha_mantenimiento, hora_inicio)
-                fecha_hora_fin = fecha_hora_inicio + datetime.timedelta(
-                    minutes=detalle.idtareaestandar.tiempoestimadominutos or 60
-                )
-
-                Agendas.objects.create(
-                    tituloevento=f"Mantenimiento {detalle.idtareaestandar.nombretarea} - {equipo.nombreequipo}",
-                    fechahorainicio=fecha_hora_inicio,
-                    fechahorafin=fecha_hora_fin,
-                    descripcionevento=(
-                        f"Mantenimiento preventivo programado cada {intervalo} horas. "
-                        f"Horometro estimado: {horometro_actual + horas_hasta_proximo}h"
-                    ),
-                    tipoevento="Mantenimiento Preventivo",
-                    colorevento="#28a745" if not detalle.escritic else "#dc3545",
-                    idequipo=equipo,
-                    idplanmantenimiento=plan,
-                    idusuariocreador=usuario
-                )
-                eventos_creados += 1
-
-            # Preparar para el siguiente mantenimiento
-            horas_hasta_proximo += intervalo
-            horometro_actual += intervalo
-
-        return eventos_creados
-
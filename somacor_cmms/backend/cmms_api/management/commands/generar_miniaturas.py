@@ -0,0 +1,50 @@
+# cmms_api/management/commands/generar_miniaturas.py
+
+from django.core.management.base import BaseCommand
+from cmms_api.almacen_blobs import almacen
+from cmms_api.serializers import ORIGENES_BLOBS
+
+
+class Command(BaseCommand):
+    help = 'Genera las miniaturas faltantes de las imágenes guardadas en el almacén de blobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamano-lote',
+            type=int,
+            default=200,
+            help='Cantidad de filas procesadas por lote (default: 200)'
+        )
+
+    def handle(self, *args, **options):
+        tamano_lote = options['tamano_lote']
+
+        for modelo, prefijo in ORIGENES_BLOBS:
+            campo_blob = f'{prefijo}_blob'
+            campo_miniatura = f'{prefijo}_miniatura'
+            pendientes = modelo.objects.filter(
+                **{f'{campo_blob}__isnull': False, f'{campo_miniatura}__isnull': True}
+            ).order_by('pk').only('pk', campo_blob)
+
+            generadas = omitidas = 0
+            ultimo_pk = 0
+            while True:
+                lote = list(pendientes.filter(pk__gt=ultimo_pk)[:tamano_lote])
+                if not lote:
+                    break
+                ultimo_pk = lote[-1].pk
+
+                actualizadas = []
+                for fila in lote:
+                    miniatura = almacen.generar_miniatura(getattr(fila, campo_blob))
+                    if miniatura is None:
+                        omitidas += 1
+                        continue
+                    setattr(fila, campo_miniatura, miniatura)
+                    actualizadas.append(fila)
+                modelo.objects.bulk_update(actualizadas, [campo_miniatura])
+                generadas += len(actualizadas)
+
+            self.stdout.write(
+                self.style.SUCCESS(f'{modelo.__name__}: {generadas} miniaturas generadas, {omitidas} omitidas.')
+            )
@@ -0,0 +1,49 @@
+# cmms_api/management/commands/medir_consultas.py
+
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from cmms_api.consultas_criticas import consultas_criticas
+
+
+class Command(BaseCommand):
+    help = 'Mide el tiempo y muestra el plan (EXPLAIN) de las consultas de ventana de tiempo del dashboard, calendario y reportes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeticiones',
+            type=int,
+            default=5,
+            help='Cantidad de ejecuciones por consulta; se informa la mediana (default: 5)'
+        )
+        parser.add_argument(
+            '--explain',
+            action='store_true',
+            help='Muestra además el plan de ejecución de cada consulta'
+        )
+
+    def handle(self, *args, **options):
+        repeticiones = max(1, options['repeticiones'])
+
+        for consulta in consultas_criticas():
+            # Se mide la ejecución del SQL y la lectura de filas, sin instanciar modelos
+            sql, params = consulta.queryset.query.sql_with_params()
+            tiempos = []
+            with connections[consulta.queryset.db].cursor() as cursor:
+                for _ in range(repeticiones):
+                    inicio = time.perf_counter()
+                    cursor.execute(sql, params)
+                    filas = len(cursor.fetchall())
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+
+            plan = consulta.queryset.explain()
+            usa_indice = consulta.indice in plan
+            estilo = self.style.SUCCESS if usa_indice else self.style.WARNING
+            self.stdout.write(estilo(
+                f'{consulta.nombre:<36} {statistics.median(tiempos):9.2f} ms  '
+                f'{filas:>7} filas  índice {consulta.indice}: {"sí" if usa_indice else "NO"}'
+            ))
+            if options['explain']:
+                self.stdout.write(plan)
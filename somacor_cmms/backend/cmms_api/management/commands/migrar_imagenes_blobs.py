@@ -0,0 +1,81 @@
+# cmms_api/management/commands/migrar_imagenes_blobs.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from cmms_api.models import EvidenciaOT, ChecklistImage, ChecklistInstance
+from cmms_api.almacen_blobs import almacen
+
+# (modelo, campo Base64 legado, prefijo de los campos del blob)
+ORIGENES = [
+    (EvidenciaOT, 'imagen_base64', 'imagen'),
+    (ChecklistImage, 'imagen_base64', 'imagen'),
+    (ChecklistInstance, 'imagen_evidencia', 'imagen_evidencia'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Mueve las imágenes Base64 guardadas en la base de datos al almacén de blobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamano-lote',
+            type=int,
+            default=100,
+            help='Cantidad de filas procesadas por transacción (default: 100)'
+        )
+        parser.add_argument(
+            '--conservar-base64',
+            action='store_true',
+            help='No vaciar la columna Base64 después de copiar la imagen'
+        )
+
+    def handle(self, *args, **options):
+        tamano_lote = options['tamano_lote']
+        conservar = options['conservar_base64']
+
+        for modelo, campo, prefijo in ORIGENES:
+            migradas, errores = self._migrar_modelo(modelo, campo, prefijo, tamano_lote, conservar)
+            self.stdout.write(
+                self.style.SUCCESS(f'{modelo.__name__}: {migradas} imágenes migradas, {errores} con errores.')
+            )
+
+    def _migrar_modelo(self, modelo, campo, prefijo, tamano_lote, conservar):
+        """
+        Recorre las filas pendientes por lotes ordenados por clave primaria,
+        cargando sólo la columna Base64 del lote en curso.
+        """
+        campos_blob = [f'{prefijo}_blob', f'{prefijo}_tamano', f'{prefijo}_mime', f'{prefijo}_miniatura']
+        campos_actualizados = campos_blob if conservar else campos_blob + [campo]
+        pendientes = modelo.objects.filter(
+            **{f'{campo}__isnull': False, f'{prefijo}_blob__isnull': True}
+        ).exclude(**{campo: ''}).order_by('pk').only('pk', campo)
+
+        migradas = errores = 0
+        ultimo_pk = 0
+        while True:
+            lote = list(pendientes.filter(pk__gt=ultimo_pk)[:tamano_lote])
+            if not lote:
+                break
+            ultimo_pk = lote[-1].pk
+
+            actualizadas = []
+            for fila in lote:
+                try:
+                    blob = almacen.guardar_base64(getattr(fila, campo))
+                except ValueError as e:
+                    errores += 1
+                    self.stdout.write(self.style.ERROR(f'{modelo.__name__} {fila.pk}: {e}'))
+                    continue
+                setattr(fila, f'{prefijo}_blob', blob.ref)
+                setattr(fila, f'{prefijo}_tamano', blob.tamano)
+                setattr(fila, f'{prefijo}_mime', blob.mime)
+                setattr(fila, f'{prefijo}_miniatura', almacen.generar_miniatura(blob.ref))
+                if not conservar:
+                    setattr(fila, campo, None)
+                actualizadas.append(fila)
+
+            with transaction.atomic():
+                modelo.objects.bulk_update(actualizadas, campos_actualizados)
+            migradas += len(actualizadas)
+
+        return migradas, errores
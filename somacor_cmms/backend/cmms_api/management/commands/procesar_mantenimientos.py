@@ -6,8 +6,10 @@ from django.contrib.auth.models import User
 from django.db import transaction
 from cmms_api.models import (
     OrdenesTrabajo, ActividadesOrdenTrabajo, Equipos, 
-    EstadosOrdenTrabajo, TiposMantenimientoOT, Agendas
+    Agendas
 )
+from cmms_api.catalogos import estados_ot, tipos_mantenimiento_ot
+from cmms_api.secuencias_ot import numero_ot
 import datetime
 
 class Command(BaseCommand):
@@ -69,24 +71,18 @@ class Command(BaseCommand):
         Crea una orden de trabajo desde un evento de agenda
         """
         try:
+            numero = numero_ot('AUTO', evento.idequipo)
             with transaction.atomic():
-                # Obtener estados y tipos necesarios
-                estado_abierta = EstadosOrdenTrabajo.objects.get_or_create(
-                    nombreestadoot='Abierta',
-                    defaults={'descripcion': 'OT recién creada'}
-                )[0]
-                
-                tipo_preventivo = TiposMantenimientoOT.objects.get_or_create(
-                    nombretipomantenimientoot='Preventivo',
-                    defaults={'descripcion': 'Mantenimiento planificado'}
-                )[0]
+                # Estado y tipo desde el registro de catálogos
+                estado_abierta = estados_ot.obtener('Abierta')
+                tipo_preventivo = tipos_mantenimiento_ot.obtener('Preventivo')
                 
                 # Usuario sistema para crear la OT
                 usuario_sistema = User.objects.first()
                 
                 # Crear la orden de trabajo
                 ot = OrdenesTrabajo.objects.create(
-                    numeroot=f"OT-AUTO-{evento.idequipo.codigointerno or evento.idequipo.idequipo}-{timezone.now().strftime('%Y%m%d%H%M')}",
+                    numeroot=numero,
                     idequipo=evento.idequipo,
                     idplanorigen=evento.idplanmantenimiento,
                     idtipomantenimientoot=tipo_preventivo,
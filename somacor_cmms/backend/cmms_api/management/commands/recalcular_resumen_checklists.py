@@ -0,0 +1,44 @@
+# cmms_api/management/commands/recalcular_resumen_checklists.py
+
+from django.core.management.base import BaseCommand
+from cmms_api.models import ChecklistInstance
+from cmms_api.reportes_checklist import recalcular_resumenes
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los contadores de respuestas (totales, malas y críticas malas) de los checklists'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--equipo',
+            type=int,
+            help='ID del equipo cuyos checklists se deben recalcular'
+        )
+        parser.add_argument(
+            '--tamano-lote',
+            type=int,
+            default=5000,
+            help='Cantidad de checklists actualizados por sentencia (default: 5000)'
+        )
+
+    def handle(self, *args, **options):
+        equipo_id = options['equipo']
+        tamano_lote = options['tamano_lote']
+
+        queryset = ChecklistInstance.objects.all()
+        if equipo_id:
+            queryset = queryset.filter(equipo_id=equipo_id)
+
+        ids = list(queryset.order_by('id_instance').values_list('id_instance', flat=True))
+        self.stdout.write(f'Recalculando resumen de {len(ids)} checklists...')
+
+        actualizados = 0
+        for inicio in range(0, len(ids), tamano_lote):
+            lote = ids[inicio:inicio + tamano_lote]
+            actualizados += recalcular_resumenes(
+                queryset.filter(id_instance__range=(lote[0], lote[-1]))
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Resumen recalculado para {actualizados} checklists.')
+        )
@@ -0,0 +1,77 @@
+# cmms_api/management/commands/reconstruir_historial_horometro.py
+
+from django.core.management.base import BaseCommand
+from cmms_api.models import Equipos, ChecklistInstance, OrdenesTrabajo, HistorialHorometro
+from cmms_api.horometros import fecha_lectura_checklist, recalcular_equipos
+
+
+class Command(BaseCommand):
+    help = 'Carga en el historial de horómetro las lecturas de checklists y OTs existentes y recalcula la tasa de uso de los equipos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--equipo',
+            type=int,
+            help='ID del equipo cuyo historial se debe reconstruir'
+        )
+        parser.add_argument(
+            '--tamano-lote',
+            type=int,
+            default=5000,
+            help='Cantidad de lecturas insertadas por sentencia (default: 5000)'
+        )
+
+    def handle(self, *args, **options):
+        equipo_id = options['equipo']
+        tamano_lote = options['tamano_lote']
+
+        checklists = ChecklistInstance.objects.order_by('id_instance')
+        ots = OrdenesTrabajo.objects.filter(horometro__isnull=False).order_by('idordentrabajo')
+        equipos = Equipos.objects.all()
+        if equipo_id:
+            checklists = checklists.filter(equipo_id=equipo_id)
+            ots = ots.filter(idequipo_id=equipo_id)
+            equipos = equipos.filter(idequipo=equipo_id)
+
+        lecturas = (
+            HistorialHorometro(
+                idequipo_id=equipo, horometro=horometro, origen='checklist', idreferencia=pk,
+                fechalectura=fecha_lectura_checklist(fecha_inspeccion, fecha_creacion), idusuario_id=operador
+            )
+            for pk, equipo, horometro, fecha_inspeccion, fecha_creacion, operador in checklists.values_list(
+                'id_instance', 'equipo', 'horometro_inspeccion', 'fecha_inspeccion', 'fecha_creacion', 'operador'
+            ).iterator(chunk_size=tamano_lote)
+        )
+        self._insertar(lecturas, tamano_lote, 'checklists')
+
+        lecturas = (
+            HistorialHorometro(
+                idequipo_id=equipo, horometro=horometro, origen='ot', idreferencia=pk,
+                fechalectura=fecha_completado or fecha_creacion, idusuario_id=tecnico or solicitante
+            )
+            for pk, equipo, horometro, fecha_completado, fecha_creacion, tecnico, solicitante in ots.values_list(
+                'idordentrabajo', 'idequipo', 'horometro', 'fechacompletado', 'fechacreacionot',
+                'idtecnicoasignado', 'idsolicitante'
+            ).iterator(chunk_size=tamano_lote)
+        )
+        self._insertar(lecturas, tamano_lote, 'OTs')
+
+        actualizados = recalcular_equipos(equipos)
+        self.stdout.write(
+            self.style.SUCCESS(f'Horómetro y tasa de uso recalculados para {actualizados} equipos.')
+        )
+
+    def _insertar(self, lecturas, tamano_lote, fuente):
+        # Las lecturas ya cargadas chocan con la restricción (origen, idreferencia) y se omiten
+        lote = []
+        procesadas = 0
+        for lectura in lecturas:
+            lote.append(lectura)
+            if len(lote) == tamano_lote:
+                HistorialHorometro.objects.bulk_create(lote, ignore_conflicts=True)
+                procesadas += len(lote)
+                lote = []
+        if lote:
+            HistorialHorometro.objects.bulk_create(lote, ignore_conflicts=True)
+            procesadas += len(lote)
+        self.stdout.write(f'Lecturas de {fuente} procesadas: {procesadas}')
@@ -0,0 +1,34 @@
+# cmms_api/management/commands/reconstruir_indicadores.py
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from cmms_api.models import Equipos
+from cmms_api.indicadores import reconstruir_indicadores
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los indicadores diarios por equipo (fallas, reparaciones, detención, checklists) desde las OTs y los checklists'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--equipo',
+            type=int,
+            help='ID del equipo cuyos indicadores se deben reconstruir'
+        )
+        parser.add_argument(
+            '--desde',
+            help='Reconstruir sólo desde esta fecha (AAAA-MM-DD); por defecto, todo el historial'
+        )
+
+    def handle(self, *args, **options):
+        desde = None
+        if options['desde']:
+            try:
+                desde = datetime.date.fromisoformat(options['desde'])
+            except ValueError:
+                raise CommandError('--desde debe tener el formato AAAA-MM-DD')
+
+        equipos = Equipos.objects.filter(pk=options['equipo']) if options['equipo'] else None
+        creados = reconstruir_indicadores(equipos=equipos, desde=desde)
+        self.stdout.write(self.style.SUCCESS(f'Indicadores diarios reconstruidos: {creados} filas.'))
@@ -0,0 +1,27 @@
+# cmms_api/management/commands/sincronizar_agenda.py
+
+from django.core.management.base import BaseCommand
+from cmms_api.sincronizacion_agenda import sincronizar_agenda, DIAS_PLANES
+
+
+class Command(BaseCommand):
+    help = 'Lleva a la agenda las OTs programadas sin evento y los vencimientos preventivos próximos de toda la flota'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias-planes',
+            type=int,
+            default=DIAS_PLANES,
+            help=f'Días hacia adelante para los vencimientos de planes preventivos (default: {DIAS_PLANES})'
+        )
+
+    def handle(self, *args, **options):
+        resumen = sincronizar_agenda(dias_planes=options['dias_planes'])
+
+        self.stdout.write(f"OTs que ya tenían evento: {resumen['ots_ya_agendadas']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Eventos de OT creados: {len(resumen['eventos'])}. "
+                f"Eventos de planes creados: {resumen['eventos_plan_creados']}."
+            )
+        )
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.23 on 2026-10-18 09:55
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def poblar_resumen_respuestas(apps, schema_editor):
+    ChecklistInstance = apps.get_model('cmms_api', 'ChecklistInstance')
+    ChecklistAnswer = apps.get_model('cmms_api', 'ChecklistAnswer')
+
+    def contar(filtro):
+        subquery = ChecklistAnswer.objects.filter(
+            filtro, instance=OuterRef('pk')
+        ).order_by().values('instance').annotate(c=Count('pk')).values('c')
+        return Coalesce(Subquery(subquery, output_field=IntegerField()), 0)
+
+    ChecklistInstance.objects.update(
+        total_respuestas=contar(Q()),
+        respuestas_malas=contar(Q(estado='malo')),
+        respuestas_criticas_malas=contar(Q(estado='malo', item__es_critico=True)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmms_api', '0008_hacer_usuario_subida_opcional'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checklistinstance',
+            name='respuestas_criticas_malas',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='checklistinstance',
+            name='respuestas_malas',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='checklistinstance',
+            name='total_respuestas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(poblar_resumen_respuestas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.23 on 2026-10-18 09:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmms_api', '0009_checklistinstance_resumen_respuestas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checklistimage',
+            name='imagen_blob',
+            field=models.CharField(blank=True, help_text='sha256 del blob de la imagen', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='checklistimage',
+            name='imagen_mime',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='checklistimage',
+            name='imagen_tamano',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='checklistinstance',
+            name='imagen_evidencia_blob',
+            field=models.CharField(blank=True, help_text='sha256 del blob de la imagen', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='checklistinstance',
+            name='imagen_evidencia_mime',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='checklistinstance',
+            name='imagen_evidencia_tamano',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='evidenciaot',
+            name='imagen_blob',
+            field=models.CharField(blank=True, db_column='ImagenBlob', help_text='sha256 del blob de la imagen', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='evidenciaot',
+            name='imagen_mime',
+            field=models.CharField(blank=True, db_column='ImagenMime', max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='evidenciaot',
+            name='imagen_tamano',
+            field=models.PositiveIntegerField(blank=True, db_column='ImagenTamano', null=True),
+        ),
+        migrations.AlterField(
+            model_name='checklistimage',
+            name='imagen_base64',
+            field=models.TextField(blank=True, help_text='Legado: imagen en Base64, migrada al almacén de blobs', null=True),
+        ),
+        migrations.AlterField(
+            model_name='evidenciaot',
+            name='imagen_base64',
+            field=models.TextField(blank=True, db_column='ImagenBase64', help_text='Legado: imagen en Base64, migrada al almacén de blobs', null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.23 on 2026-10-18 10:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmms_api', '0010_imagenes_almacen_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checklistimage',
+            name='imagen_miniatura',
+            field=models.CharField(blank=True, help_text='sha256 del blob de la miniatura', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='checklistinstance',
+            name='imagen_evidencia_miniatura',
+            field=models.CharField(blank=True, help_text='sha256 del blob de la miniatura', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='evidenciaot',
+            name='imagen_miniatura',
+            field=models.CharField(blank=True, db_column='ImagenMiniatura', help_text='sha256 del blob de la miniatura', max_length=64, null=True),
+        ),
+    ]
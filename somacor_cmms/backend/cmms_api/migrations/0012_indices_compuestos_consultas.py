@@ -0,0 +1,37 @@
+# Generated by Django 4.2.23 on 2026-10-18 10:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmms_api', '0011_miniaturas_imagenes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agendas',
+            index=models.Index(fields=['tipoevento', 'fechahorainicio'], name='agenda_tipo_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='agendas',
+            index=models.Index(fields=['idequipo', 'idplanmantenimiento', 'fechahorainicio'], name='agenda_equipo_plan_ini_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='checklistanswer',
+            index=models.Index(fields=['estado', 'item'], name='chkans_estado_item_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='checklistinstance',
+            index=models.Index(fields=['equipo', 'fecha_inspeccion'], name='chkinst_equipo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenestrabajo',
+            index=models.Index(fields=['idestadoot', 'fechaejecucion'], name='ot_estado_fejecucion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenestrabajo',
+            index=models.Index(fields=['idequipo', 'fechacreacionot'], name='ot_equipo_fcreacion_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-18 10:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmms_api', '0012_indices_compuestos_consultas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciasOT',
+            fields=[
+                ('prefijo', models.CharField(db_column='Prefijo', max_length=20, primary_key=True, serialize=False)),
+                ('ultimovalor', models.BigIntegerField(db_column='UltimoValor', default=0)),
+            ],
+            options={
+                'db_table': 'secuenciasot',
+            },
+        ),
+    ]
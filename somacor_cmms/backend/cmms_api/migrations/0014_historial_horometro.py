@@ -0,0 +1,53 @@
+# Generated by Django 4.2.23 on 2026-10-18 10:31
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cmms_api', '0013_secuencias_ot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipos',
+            name='fechahorometro',
+            field=models.DateTimeField(blank=True, db_column='FechaHorometro', null=True),
+        ),
+        migrations.AddField(
+            model_name='equipos',
+            name='horometroactual',
+            field=models.IntegerField(db_column='HorometroActual', default=0),
+        ),
+        migrations.AddField(
+            model_name='equipos',
+            name='tasausodiaria',
+            field=models.FloatField(blank=True, db_column='TasaUsoDiaria', help_text='Horas de operación por día estimadas', null=True),
+        ),
+        migrations.CreateModel(
+            name='HistorialHorometro',
+            fields=[
+                ('idhistorial', models.BigAutoField(db_column='IDHistorial', primary_key=True, serialize=False)),
+                ('horometro', models.IntegerField(db_column='Horometro')),
+                ('fechalectura', models.DateTimeField(db_column='FechaLectura')),
+                ('origen', models.CharField(choices=[('checklist', 'Checklist'), ('ot', 'Orden de trabajo'), ('manual', 'Manual')], db_column='Origen', max_length=20)),
+                ('idreferencia', models.IntegerField(blank=True, db_column='IDReferencia', help_text='ID del checklist u OT de origen', null=True)),
+                ('observaciones', models.TextField(blank=True, db_column='Observaciones', null=True)),
+                ('idequipo', models.ForeignKey(db_column='IDEquipo', on_delete=django.db.models.deletion.CASCADE, related_name='historial_horometro', to='cmms_api.equipos')),
+                ('idusuario', models.ForeignKey(blank=True, db_column='IDUsuario', null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'historialhorometro',
+                'ordering': ['idequipo', 'fechalectura'],
+                'indexes': [models.Index(fields=['idequipo', 'fechalectura'], name='horom_equipo_fecha_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='historialhorometro',
+            constraint=models.UniqueConstraint(condition=models.Q(('idreferencia__isnull', False)), fields=('origen', 'idreferencia'), name='horom_origen_referencia_uniq'),
+        ),
+    ]
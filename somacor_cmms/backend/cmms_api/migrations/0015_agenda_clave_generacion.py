@@ -0,0 +1,22 @@
+# Generated by Django 4.2.23 on 2026-10-18 10:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmms_api', '0014_historial_horometro'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agendas',
+            name='clavegeneracion',
+            field=models.CharField(blank=True, db_column='ClaveGeneracion', max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='agendas',
+            constraint=models.UniqueConstraint(condition=models.Q(('clavegeneracion__isnull', False)), fields=('clavegeneracion',), name='agenda_clave_generacion_uniq'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-18 10:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmms_api', '0015_agenda_clave_generacion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agendas',
+            index=models.Index(fields=['fechahorainicio', 'fechahorafin'], name='agenda_inicio_fin_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.23 on 2026-10-18 10:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmms_api', '0016_indice_calendario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExcepcionesAgenda',
+            fields=[
+                ('idexcepcion', models.AutoField(db_column='IDExcepcion', primary_key=True, serialize=False)),
+                ('fechaocurrencia', models.DateTimeField(db_column='FechaOcurrencia', help_text='Inicio original de la ocurrencia según la regla')),
+                ('cancelada', models.BooleanField(db_column='Cancelada', default=False)),
+                ('fechahorainicio', models.DateTimeField(blank=True, db_column='FechaHoraInicio', null=True)),
+                ('fechahorafin', models.DateTimeField(blank=True, db_column='FechaHoraFin', null=True)),
+                ('tituloevento', models.CharField(blank=True, db_column='TituloEvento', max_length=255, null=True)),
+                ('descripcionevento', models.TextField(blank=True, db_column='DescripcionEvento', null=True)),
+                ('idagenda', models.ForeignKey(db_column='IDAgenda', on_delete=django.db.models.deletion.CASCADE, related_name='excepciones', to='cmms_api.agendas')),
+            ],
+            options={
+                'db_table': 'excepcionesagenda',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='excepcionesagenda',
+            constraint=models.UniqueConstraint(fields=('idagenda', 'fechaocurrencia'), name='excepcion_agenda_ocurrencia_uniq'),
+        ),
+    ]
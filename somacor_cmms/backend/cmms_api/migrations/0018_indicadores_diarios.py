@@ -0,0 +1,39 @@
+# Generated by Django 4.2.23 on 2026-10-18 10:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmms_api', '0017_excepciones_agenda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndicadoresDiariosEquipo',
+            fields=[
+                ('idindicador', models.BigAutoField(db_column='IDIndicador', primary_key=True, serialize=False)),
+                ('fecha', models.DateField(db_column='Fecha')),
+                ('fallas', models.PositiveIntegerField(db_column='Fallas', default=0, help_text='OTs correctivas por falla reportada ese día')),
+                ('reparaciones', models.PositiveIntegerField(db_column='Reparaciones', default=0, help_text='OTs correctivas completadas ese día')),
+                ('minutosreparacion', models.PositiveIntegerField(db_column='MinutosReparacion', default=0)),
+                ('minutosdetencion', models.PositiveIntegerField(db_column='MinutosDetencion', default=0, help_text='Desde la falla hasta el cierre de la OT')),
+                ('horaspreventivo', models.FloatField(db_column='HorasPreventivo', default=0)),
+                ('horascorrectivo', models.FloatField(db_column='HorasCorrectivo', default=0)),
+                ('checklists', models.PositiveIntegerField(db_column='Checklists', default=0)),
+                ('checklistsconformes', models.PositiveIntegerField(db_column='ChecklistsConformes', default=0)),
+                ('idequipo', models.ForeignKey(db_column='IDEquipo', on_delete=django.db.models.deletion.CASCADE, related_name='indicadores_diarios', to='cmms_api.equipos')),
+            ],
+            options={
+                'db_table': 'indicadoresdiariosequipo',
+                'ordering': ['idequipo', 'fecha'],
+                'indexes': [models.Index(fields=['fecha'], name='indicador_fecha_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='indicadoresdiariosequipo',
+            constraint=models.UniqueConstraint(fields=('idequipo', 'fecha'), name='indicador_equipo_fecha_uniq'),
+        ),
+    ]
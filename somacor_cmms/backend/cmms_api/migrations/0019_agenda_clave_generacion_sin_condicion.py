@@ -0,0 +1,21 @@
+# Generated by Django 4.2.23 on 2026-10-18 11:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmms_api', '0018_indicadores_diarios'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='agendas',
+            name='agenda_clave_generacion_uniq',
+        ),
+        migrations.AddConstraint(
+            model_name='agendas',
+            constraint=models.UniqueConstraint(fields=('clavegeneracion',), name='agenda_clave_generacion_uniq'),
+        ),
+    ]
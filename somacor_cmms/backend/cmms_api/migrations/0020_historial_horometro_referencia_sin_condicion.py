@@ -0,0 +1,21 @@
+# Generated by Django 4.2.23 on 2026-10-18 11:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmms_api', '0019_agenda_clave_generacion_sin_condicion'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='historialhorometro',
+            name='horom_origen_referencia_uniq',
+        ),
+        migrations.AddConstraint(
+            model_name='historialhorometro',
+            constraint=models.UniqueConstraint(fields=('origen', 'idreferencia'), name='horom_origen_referencia_uniq'),
+        ),
+    ]
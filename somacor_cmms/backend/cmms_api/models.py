@@ -57,6 +57,10 @@ class Equipos(models.Model):
     idfaenaactual = models.ForeignKey(Faenas, on_delete=models.SET_NULL, db_column='IDFaenaActual', blank=True, null=True)
     idestadoactual = models.ForeignKey(EstadosEquipo, on_delete=models.PROTECT, db_column='IDEstadoActual')
     activo = models.BooleanField(db_column='Activo', default=True)
+    # Última lectura y tasa de uso, calculadas desde HistorialHorometro (ver horometros.py)
+    horometroactual = models.IntegerField(db_column='HorometroActual', default=0)
+    fechahorometro = models.DateTimeField(db_column='FechaHorometro', blank=True, null=True)
+    tasausodiaria = models.FloatField(db_column='TasaUsoDiaria', blank=True, null=True, help_text="Horas de operación por día estimadas")
     def __str__(self): return f"{self.nombreequipo} ({self.patente or self.codigointerno})"
     class Meta: 
         db_table = 'equipos'
@@ -125,13 +129,41 @@ class ChecklistInstance(models.Model):
     lugar_inspeccion = models.CharField(max_length=200, blank=True, null=True)
     observaciones_generales = models.TextField(blank=True, null=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    # Legado: imagen en Base64; el contenido vive ahora en el almacén de blobs
     imagen_evidencia = models.TextField(blank=True, null=True)
+    imagen_evidencia_blob = models.CharField(max_length=64, blank=True, null=True, help_text="sha256 del blob de la imagen")
+    imagen_evidencia_tamano = models.PositiveIntegerField(blank=True, null=True)
+    imagen_evidencia_mime = models.CharField(max_length=100, blank=True, null=True)
+    imagen_evidencia_miniatura = models.CharField(max_length=64, blank=True, null=True, help_text="sha256 del blob de la miniatura")
+
+    # Resumen desnormalizado de las respuestas (ver `actualizar_resumen`).
+    total_respuestas = models.PositiveIntegerField(default=0)
+    respuestas_malas = models.PositiveIntegerField(default=0, db_index=True)
+    respuestas_criticas_malas = models.PositiveIntegerField(default=0, db_index=True)
 
     def __str__(self):
         return f"Checklist para {self.equipo.nombreequipo} - {self.fecha_inspeccion}"
+
+    def actualizar_resumen(self):
+        """
+        Recalcula los contadores de respuestas desde la base de datos con una
+        única consulta agregada y los persiste.
+        """
+        resumen = self.answers.aggregate(
+            total=models.Count('id_answer'),
+            malas=models.Count('id_answer', filter=models.Q(estado='malo')),
+            criticas_malas=models.Count('id_answer', filter=models.Q(estado='malo', item__es_critico=True)),
+        )
+        self.total_respuestas = resumen['total']
+        self.respuestas_malas = resumen['malas']
+        self.respuestas_criticas_malas = resumen['criticas_malas']
+        self.save(update_fields=['total_respuestas', 'respuestas_malas', 'respuestas_criticas_malas'])
     
     class Meta:
         ordering = ['-fecha_inspeccion']
+        indexes = [
+            models.Index(fields=['equipo', 'fecha_inspeccion'], name='chkinst_equipo_fecha_idx'),
+        ]
 
 class ChecklistAnswer(models.Model):
     """
@@ -152,6 +184,9 @@ class ChecklistAnswer(models.Model):
     class Meta:
         unique_together = ('instance', 'item')
         ordering = ['item__orden']
+        indexes = [
+            models.Index(fields=['estado', 'item'], name='chkans_estado_item_idx'),
+        ]
 
 # --- NUEVOS MODELOS PARA AGENDA DE MANTENIMIENTO PREVENTIVO ---
 
@@ -275,6 +310,82 @@ class OrdenesTrabajo(models.Model):
     class Meta: 
         db_table = 'ordenestrabajo'
         ordering = ['-fechacreacionot']
+        indexes = [
+            # Columna de igualdad primero y la de rango al final
+            models.Index(fields=['idestadoot', 'fechaejecucion'], name='ot_estado_fejecucion_idx'),
+            models.Index(fields=['idequipo', 'fechacreacionot'], name='ot_equipo_fcreacion_idx'),
+        ]
+
+class SecuenciasOT(models.Model):
+    """
+    Último correlativo entregado para cada prefijo de número de OT.
+    Los números se reservan por bloques (ver secuencias_ot.py).
+    """
+    prefijo = models.CharField(db_column='Prefijo', primary_key=True, max_length=20)
+    ultimovalor = models.BigIntegerField(db_column='UltimoValor', default=0)
+
+    def __str__(self): return f"{self.prefijo}: {self.ultimovalor}"
+    class Meta:
+        db_table = 'secuenciasot'
+
+class HistorialHorometro(models.Model):
+    """
+    Serie de tiempo de las lecturas de horómetro de cada equipo. Sólo se
+    agregan filas: las correcciones se registran como una lectura nueva.
+    """
+    ORIGENES = [('checklist', 'Checklist'), ('ot', 'Orden de trabajo'), ('manual', 'Manual')]
+
+    idhistorial = models.BigAutoField(db_column='IDHistorial', primary_key=True)
+    idequipo = models.ForeignKey(Equipos, on_delete=models.CASCADE, db_column='IDEquipo', related_name='historial_horometro')
+    horometro = models.IntegerField(db_column='Horometro')
+    fechalectura = models.DateTimeField(db_column='FechaLectura')
+    origen = models.CharField(db_column='Origen', max_length=20, choices=ORIGENES)
+    idreferencia = models.IntegerField(db_column='IDReferencia', blank=True, null=True, help_text="ID del checklist u OT de origen")
+    idusuario = models.ForeignKey(User, on_delete=models.SET_NULL, db_column='IDUsuario', blank=True, null=True)
+    observaciones = models.TextField(db_column='Observaciones', blank=True, null=True)
+
+    def __str__(self): return f"{self.idequipo_id}: {self.horometro}h ({self.fechalectura:%Y-%m-%d})"
+    class Meta:
+        db_table = 'historialhorometro'
+        ordering = ['idequipo', 'fechalectura']
+        indexes = [
+            models.Index(fields=['idequipo', 'fechalectura'], name='horom_equipo_fecha_idx'),
+        ]
+        constraints = [
+            # Una lectura por checklist u OT, para que el relleno sea idempotente. Sin
+            # condición porque MySQL no tiene índices parciales; las lecturas manuales
+            # (idreferencia NULL) no chocan entre sí
+            models.UniqueConstraint(fields=['origen', 'idreferencia'], name='horom_origen_referencia_uniq'),
+        ]
+
+class IndicadoresDiariosEquipo(models.Model):
+    """
+    Resumen diario por equipo de fallas, reparaciones, detención, horas de
+    mantenimiento y checklists. Se mantiene desde las OTs y los checklists
+    (ver indicadores.py) y es la base de MTBF, MTTR y disponibilidad.
+    """
+    idindicador = models.BigAutoField(db_column='IDIndicador', primary_key=True)
+    idequipo = models.ForeignKey(Equipos, on_delete=models.CASCADE, db_column='IDEquipo', related_name='indicadores_diarios')
+    fecha = models.DateField(db_column='Fecha')
+    fallas = models.PositiveIntegerField(db_column='Fallas', default=0, help_text="OTs correctivas por falla reportada ese día")
+    reparaciones = models.PositiveIntegerField(db_column='Reparaciones', default=0, help_text="OTs correctivas completadas ese día")
+    minutosreparacion = models.PositiveIntegerField(db_column='MinutosReparacion', default=0)
+    minutosdetencion = models.PositiveIntegerField(db_column='MinutosDetencion', default=0, help_text="Desde la falla hasta el cierre de la OT")
+    horaspreventivo = models.FloatField(db_column='HorasPreventivo', default=0)
+    horascorrectivo = models.FloatField(db_column='HorasCorrectivo', default=0)
+    checklists = models.PositiveIntegerField(db_column='Checklists', default=0)
+    checklistsconformes = models.PositiveIntegerField(db_column='ChecklistsConformes', default=0)
+
+    def __str__(self): return f"{self.idequipo_id}: {self.fecha}"
+    class Meta:
+        db_table = 'indicadoresdiariosequipo'
+        ordering = ['idequipo', 'fecha']
+        constraints = [
+            models.UniqueConstraint(fields=['idequipo', 'fecha'], name='indicador_equipo_fecha_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['fecha'], name='indicador_fecha_idx'),
+        ]
 
 class ActividadesOrdenTrabajo(models.Model):
     """
@@ -329,11 +440,47 @@ class Agendas(models.Model):
     idplanmantenimiento = models.ForeignKey(PlanesMantenimiento, on_delete=models.CASCADE, db_column='IDPlanMantenimiento', blank=True, null=True)
     idusuarioasignado = models.ForeignKey(User, on_delete=models.SET_NULL, db_column='IDUsuarioAsignado', related_name='eventos_asignados', blank=True, null=True)
     idusuariocreador = models.ForeignKey(User, on_delete=models.PROTECT, db_column='IDUsuarioCreador', related_name='eventos_creados')
+    # Clave de los eventos generados desde planes: equipo, detalle del plan y día (ver proyeccion_agenda.py)
+    clavegeneracion = models.CharField(db_column='ClaveGeneracion', max_length=64, blank=True, null=True)
     
     def __str__(self): return f"{self.tituloevento} - {self.fechahorainicio.strftime('%Y-%m-%d %H:%M')}"
     class Meta: 
         db_table = 'agendas'
         ordering = ['fechahorainicio']
+        indexes = [
+            models.Index(fields=['tipoevento', 'fechahorainicio'], name='agenda_tipo_inicio_idx'),
+            models.Index(fields=['idequipo', 'idplanmantenimiento', 'fechahorainicio'], name='agenda_equipo_plan_ini_idx'),
+            # Calendario: solapamiento con un rango (inicio < fin del rango y fin > inicio del rango)
+            models.Index(fields=['fechahorainicio', 'fechahorafin'], name='agenda_inicio_fin_idx'),
+        ]
+        constraints = [
+            # Generar dos veces la agenda de un plan no duplica eventos. Sin condición
+            # porque MySQL no tiene índices parciales; los NULL no chocan entre sí
+            models.UniqueConstraint(fields=['clavegeneracion'], name='agenda_clave_generacion_uniq'),
+        ]
+
+
+class ExcepcionesAgenda(models.Model):
+    """
+    Excepción a una ocurrencia de un evento recurrente: la cancela o la
+    reemplaza (otro horario, título o descripción). Las ocurrencias no se
+    guardan; se calculan desde la regla (ver recurrencia.py).
+    """
+    idexcepcion = models.AutoField(db_column='IDExcepcion', primary_key=True)
+    idagenda = models.ForeignKey(Agendas, on_delete=models.CASCADE, db_column='IDAgenda', related_name='excepciones')
+    fechaocurrencia = models.DateTimeField(db_column='FechaOcurrencia', help_text="Inicio original de la ocurrencia según la regla")
+    cancelada = models.BooleanField(db_column='Cancelada', default=False)
+    fechahorainicio = models.DateTimeField(db_column='FechaHoraInicio', blank=True, null=True)
+    fechahorafin = models.DateTimeField(db_column='FechaHoraFin', blank=True, null=True)
+    tituloevento = models.CharField(db_column='TituloEvento', max_length=255, blank=True, null=True)
+    descripcionevento = models.TextField(db_column='DescripcionEvento', blank=True, null=True)
+
+    def __str__(self): return f"{self.idagenda_id} - {self.fechaocurrencia.strftime('%Y-%m-%d %H:%M')}"
+    class Meta:
+        db_table = 'excepcionesagenda'
+        constraints = [
+            models.UniqueConstraint(fields=['idagenda', 'fechaocurrencia'], name='excepcion_agenda_ocurrencia_uniq'),
+        ]
 
 
 # --- MODELO PARA EVIDENCIAS FOTOGRÁFICAS EN ÓRDENES DE TRABAJO ---
@@ -345,7 +492,11 @@ class EvidenciaOT(models.Model):
     idevidencia = models.AutoField(db_column='IDEvidencia', primary_key=True)
     idordentrabajo = models.ForeignKey(OrdenesTrabajo, on_delete=models.CASCADE, db_column='IDOrdenTrabajo', related_name='evidencias')
     descripcion = models.CharField(db_column='Descripcion', max_length=255, blank=True, null=True)
-    imagen_base64 = models.TextField(db_column='ImagenBase64', help_text="Imagen almacenada en formato Base64")
+    imagen_base64 = models.TextField(db_column='ImagenBase64', blank=True, null=True, help_text="Legado: imagen en Base64, migrada al almacén de blobs")
+    imagen_blob = models.CharField(db_column='ImagenBlob', max_length=64, blank=True, null=True, help_text="sha256 del blob de la imagen")
+    imagen_tamano = models.PositiveIntegerField(db_column='ImagenTamano', blank=True, null=True)
+    imagen_mime = models.CharField(db_column='ImagenMime', max_length=100, blank=True, null=True)
+    imagen_miniatura = models.CharField(db_column='ImagenMiniatura', max_length=64, blank=True, null=True, help_text="sha256 del blob de la miniatura")
     fecha_subida = models.DateTimeField(db_column='FechaSubida', auto_now_add=True)
     usuario_subida = models.ForeignKey(User, on_delete=models.PROTECT, db_column='UsuarioSubida', null=True, blank=True)
     
@@ -366,7 +517,11 @@ class ChecklistImage(models.Model):
     id_imagen = models.AutoField(primary_key=True)
     instance = models.ForeignKey(ChecklistInstance, on_delete=models.CASCADE, related_name='imagenes')
     descripcion = models.CharField(max_length=255, blank=True, null=True, help_text="Descripción opcional de la imagen")
-    imagen_base64 = models.TextField(help_text="Imagen almacenada en formato Base64")
+    imagen_base64 = models.TextField(blank=True, null=True, help_text="Legado: imagen en Base64, migrada al almacén de blobs")
+    imagen_blob = models.CharField(max_length=64, blank=True, null=True, help_text="sha256 del blob de la imagen")
+    imagen_tamano = models.PositiveIntegerField(blank=True, null=True)
+    imagen_mime = models.CharField(max_length=100, blank=True, null=True)
+    imagen_miniatura = models.CharField(max_length=64, blank=True, null=True, help_text="sha256 del blob de la miniatura")
     fecha_subida = models.DateTimeField(auto_now_add=True)
     usuario_subida = models.ForeignKey(User, on_delete=models.PROTECT)
     
@@ -0,0 +1,85 @@
+# cmms_api/optimizacion_consultas.py
+# select_related / prefetch_related derivados de los `source` de un serializer
+
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def _relaciones_por_accesor(modelo):
+    """Mapa nombre de acceso -> campo de relación (incluye relaciones inversas)."""
+    relaciones = {}
+    for campo in modelo._meta.get_fields():
+        if not campo.is_relation:
+            continue
+        if campo.auto_created and not campo.concrete:
+            relaciones[campo.get_accessor_name()] = campo
+        else:
+            relaciones[campo.name] = campo
+    return relaciones
+
+
+def _recolectar(serializer, modelo, prefijo, select, prefetch):
+    for campo in serializer.fields.values():
+        if campo.write_only or campo.source == '*':
+            continue
+
+        actual = modelo
+        ruta = prefijo
+        for parte in campo.source_attrs:
+            relacion = _relaciones_por_accesor(actual).get(parte)
+            if relacion is None:
+                break  # Atributo simple o método (p. ej. get_full_name)
+            ruta = f'{ruta}__{parte}' if ruta else parte
+
+            if relacion.many_to_many or relacion.one_to_many:
+                hijo = getattr(campo, 'child', None)
+                if isinstance(hijo, serializers.BaseSerializer) and parte == campo.source_attrs[-1]:
+                    prefetch[ruta] = Prefetch(
+                        ruta,
+                        queryset=optimizar_queryset(relacion.related_model._default_manager.all(), hijo)
+                    )
+                else:
+                    prefetch.setdefault(ruta, ruta)
+                break
+
+            actual = relacion.related_model
+            if parte == campo.source_attrs[-1] and not isinstance(campo, serializers.BaseSerializer):
+                # Sólo se usa la clave primaria, que ya está en la fila
+                break
+            select.add(ruta)
+        else:
+            if isinstance(campo, serializers.Serializer):
+                _recolectar(campo, actual, ruta, select, prefetch)
+
+
+def optimizar_queryset(queryset, serializer):
+    """
+    Aplica al queryset los `select_related` y `prefetch_related` que necesita
+    el serializer (clase o instancia) según los `source` de sus campos:
+
+    - Cadenas de ForeignKey / OneToOne (p. ej. `idequipo.nombreequipo`) se
+      resuelven con `select_related`.
+    - Relaciones a muchos se resuelven con `prefetch_related`; si el campo es
+      un serializer anidado, su propio queryset se optimiza recursivamente.
+
+    Los campos pesados que el serializer nunca lee (`Meta.campos_diferidos`)
+    se excluyen del SELECT, también en los querysets anidados.
+
+    Así el número de consultas de un listado no depende de la cantidad de filas.
+    """
+    if isinstance(serializer, type):
+        serializer = serializer()
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+
+    diferidos = getattr(getattr(serializer, 'Meta', None), 'campos_diferidos', None)
+    if diferidos:
+        queryset = queryset.defer(*diferidos)
+
+    select, prefetch = set(), {}
+    _recolectar(serializer, queryset.model, '', select, prefetch)
+    if select:
+        queryset = queryset.select_related(*sorted(select))
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch.values())
+    return queryset
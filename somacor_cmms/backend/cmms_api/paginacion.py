@@ -0,0 +1,226 @@
+# cmms_api/paginacion.py
+# Paginación por cursor (keyset): la página siguiente se pide por los valores de la última fila, sin OFFSET
+
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework import exceptions
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+MODOS_CONTEO = ('exact', 'estimate', 'none')
+# Con ?count=estimate y filtros, se cuentan como máximo estas filas
+TOPE_CONTEO_ESTIMADO = 10000
+
+
+def codificar_cursor(valores, anterior=False):
+    """
+    Cursor opaco (base64 de URL) con los valores de orden de una fila; con
+    `anterior=True` apunta a las filas que la preceden.
+    """
+    texto = json.dumps({'v': valores, 'a': anterior}, default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor, cantidad):
+    """
+    (valores, anterior) de un cursor de `cantidad` campos. Lanza `ValueError`
+    si no es válido.
+    """
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno).decode('utf-8'))
+        valores, anterior = datos['v'], datos['a']
+    except (ValueError, UnicodeDecodeError, TypeError, KeyError):
+        raise ValueError('Cursor inválido')
+    if not isinstance(valores, list) or len(valores) != cantidad:
+        raise ValueError('Cursor inválido')
+    return valores, bool(anterior)
+
+
+def invertir_orden(orden):
+    return tuple(campo[1:] if campo.startswith('-') else f'-{campo}' for campo in orden)
+
+
+def filtro_despues_de(orden, valores):
+    """
+    Condición de las filas que siguen a `valores` según `orden` (nombres de
+    campo, con '-' para descendente). Para ('-a', '-b'):
+    a < va OR (a = va AND b < vb).
+    """
+    condicion = Q()
+    iguales = Q()
+    for campo, valor in zip(orden, valores):
+        nombre = campo.lstrip('-')
+        operador = 'lt' if campo.startswith('-') else 'gt'
+        condicion |= iguales & Q(**{f'{nombre}__{operador}': valor})
+        iguales &= Q(**{nombre: valor})
+    return condicion
+
+
+def pagina_keyset(queryset, orden, cursor=None, tamano=50):
+    """
+    Una página del queryset ordenado por `orden`, que debe terminar en una
+    columna única (p. ej. la clave primaria) para que el orden sea total, y
+    no incluir columnas nulas. Retorna (filas, cursor siguiente, cursor
+    anterior); los cursores son None en los extremos.
+
+    Cada página es una consulta con un filtro por índice y LIMIT, sin OFFSET
+    ni COUNT, así que cuesta lo mismo al principio que al final de la tabla.
+    Las páginas anteriores se leen en el orden inverso y se dan vuelta.
+    """
+    valores, anterior = decodificar_cursor(cursor, len(orden)) if cursor else (None, False)
+    recorrido = invertir_orden(orden) if anterior else tuple(orden)
+    if valores is not None:
+        try:
+            queryset = queryset.filter(filtro_despues_de(recorrido, valores))
+        except (ValidationError, TypeError):
+            # Valores que no corresponden al tipo de las columnas
+            raise ValueError('Cursor inválido')
+    filas = list(queryset.order_by(*recorrido)[:tamano + 1])
+    hay_mas = len(filas) > tamano
+    filas = filas[:tamano]
+    if anterior:
+        filas.reverse()
+    if not filas:
+        return filas, None, None
+
+    # Hacia adelante hay página anterior si se llegó con un cursor; hacia atrás, siempre hay siguiente
+    hay_siguiente = hay_mas if not anterior else True
+    hay_anterior = hay_mas if anterior else valores is not None
+    siguiente = codificar_cursor(_valores(filas[-1], orden)) if hay_siguiente else None
+    previo = codificar_cursor(_valores(filas[0], orden), anterior=True) if hay_anterior else None
+    return filas, siguiente, previo
+
+
+def _valores(fila, orden):
+    valores = []
+    for campo in orden:
+        nombre = campo.lstrip('-')
+        valor = fila[nombre] if isinstance(fila, dict) else getattr(fila, nombre)
+        valores.append(valor.isoformat() if hasattr(valor, 'isoformat') else valor)
+    return valores
+
+
+def _filas_tabla(modelo):
+    """Filas de la tabla según las estadísticas del motor, o None si no las entrega."""
+    conexion = connections[modelo.objects.db]
+    tabla = modelo._meta.db_table
+    with conexion.cursor() as cursor:
+        if conexion.vendor == 'mysql':
+            cursor.execute(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES '
+                'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s', [tabla]
+            )
+        elif conexion.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)', [tabla])
+        else:
+            return None
+        fila = cursor.fetchone()
+    if fila is None or fila[0] is None or fila[0] < 0:
+        return None
+    return int(fila[0])
+
+
+def contar(queryset, modo):
+    """
+    Cantidad de filas del queryset según `modo`:
+
+    - `exact`: COUNT(*).
+    - `estimate`: sin filtros, las estadísticas de la tabla (MySQL y
+      PostgreSQL); si no, un COUNT que se detiene en `TOPE_CONTEO_ESTIMADO`.
+    - `none`: no cuenta y retorna None.
+    """
+    if modo == 'none':
+        return None
+    queryset = queryset.order_by()
+    if modo == 'estimate':
+        if not queryset.query.where:
+            estimado = _filas_tabla(queryset.model)
+            if estimado is not None:
+                return estimado
+        return queryset[:TOPE_CONTEO_ESTIMADO].count()
+    return queryset.count()
+
+
+class PaginacionCursor(BasePagination):
+    """
+    Paginación por cursor para las colecciones grandes (checklists, OTs,
+    agenda, evidencias). La vista declara el orden en `orden_paginacion`,
+    terminado en la clave primaria. Entrega `count`, `next`, `previous` y
+    `results` como PageNumberPagination. `count` es exacto por defecto;
+    `?count=estimate` lo aproxima y `?count=none` evita el COUNT (es null).
+
+    Parámetros: `cursor`, `limite` (por defecto PAGE_SIZE, máximo
+    `limite_maximo`) y `count`. `?page=` se rechaza con 400 para que los
+    clientes de la paginación por número no reciban la primera página sin
+    saberlo.
+    """
+    cursor_query_param = 'cursor'
+    limite_query_param = 'limite'
+    conteo_query_param = 'count'
+    limite_maximo = 200
+    orden = ('-pk',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        params = request.query_params
+        orden = getattr(view, 'orden_paginacion', self.orden)
+        if 'page' in params:
+            raise exceptions.ValidationError(
+                {'error': 'Este listado se pagina por cursor: use el enlace next/previous en lugar de page'}
+            )
+        modo = params.get(self.conteo_query_param, 'exact')
+        if modo not in MODOS_CONTEO:
+            raise exceptions.ValidationError({'error': f'count debe ser uno de: {", ".join(MODOS_CONTEO)}'})
+        try:
+            limite = int(params.get(self.limite_query_param, api_settings.PAGE_SIZE))
+        except ValueError:
+            limite = 0
+        if not 1 <= limite <= self.limite_maximo:
+            raise exceptions.ValidationError({'error': f'limite debe estar entre 1 y {self.limite_maximo}'})
+
+        try:
+            filas, self.siguiente, self.anterior = pagina_keyset(
+                queryset, orden, cursor=params.get(self.cursor_query_param), tamano=limite
+            )
+        except ValueError:
+            raise exceptions.ValidationError({'error': 'Cursor inválido'})
+        self.cantidad = contar(queryset, modo)
+        return filas
+
+    def _enlace(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self._enlace(self.siguiente)
+
+    def get_previous_link(self):
+        return self._enlace(self.anterior)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.cantidad,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['count', 'results'],
+            'properties': {
+                'count': {'type': 'integer', 'nullable': True},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
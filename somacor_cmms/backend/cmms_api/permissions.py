@@ -1,75 +1,46 @@
 # cmms_api/permissions.py
 
 from rest_framework import permissions
-from .models import Usuarios
+from .roles import obtener_nombre_rol
 
-class IsAdminRole(permissions.BasePermission):
+class RolPermission(permissions.BasePermission):
     """
-    Permiso personalizado para permitir acceso solo a usuarios con rol de Admin o Administrador.
+    Base para los permisos por rol: permite el acceso si el rol CMMS del
+    usuario está en `roles_permitidos`. El rol se resuelve una vez por request.
     """
+    roles_permitidos = ()
+
     def has_permission(self, request, view):
         if not request.user or not request.user.is_authenticated:
             return False
-        
-        try:
-            usuario = Usuarios.objects.get(user=request.user)
-            return usuario.idrol.nombrerol in ['Admin', 'Administrador']
-        except Usuarios.DoesNotExist:
-            return False
+        return obtener_nombre_rol(request) in self.roles_permitidos
+
+class IsAdminRole(RolPermission):
+    """
+    Permiso personalizado para permitir acceso solo a usuarios con rol de Admin o Administrador.
+    """
+    roles_permitidos = ('Admin', 'Administrador')
 
-class IsSupervisorRole(permissions.BasePermission):
+class IsSupervisorRole(RolPermission):
     """
     Permiso personalizado para permitir acceso solo a usuarios con rol de Supervisor.
     """
-    def has_permission(self, request, view):
-        if not request.user or not request.user.is_authenticated:
-            return False
-        
-        try:
-            usuario = Usuarios.objects.get(user=request.user)
-            return usuario.idrol.nombrerol == 'Supervisor'
-        except Usuarios.DoesNotExist:
-            return False
+    roles_permitidos = ('Supervisor',)
 
-class IsOperadorRole(permissions.BasePermission):
+class IsOperadorRole(RolPermission):
     """
     Permiso personalizado para permitir acceso solo a usuarios con rol de Operador.
     """
-    def has_permission(self, request, view):
-        if not request.user or not request.user.is_authenticated:
-            return False
-        
-        try:
-            usuario = Usuarios.objects.get(user=request.user)
-            return usuario.idrol.nombrerol == 'Operador'
-        except Usuarios.DoesNotExist:
-            return False
+    roles_permitidos = ('Operador',)
 
-class IsAdminOrSupervisorRole(permissions.BasePermission):
+class IsAdminOrSupervisorRole(RolPermission):
     """
     Permiso personalizado para permitir acceso a usuarios con rol de Admin, Administrador o Supervisor.
     """
-    def has_permission(self, request, view):
-        if not request.user or not request.user.is_authenticated:
-            return False
-        
-        try:
-            usuario = Usuarios.objects.get(user=request.user)
-            return usuario.idrol.nombrerol in ['Admin', 'Administrador', 'Supervisor']
-        except Usuarios.DoesNotExist:
-            return False
+    roles_permitidos = ('Admin', 'Administrador', 'Supervisor')
 
-class IsAnyRole(permissions.BasePermission):
+class IsAnyRole(RolPermission):
     """
     Permiso personalizado para permitir acceso a cualquier usuario autenticado con rol asignado.
     """
-    def has_permission(self, request, view):
-        if not request.user or not request.user.is_authenticated:
-            return False
-        
-        try:
-            usuario = Usuarios.objects.get(user=request.user)
-            return usuario.idrol.nombrerol in ['Admin', 'Administrador', 'Supervisor', 'Operador', 'Técnico']
-        except Usuarios.DoesNotExist:
-            return False
-
+    roles_permitidos = ('Admin', 'Administrador', 'Supervisor', 'Operador', 'Técnico')
@@ -0,0 +1,306 @@
+# cmms_api/proyeccion_agenda.py
+# Proyección vectorizada de mantenciones preventivas sobre un horizonte de días
+
+import datetime
+
+import numpy as np
+from django.utils import timezone
+from .models import Equipos, DetallesPlanMantenimiento, Agendas
+from . import dashboard
+
+TIPO_EVENTO_PREVENTIVO = 'Mantenimiento Preventivo'
+HORA_INICIO_EVENTO = datetime.time(8, 0)
+TAMANO_LOTE_INSERCION = 1000
+
+
+def proyectar_vencimientos(horometros, intervalos, tasas, dias_horizonte):
+    """
+    Calcula de una vez todos los vencimientos de un conjunto de pares
+    (equipo, tarea) dentro del horizonte.
+
+    Recibe arreglos paralelos con el horómetro actual, el intervalo en horas y
+    la tasa de uso (horas/día) de cada par. Retorna tres arreglos paralelos,
+    uno por vencimiento: índice del par, días desde hoy y horómetro estimado.
+    La regla es la misma del cálculo iterativo: el primer vencimiento es el
+    siguiente múltiplo del intervalo (hoy mismo si el horómetro cae justo en
+    uno) y el día es la parte entera de horas / tasa.
+    """
+    horometros = np.asarray(horometros, dtype=float)
+    intervalos = np.asarray(intervalos, dtype=float)
+    tasas = np.asarray(tasas, dtype=float)
+
+    validos = (intervalos > 0) & (tasas > 0)
+    intervalos = np.where(validos, intervalos, 1.0)
+    tasas = np.where(validos, tasas, 1.0)
+
+    primero = np.mod(intervalos - np.mod(horometros, intervalos), intervalos)
+    # int(horas / tasa) <= dias_horizonte  <=>  horas < (dias_horizonte + 1) * tasa
+    capacidad = (dias_horizonte + 1) * tasas
+    cantidades = np.ceil(np.maximum(capacidad - primero, 0) / intervalos).astype(np.int64)
+    cantidades[~validos] = 0
+
+    indices = np.repeat(np.arange(len(cantidades)), cantidades)
+    inicio_grupo = np.repeat(np.cumsum(cantidades) - cantidades, cantidades)
+    pasos = np.arange(len(indices)) - inicio_grupo
+
+    horas = primero[indices] + pasos * intervalos[indices]
+    dias = np.floor(horas / tasas[indices]).astype(np.int64)
+    dentro = dias <= dias_horizonte
+    return indices[dentro], dias[dentro], (horometros[indices] + horas)[dentro]
+
+
+def clave_evento(equipo_id, detalle_id, fecha):
+    """Clave de idempotencia de un vencimiento: equipo, detalle del plan y día."""
+    return f"{equipo_id}:{detalle_id}:{fecha:%Y%m%d}"
+
+
+def eventos_por_clave(claves, *campos):
+    """
+    Lee los eventos con esas claves de generación, por lotes para no exceder
+    el límite de parámetros del motor. Retorna {clave: fila de `values(*campos)`}.
+    """
+    claves = list(claves)
+    eventos = {}
+    for inicio in range(0, len(claves), TAMANO_LOTE_INSERCION):
+        for fila in Agendas.objects.filter(
+            clavegeneracion__in=claves[inicio:inicio + TAMANO_LOTE_INSERCION]
+        ).values('clavegeneracion', *campos):
+            eventos[fila['clavegeneracion']] = fila
+    return eventos
+
+
+def _inicio_dia(fecha):
+    return timezone.make_aware(datetime.datetime.combine(fecha, datetime.time.min))
+
+
+def _inicio_evento(fecha):
+    return timezone.make_aware(datetime.datetime.combine(fecha, HORA_INICIO_EVENTO))
+
+
+class AgendaExistente:
+    """
+    Eventos ya agendados en un rango de días, leídos con una sola consulta,
+    para decidir en memoria si un vencimiento ya tiene evento.
+
+    Un vencimiento está agendado si su clave de generación existe, o (para
+    eventos anteriores a las claves) si hay un evento del mismo equipo, plan y
+    día cuyo título contiene el nombre de la tarea.
+    """
+
+    def __init__(self, eventos, desde, hasta):
+        self.claves = set()
+        self.titulos = {}  # (equipo, plan, día) -> títulos en minúsculas
+        for clave, equipo_id, plan_id, fecha_hora, titulo in eventos.filter(
+            fechahorainicio__gte=_inicio_dia(desde),
+            fechahorainicio__lt=_inicio_dia(hasta + datetime.timedelta(days=1))
+        ).order_by().values_list(
+            'clavegeneracion', 'idequipo', 'idplanmantenimiento', 'fechahorainicio', 'tituloevento'
+        ):
+            if clave:
+                self.claves.add(clave)
+            self.titulos.setdefault(
+                (equipo_id, plan_id, timezone.localtime(fecha_hora).date()), []
+            ).append(titulo.lower())
+
+    def contiene(self, clave, equipo_id, plan_id, fecha, tarea):
+        if clave in self.claves:
+            return True
+        tarea = tarea.lower()
+        return any(tarea in titulo for titulo in self.titulos.get((equipo_id, plan_id, fecha), ()))
+
+    def agregar(self, clave, equipo_id, plan_id, fecha, titulo):
+        self.claves.add(clave)
+        self.titulos.setdefault((equipo_id, plan_id, fecha), []).append(titulo.lower())
+
+
+def generar_agenda_preventiva(equipos=None, dias_adelante=30, horas_diarias=8, usuario=None,
+                              horometros=None, tasas=None):
+    """
+    Genera los eventos de mantención preventiva de los equipos indicados
+    (queryset; por defecto todos los activos) para los próximos días.
+
+    Carga equipos (con su horómetro y tasa de uso, ver horometros.py) y
+    detalles de planes con dos consultas, proyecta todos los vencimientos con
+    `proyectar_vencimientos`, descarta los que ya tienen evento con una única
+    consulta sobre la agenda del horizonte y crea el resto con `bulk_create`.
+
+    `horometros` y `tasas` ({equipo_id: valor}) reemplazan los valores
+    guardados en los equipos; los equipos sin tasa estimada usan `horas_diarias`.
+
+    Retorna la cantidad de eventos creados.
+    """
+    if equipos is None:
+        equipos = Equipos.objects.filter(activo=True)
+    filas_equipos = list(equipos.order_by().values(
+        'idequipo', 'nombreequipo', 'idtipoequipo', 'horometroactual', 'tasausodiaria'
+    ))
+    if not filas_equipos:
+        return 0
+
+    detalles_por_tipo = {}
+    detalles = DetallesPlanMantenimiento.objects.filter(
+        activo=True,
+        idplanmantenimiento__activo=True,
+        idplanmantenimiento__idtipoequipo__in={e['idtipoequipo'] for e in filas_equipos}
+    ).values(
+        'iddetalleplan', 'idplanmantenimiento', 'idplanmantenimiento__idtipoequipo', 'intervalohorasoperacion',
+        'escritic', 'idtareaestandar__nombretarea', 'idtareaestandar__tiempoestimadominutos'
+    )
+    for detalle in detalles:
+        detalles_por_tipo.setdefault(detalle['idplanmantenimiento__idtipoequipo'], []).append(detalle)
+
+    horometros = horometros or {}
+    tasas = tasas or {}
+
+    # Un par por (equipo, detalle), en arreglos paralelos
+    pares = [
+        (equipo, detalle)
+        for equipo in filas_equipos
+        for detalle in detalles_por_tipo.get(equipo['idtipoequipo'], [])
+    ]
+    if not pares:
+        return 0
+
+    indices, dias, horometros_estimados = proyectar_vencimientos(
+        [horometros.get(equipo['idequipo'], equipo['horometroactual']) for equipo, _ in pares],
+        [detalle['intervalohorasoperacion'] or 0 for _, detalle in pares],
+        [tasas.get(equipo['idequipo']) or equipo['tasausodiaria'] or horas_diarias for equipo, _ in pares],
+        dias_adelante
+    )
+
+    hoy = timezone.localdate()
+    existentes = AgendaExistente(
+        Agendas.objects.filter(idequipo__in=equipos), hoy, hoy + datetime.timedelta(days=dias_adelante)
+    )
+
+    # Fecha y hora de inicio de cada día del horizonte, calculadas una sola vez
+    inicios_por_dia = [
+        _inicio_evento(hoy + datetime.timedelta(days=dia)) for dia in range(dias_adelante + 1)
+    ]
+
+    nuevos = []
+    for indice, dia, horometro_estimado in zip(indices.tolist(), dias.tolist(), horometros_estimados.tolist()):
+        equipo, detalle = pares[indice]
+        tarea = detalle['idtareaestandar__nombretarea']
+        fecha_hora_inicio = inicios_por_dia[dia]
+        fecha = fecha_hora_inicio.date()
+        clave = clave_evento(equipo['idequipo'], detalle['iddetalleplan'], fecha)
+        if existentes.contiene(clave, equipo['idequipo'], detalle['idplanmantenimiento'], fecha, tarea):
+            continue
+
+        titulo = f"Mantenimiento {tarea} - {equipo['nombreequipo']}"
+        existentes.agregar(clave, equipo['idequipo'], detalle['idplanmantenimiento'], fecha, titulo)
+        nuevos.append(Agendas(
+            tituloevento=titulo,
+            fechahorainicio=fecha_hora_inicio,
+            fechahorafin=fecha_hora_inicio + datetime.timedelta(
+                minutes=detalle['idtareaestandar__tiempoestimadominutos'] or 60
+            ),
+            descripcionevento=(
+                f"Mantenimiento preventivo programado cada {detalle['intervalohorasoperacion']} horas. "
+                f"Horometro estimado: {int(horometro_estimado)}h"
+            ),
+            tipoevento=TIPO_EVENTO_PREVENTIVO,
+            colorevento="#dc3545" if detalle['escritic'] else "#28a745",
+            idequipo_id=equipo['idequipo'],
+            idplanmantenimiento_id=detalle['idplanmantenimiento'],
+            idusuariocreador=usuario,
+            clavegeneracion=clave
+        ))
+
+    # Con ignore_conflicts una ejecución concurrente no falla por las claves repetidas
+    Agendas.objects.bulk_create(nuevos, batch_size=TAMANO_LOTE_INSERCION, ignore_conflicts=True)
+    if nuevos:
+        # bulk_create no dispara post_save
+        dashboard.invalidar('agenda')
+    return len(nuevos)
+
+
+def programar_proximos_vencimientos(plan, usuario, horas_diarias=8):
+    """
+    Agenda el próximo vencimiento de cada tarea activa del plan para cada
+    equipo activo de su tipo, con un número fijo de consultas: equipos,
+    detalles, agenda existente, inserción por lote y relectura de lo creado.
+
+    El vencimiento es el siguiente múltiplo del intervalo (hoy si el
+    horómetro cae justo en uno) a la tasa de uso del equipo, o a
+    `horas_diarias` si aún no tiene tasa estimada. Los vencimientos que ya
+    están agendados se omiten, así que llamarla de nuevo no duplica eventos.
+
+    Retorna (eventos, omitidos): los eventos creados como diccionarios, en el
+    orden de equipos e intervalos, y la cantidad de vencimientos ya agendados.
+    """
+    equipos = list(Equipos.objects.filter(
+        idtipoequipo=plan.idtipoequipo_id, activo=True
+    ).values('idequipo', 'nombreequipo', 'horometroactual', 'tasausodiaria'))
+    detalles = list(DetallesPlanMantenimiento.objects.filter(
+        idplanmantenimiento=plan, activo=True, intervalohorasoperacion__gt=0
+    ).order_by('intervalohorasoperacion').values(
+        'iddetalleplan', 'intervalohorasoperacion',
+        'idtareaestandar__nombretarea', 'idtareaestandar__tiempoestimadominutos'
+    ))
+    if not equipos or not detalles:
+        return [], 0
+
+    hoy = timezone.localdate()
+    vencimientos = []
+    for equipo in equipos:
+        for detalle in detalles:
+            intervalo = detalle['intervalohorasoperacion']
+            horas_restantes = (intervalo - (equipo['horometroactual'] or 0) % intervalo) % intervalo
+            dias = int(horas_restantes / (equipo['tasausodiaria'] or horas_diarias))
+            fecha = hoy + datetime.timedelta(days=dias)
+            vencimientos.append((clave_evento(equipo['idequipo'], detalle['iddetalleplan'], fecha), equipo, detalle, fecha))
+
+    existentes = AgendaExistente(
+        Agendas.objects.filter(idplanmantenimiento=plan), hoy, max(v[3] for v in vencimientos)
+    )
+
+    nuevos = []
+    for clave, equipo, detalle, fecha in vencimientos:
+        tarea = detalle['idtareaestandar__nombretarea']
+        if existentes.contiene(clave, equipo['idequipo'], plan.pk, fecha, tarea):
+            continue
+        titulo = f"Mantenimiento {tarea} - {equipo['nombreequipo']}"
+        existentes.agregar(clave, equipo['idequipo'], plan.pk, fecha, titulo)
+        inicio = _inicio_evento(fecha)
+        nuevos.append(Agendas(
+            tituloevento=titulo,
+            fechahorainicio=inicio,
+            fechahorafin=inicio + datetime.timedelta(minutes=detalle['idtareaestandar__tiempoestimadominutos'] or 60),
+            descripcionevento=f"Mantenimiento preventivo programado cada {detalle['intervalohorasoperacion']} horas",
+            tipoevento=TIPO_EVENTO_PREVENTIVO,
+            colorevento="#28a745",
+            idequipo_id=equipo['idequipo'],
+            idplanmantenimiento=plan,
+            idusuariocreador=usuario,
+            clavegeneracion=clave
+        ))
+    if not nuevos:
+        return [], len(vencimientos)
+
+    # No todos los motores devuelven las claves primarias de un bulk_create con
+    # ignore_conflicts: los eventos creados se releen por su clave
+    Agendas.objects.bulk_create(nuevos, batch_size=TAMANO_LOTE_INSERCION, ignore_conflicts=True)
+    dashboard.invalidar('agenda')
+    creados = eventos_por_clave(
+        [evento.clavegeneracion for evento in nuevos],
+        'idagenda', 'tituloevento', 'fechahorainicio', 'fechahorafin', 'tipoevento'
+    )
+
+    eventos = []
+    for clave, equipo, detalle, _ in vencimientos:
+        fila = creados.get(clave)
+        if fila is None:
+            continue
+        eventos.append({
+            'id': fila['idagenda'],
+            'tituloevento': fila['tituloevento'],
+            'fechahorainicio': fila['fechahorainicio'],
+            'fechahorafin': fila['fechahorafin'],
+            'tipoevento': fila['tipoevento'],
+            'equipo': equipo['nombreequipo'],
+            'tarea': detalle['idtareaestandar__nombretarea'],
+            'intervalo': detalle['intervalohorasoperacion']
+        })
+    return eventos, len(vencimientos) - len(nuevos)
@@ -0,0 +1,147 @@
+# cmms_api/recurrencia.py
+# Expansión de eventos recurrentes de la agenda (reglas RRULE) por ventana de calendario
+
+import datetime
+from functools import lru_cache
+
+from dateutil.rrule import rrulestr
+from django.db.models import Q
+from django.utils import timezone
+from .models import ExcepcionesAgenda
+
+CAMPOS_RECURRENCIA = (
+    'idagenda', 'fechahorainicio', 'fechahorafin', 'tituloevento', 'descripcionevento', 'reglarecursividad'
+)
+# Ventana usada cuando el calendario no indica fin: las reglas sin COUNT ni UNTIL no terminan
+HORIZONTE_SIN_FIN = datetime.timedelta(days=366)
+# Tope por evento y ventana (p. ej. una regla FREQ=MINUTELY sobre un año)
+MAXIMO_OCURRENCIAS = 5000
+TAMANO_CACHE_EXPANSIONES = 4096
+
+# Eventos que se expanden: marcados como recursivos y con una regla
+Q_RECURRENTE = Q(recursivo=True) & Q(reglarecursividad__isnull=False) & ~Q(reglarecursividad='')
+
+
+def interpretar_regla(regla, inicio):
+    """
+    Conjunto de ocurrencias (`rruleset` de dateutil) de una regla RFC 5545
+    anclada en `inicio`. Acepta 'FREQ=...' o 'RRULE:FREQ=...' y líneas
+    EXDATE; con inicio con zona horaria, UNTIL y EXDATE van en UTC ('...Z').
+    Lanza `ValueError` si la regla no es válida.
+    """
+    # La regla se evalúa en hora local para que una ocurrencia de las 08:00 siga
+    # a las 08:00 después de un cambio de horario
+    return rrulestr(regla.strip(), dtstart=timezone.localtime(inicio), forceset=True)
+
+
+@lru_cache(maxsize=TAMANO_CACHE_EXPANSIONES)
+def _inicios(regla, inicio, desde, hasta):
+    # La clave incluye la regla y el inicio del evento: si el evento cambia la
+    # clave es otra, así que el caché no necesita invalidación
+    ocurrencias = []
+    for ocurrencia in interpretar_regla(regla, inicio).xafter(desde, count=MAXIMO_OCURRENCIAS):
+        if ocurrencia >= hasta:
+            break
+        ocurrencias.append(ocurrencia)
+    return tuple(ocurrencias)
+
+
+def _se_solapa(inicio, fin, desde, hasta):
+    return inicio < hasta and fin > desde
+
+
+def expandir(evento, desde, hasta, excepciones=None):
+    """
+    Ocurrencias de un evento recurrente que se solapan con [desde, hasta),
+    ordenadas por inicio. `evento` es un diccionario con `CAMPOS_RECURRENCIA`;
+    `excepciones`, un diccionario {inicio original: fila de ExcepcionesAgenda}.
+
+    Cada ocurrencia es una copia de `evento` con el horario (y el título o
+    la descripción, si una excepción los reemplaza) de esa ocurrencia, más
+    `ocurrencia`: su inicio original según la regla. Las ocurrencias
+    canceladas se omiten. Si la regla no es válida el evento se trata como
+    uno simple.
+    """
+    duracion = evento['fechahorafin'] - evento['fechahorainicio']
+    excepciones = dict(excepciones or {})
+    try:
+        inicios = _inicios(evento['reglarecursividad'].strip(), evento['fechahorainicio'], desde - duracion, hasta)
+    except ValueError:
+        inicios = (evento['fechahorainicio'],) if _se_solapa(
+            evento['fechahorainicio'], evento['fechahorafin'], desde, hasta
+        ) else ()
+
+    ocurrencias = []
+
+    def agregar(original, excepcion):
+        fila = dict(evento, ocurrencia=original, fechahorainicio=original, fechahorafin=original + duracion)
+        if excepcion is not None:
+            if excepcion['cancelada']:
+                return
+            fila['fechahorainicio'] = excepcion['fechahorainicio'] or original
+            fila['fechahorafin'] = excepcion['fechahorafin'] or fila['fechahorainicio'] + duracion
+            fila['tituloevento'] = excepcion['tituloevento'] or fila['tituloevento']
+            fila['descripcionevento'] = excepcion['descripcionevento'] or fila['descripcionevento']
+        if _se_solapa(fila['fechahorainicio'], fila['fechahorafin'], desde, hasta):
+            ocurrencias.append(fila)
+
+    for original in inicios:
+        agregar(original, excepciones.pop(original, None))
+    # Ocurrencias movidas a la ventana desde fuera de ella
+    for original, excepcion in excepciones.items():
+        if not desde - duracion < original < hasta:
+            agregar(original, excepcion)
+
+    ocurrencias.sort(key=lambda fila: fila['fechahorainicio'])
+    return ocurrencias
+
+
+def excepciones_por_evento(eventos_ids, desde, hasta, margen=datetime.timedelta(0)):
+    """
+    Excepciones de los eventos cuya ocurrencia original o nuevo inicio cae en
+    [desde - margen, hasta), agrupadas como {idagenda: {inicio original: fila}}.
+    """
+    filas = ExcepcionesAgenda.objects.filter(idagenda__in=eventos_ids).filter(
+        Q(fechaocurrencia__gt=desde - margen, fechaocurrencia__lt=hasta)
+        | Q(fechahorainicio__gt=desde - margen, fechahorainicio__lt=hasta)
+    ).values(
+        'idagenda', 'fechaocurrencia', 'cancelada', 'fechahorainicio', 'fechahorafin',
+        'tituloevento', 'descripcionevento'
+    )
+    agrupadas = {}
+    for fila in filas:
+        agrupadas.setdefault(fila['idagenda'], {})[fila['fechaocurrencia']] = fila
+    return agrupadas
+
+
+def ocurrencias_en_rango(eventos, desde=None, hasta=None):
+    """
+    Expande los eventos recurrentes (diccionarios con al menos
+    `CAMPOS_RECURRENCIA`, p. ej. de `values()`) sobre [desde, hasta), con
+    sus excepciones cargadas en una sola consulta. Sin `desde` se parte del
+    primer evento; sin `hasta`, se expande hasta `HORIZONTE_SIN_FIN` después
+    de hoy (o de `desde`, si es posterior).
+    """
+    eventos = list(eventos)
+    if not eventos:
+        return []
+
+    if desde is None:
+        desde = min(evento['fechahorainicio'] for evento in eventos)
+    if hasta is None:
+        hasta = max(desde, timezone.now()) + HORIZONTE_SIN_FIN
+    duracion_maxima = max(evento['fechahorafin'] - evento['fechahorainicio'] for evento in eventos)
+    excepciones = excepciones_por_evento(
+        [evento['idagenda'] for evento in eventos], desde, hasta, margen=duracion_maxima
+    )
+
+    ocurrencias = []
+    for evento in eventos:
+        ocurrencias.extend(expandir(evento, desde, hasta, excepciones.get(evento['idagenda'])))
+    ocurrencias.sort(key=lambda fila: (fila['fechahorainicio'], fila['idagenda']))
+    return ocurrencias
+
+
+def es_ocurrencia(regla, inicio, fecha):
+    """Indica si `fecha` es el inicio de una ocurrencia de la regla anclada en `inicio`."""
+    return fecha in interpretar_regla(regla, inicio)
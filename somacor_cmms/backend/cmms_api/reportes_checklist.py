@@ -0,0 +1,156 @@
+# cmms_api/reportes_checklist.py
+# Motores de agregación para los reportes del módulo de checklist
+
+from django.db.models import Q, Count, Sum, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .models import ChecklistInstance, ChecklistAnswer
+from .reportes_mantenimiento import inicio_periodo, periodos_entre
+
+
+def _contar_respuestas(filtro):
+    subquery = ChecklistAnswer.objects.filter(
+        filtro, instance=OuterRef('pk')
+    ).order_by().values('instance').annotate(c=Count('pk')).values('c')
+    return Coalesce(Subquery(subquery, output_field=IntegerField()), 0)
+
+
+def recalcular_resumenes(queryset):
+    """
+    Reconstruye los contadores desnormalizados (`total_respuestas`,
+    `respuestas_malas`, `respuestas_criticas_malas`) de las instancias del
+    queryset con un único UPDATE basado en subconsultas.
+
+    Retorna la cantidad de instancias actualizadas.
+    """
+    return queryset.order_by().update(
+        total_respuestas=_contar_respuestas(Q()),
+        respuestas_malas=_contar_respuestas(Q(estado='malo')),
+        respuestas_criticas_malas=_contar_respuestas(Q(estado='malo', item__es_critico=True)),
+    )
+
+
+def conformidad_por_equipo(fecha_inicio, fecha_fin, tipo_equipo_id=None, faena_id=None, template_id=None):
+    """
+    Calcula la conformidad de checklists por equipo en el período indicado.
+
+    Todo el trabajo se resuelve en una sola consulta agrupada por equipo
+    sobre los contadores desnormalizados de `ChecklistInstance`, sin unir
+    las respuestas ni los ítems.
+
+    Retorna una tupla (total_checklists_periodo, conformidad_por_equipo) con
+    la misma forma que usa el endpoint `reportes/conformidad`.
+    """
+    queryset = ChecklistInstance.objects.filter(
+        fecha_inspeccion__range=[fecha_inicio, fecha_fin]
+    )
+
+    if tipo_equipo_id:
+        queryset = queryset.filter(equipo__idtipoequipo_id=tipo_equipo_id)
+    if faena_id:
+        queryset = queryset.filter(equipo__idfaenaactual_id=faena_id)
+    if template_id:
+        queryset = queryset.filter(template_id=template_id)
+
+    filas = queryset.order_by().values(
+        'equipo', 'equipo__nombreequipo', 'equipo__codigointerno'
+    ).annotate(
+        total_checklists=Count('id_instance'),
+        checklists_con_falla_critica=Count('id_instance', filter=Q(respuestas_criticas_malas__gt=0)),
+        fallas_criticas=Coalesce(Sum('respuestas_criticas_malas'), 0),
+        fallas_malas=Coalesce(Sum('respuestas_malas'), 0),
+    ).order_by('equipo__nombreequipo', 'equipo')
+
+    total_periodo = 0
+    resultado = {}
+    for fila in filas:
+        total = fila['total_checklists']
+        conformes = total - fila['checklists_con_falla_critica']
+        total_periodo += total
+
+        equipo_key = f"{fila['equipo__nombreequipo']} ({fila['equipo__codigointerno']})"
+        datos = resultado.setdefault(equipo_key, {
+            'total_checklists': 0,
+            'checklists_conformes': 0,
+            'fallas_criticas': 0,
+            'fallas_no_criticas': 0
+        })
+        datos['total_checklists'] += total
+        datos['checklists_conformes'] += conformes
+        datos['fallas_criticas'] += fila['fallas_criticas']
+        datos['fallas_no_criticas'] += fila['fallas_malas'] - fila['fallas_criticas']
+
+    # Calcular porcentajes (un checklist sin fallas críticas se considera conforme)
+    for datos in resultado.values():
+        total = datos['total_checklists']
+        if total > 0:
+            datos['porcentaje_conformidad'] = round(
+                (datos['checklists_conformes'] / total) * 100, 2
+            )
+        else:
+            datos['porcentaje_conformidad'] = 0
+
+    return total_periodo, resultado
+
+
+def top_elementos_fallidos(fecha_inicio, fecha_fin, limite=20, solo_criticos=None, tipo_equipo_id=None,
+                          faena_id=None, agrupacion='semana'):
+    """
+    Ítems de checklist con más respuestas "malo" en el período, ordenados por
+    cantidad de fallas, con los equipos afectados y la serie de fallas por
+    día, semana o mes (para un sparkline).
+
+    El agrupamiento, el conteo de equipos distintos y el top-K se resuelven
+    en la base de datos; los equipos y la serie se leen sólo para los ítems
+    del top. Siempre son tres consultas, sin importar el volumen.
+
+    Retorna una tupla (periodos de la serie, elementos).
+    """
+    respuestas = ChecklistAnswer.objects.filter(
+        estado='malo',
+        instance__fecha_inspeccion__range=[fecha_inicio, fecha_fin]
+    )
+    if solo_criticos is not None:
+        respuestas = respuestas.filter(item__es_critico=solo_criticos)
+    if tipo_equipo_id:
+        respuestas = respuestas.filter(instance__equipo__idtipoequipo_id=tipo_equipo_id)
+    if faena_id:
+        respuestas = respuestas.filter(instance__equipo__idfaenaactual_id=faena_id)
+    respuestas = respuestas.order_by()
+
+    top = list(
+        respuestas.values('item', 'item__texto', 'item__category__nombre', 'item__es_critico').annotate(
+            cantidad_fallas=Count('id_answer'),
+            cantidad_equipos_afectados=Count('instance__equipo', distinct=True)
+        ).order_by('-cantidad_fallas', 'item')[:limite]
+    )
+    periodos = periodos_entre(fecha_inicio, fecha_fin, agrupacion)
+    if not top:
+        return periodos, []
+
+    items = [fila['item'] for fila in top]
+    equipos = {}
+    for item, nombre in respuestas.filter(item__in=items).values_list(
+        'item', 'instance__equipo__nombreequipo'
+    ).distinct().order_by('item', 'instance__equipo__nombreequipo'):
+        equipos.setdefault(item, []).append(nombre)
+
+    posicion = {periodo: i for i, periodo in enumerate(periodos)}
+    series = {item: [0] * len(periodos) for item in items}
+    for item, fecha, cantidad in respuestas.filter(item__in=items).values_list(
+        'item', 'instance__fecha_inspeccion'
+    ).annotate(cantidad=Count('id_answer')):
+        series[item][posicion[inicio_periodo(fecha, agrupacion)]] += cantidad
+
+    return periodos, [
+        {
+            'item_id': fila['item'],
+            'elemento': fila['item__texto'],
+            'categoria': fila['item__category__nombre'],
+            'es_critico': fila['item__es_critico'],
+            'cantidad_fallas': fila['cantidad_fallas'],
+            'equipos_afectados': equipos.get(fila['item'], []),
+            'cantidad_equipos_afectados': fila['cantidad_equipos_afectados'],
+            'tendencia': series[fila['item']],
+        }
+        for fila in top
+    ]
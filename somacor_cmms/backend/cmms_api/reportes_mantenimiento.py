@@ -0,0 +1,224 @@
+# cmms_api/reportes_mantenimiento.py
+# Motor de agregación del reporte de eficiencia de mantenimiento
+#
+# Límite conocido: los percentiles (p50, p90) son exactos y se calculan en
+# Python desde un histograma que arma la base de datos, con una fila por
+# grupo y valor distinto de `tiempototalminutos` (minutos enteros). Lo que
+# viaja y se guarda en memoria crece con los grupos por las duraciones
+# distintas, no con las OTs; la base de datos sí recorre todas las OTs del
+# período. SQLite y MySQL no tienen PERCENTILE_CONT, así que no se delega.
+
+import datetime
+from collections import Counter, defaultdict
+
+import numpy as np
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from .models import OrdenesTrabajo
+from .catalogos import tipos_mantenimiento_ot
+from .consultas_criticas import rango_dias
+
+AGRUPACIONES = ('dia', 'semana', 'mes')
+
+
+def inicio_periodo(fecha, agrupacion):
+    """Primer día del período (día, semana ISO o mes) que contiene `fecha`."""
+    if agrupacion == 'semana':
+        return fecha - datetime.timedelta(days=fecha.weekday())
+    if agrupacion == 'mes':
+        return fecha.replace(day=1)
+    return fecha
+
+
+def _siguiente_periodo(fecha, agrupacion):
+    if agrupacion == 'semana':
+        return fecha + datetime.timedelta(days=7)
+    if agrupacion == 'mes':
+        return (fecha.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    return fecha + datetime.timedelta(days=1)
+
+
+def periodos_entre(fecha_inicio, fecha_fin, agrupacion):
+    """Inicios de los períodos (día, semana o mes) que cubren [fecha_inicio, fecha_fin]."""
+    periodos = []
+    periodo = inicio_periodo(fecha_inicio, agrupacion)
+    while periodo <= fecha_fin:
+        periodos.append(periodo)
+        periodo = _siguiente_periodo(periodo, agrupacion)
+    return periodos
+
+
+def percentiles_histograma(histograma, cuantiles):
+    """
+    Percentiles de los valores de un histograma {valor: cantidad}, iguales a
+    `np.percentile` (interpolación lineal) sobre la lista expandida, sin
+    expandirla.
+    """
+    valores = np.array(sorted(histograma), dtype=float)
+    acumulado = np.cumsum([histograma[valor] for valor in sorted(histograma)])
+    posiciones = np.asarray(cuantiles, dtype=float) / 100 * (acumulado[-1] - 1)
+    bajo = np.floor(posiciones)
+    a = valores[np.searchsorted(acumulado, bajo, side='right')]
+    b = valores[np.searchsorted(acumulado, np.ceil(posiciones), side='right')]
+    t = posiciones - bajo
+    # Misma interpolación que numpy, estable cerca de ambos extremos
+    return np.where(t >= 0.5, b - (b - a) * (1 - t), a + (b - a) * t)
+
+
+def _resumen(total_ots, con_tiempo, suma, minutos):
+    """
+    Estadísticas de tiempo de resolución de un grupo. `con_tiempo` y `suma`
+    cuentan sólo las OTs con tiempo informado; `minutos` es el histograma
+    {minutos: cantidad de OTs} de sus tiempos, para los percentiles.
+    """
+    if not con_tiempo:
+        return {
+            'total_ots': total_ots, 'tiempo_promedio': 0, 'tiempo_p50': None,
+            'tiempo_p90': None, 'tiempo_total': 0
+        }
+    p50, p90 = percentiles_histograma(minutos, [50, 90])
+    return {
+        'total_ots': total_ots,
+        'tiempo_promedio': suma / con_tiempo,
+        'tiempo_p50': float(p50),
+        'tiempo_p90': float(p90),
+        'tiempo_total': int(suma),
+    }
+
+
+class _Grupos:
+    """Acumula por clave la cantidad de OTs, las que informan tiempo, su suma y el histograma de sus minutos."""
+
+    def __init__(self):
+        self.total = defaultdict(int)
+        self.con_tiempo = defaultdict(int)
+        self.suma = defaultdict(int)
+        self.minutos = defaultdict(Counter)
+
+    def agregar(self, clave, total, con_tiempo, suma):
+        self.total[clave] += total
+        self.con_tiempo[clave] += con_tiempo
+        self.suma[clave] += suma or 0
+
+    def agregar_minutos(self, clave, minutos, cantidad):
+        self.minutos[clave][minutos] += cantidad
+
+    def resumen(self, clave):
+        return _resumen(
+            self.total.get(clave, 0), self.con_tiempo.get(clave, 0),
+            self.suma.get(clave, 0), self.minutos.get(clave)
+        )
+
+    def claves(self):
+        return self.total.keys()
+
+
+# Columnas que identifican cada desglose del reporte
+CLAVES_EFICIENCIA = (
+    'idtipomantenimientoot__nombretipomantenimientoot',
+    'idequipo__idfaenaactual__nombrefaena',
+    'idtecnicoasignado',
+    'idequipo__idtipoequipo__nombretipo',
+)
+TRUNCAMIENTOS = {'dia': 'day', 'semana': 'week', 'mes': 'month'}
+
+
+def eficiencia_mantenimiento(fecha_inicio, fecha_fin, agrupacion='semana'):
+    """
+    Reporte de eficiencia de las OTs completadas en [fecha_inicio, fecha_fin]:
+    cantidad, tiempo promedio, p50, p90 y total de resolución (minutos) en
+    total y por tipo de mantenimiento, faena, técnico y tipo de equipo, más
+    la tendencia por día, semana o mes.
+
+    Cantidades, sumas y promedios salen de una consulta agrupada por todas
+    las claves de desglose y el período, que retorna una fila por
+    combinación y no por OT. Los percentiles salen de una segunda consulta
+    agrupada también por `tiempototalminutos`: el histograma de cada
+    combinación (ver el límite al inicio del módulo). Retorna un
+    diccionario con la forma del endpoint `reportes/eficiencia`.
+    """
+    inicio, fin = rango_dias(fecha_inicio, fecha_fin)
+    ots = OrdenesTrabajo.objects.filter(
+        fechacompletado__gte=inicio,
+        fechacompletado__lt=fin,
+        idestadoot__nombreestadoot='Completada'
+    ).order_by().annotate(
+        periodo=Trunc(
+            'fechacompletado', TRUNCAMIENTOS[agrupacion],
+            output_field=DateField(), tzinfo=timezone.get_current_timezone()
+        )
+    )
+
+    total = _Grupos()
+    por_tipo = _Grupos()
+    por_faena = _Grupos()
+    por_tecnico = _Grupos()
+    por_tipo_equipo = _Grupos()
+    tendencia = _Grupos()
+    grupos = (total, por_tipo, por_faena, por_tecnico, por_tipo_equipo, tendencia)
+
+    def claves(tipo, faena, tecnico_id, tipo_equipo, periodo):
+        return (None, tipo, faena or 'Sin faena', tecnico_id, tipo_equipo, periodo)
+
+    # El nombre del técnico depende sólo de su id: agruparlo no agrega filas
+    nombres_tecnico = ('idtecnicoasignado__first_name', 'idtecnicoasignado__last_name', 'idtecnicoasignado__username')
+    filas = ots.values(*CLAVES_EFICIENCIA, 'periodo', *nombres_tecnico).annotate(
+        cantidad=Count('idordentrabajo'),
+        con_tiempo=Count('tiempototalminutos'),
+        suma=Sum('tiempototalminutos'),
+    ).values_list(*CLAVES_EFICIENCIA, 'periodo', *nombres_tecnico, 'cantidad', 'con_tiempo', 'suma')
+    tecnicos = {}
+    for *llave, nombre, apellido, usuario, cantidad, con_tiempo, suma in filas:
+        for grupo, clave in zip(grupos, claves(*llave)):
+            grupo.agregar(clave, cantidad, con_tiempo, suma)
+        tecnico_id = llave[2]
+        if tecnico_id is not None and tecnico_id not in tecnicos:
+            tecnicos[tecnico_id] = f'{nombre} {apellido}'.strip() or usuario
+
+    histograma = ots.filter(tiempototalminutos__isnull=False).values(
+        *CLAVES_EFICIENCIA, 'periodo', 'tiempototalminutos'
+    ).annotate(cantidad=Count('idordentrabajo')).values_list(
+        *CLAVES_EFICIENCIA, 'periodo', 'tiempototalminutos', 'cantidad'
+    )
+    for *llave, valor, cantidad in histograma.iterator(chunk_size=2000):
+        for grupo, clave in zip(grupos, claves(*llave)):
+            grupo.agregar_minutos(clave, valor, cantidad)
+
+    resumen_total = total.resumen(None)
+
+    # Todos los tipos del catálogo aparecen, aunque no tengan OTs en el período
+    nombres_tipos = sorted(set(tipos_mantenimiento_ot.nombres()) | set(por_tipo.claves()))
+
+    return {
+        'periodo': {
+            'fecha_inicio': fecha_inicio,
+            'fecha_fin': fecha_fin
+        },
+        'total_ots_completadas': resumen_total['total_ots'],
+        'tiempo_promedio_resolucion': resumen_total['tiempo_promedio'],
+        'resumen': resumen_total,
+        'eficiencia_por_tipo': {tipo: por_tipo.resumen(tipo) for tipo in nombres_tipos},
+        'por_faena': [
+            {'faena': faena, **por_faena.resumen(faena)} for faena in sorted(por_faena.claves())
+        ],
+        'por_tecnico': [
+            {
+                'tecnico_id': tecnico_id,
+                'tecnico': tecnicos.get(tecnico_id, 'Sin asignar'),
+                **por_tecnico.resumen(tecnico_id)
+            }
+            for tecnico_id in sorted(por_tecnico.claves(), key=lambda t: tecnicos.get(t, 'Sin asignar'))
+        ],
+        'por_tipo_equipo': [
+            {'tipo_equipo': tipo_equipo, **por_tipo_equipo.resumen(tipo_equipo)}
+            for tipo_equipo in sorted(por_tipo_equipo.claves())
+        ],
+        'tendencia': {
+            'agrupacion': agrupacion,
+            'periodos': [
+                {'periodo': periodo, **tendencia.resumen(periodo)}
+                for periodo in periodos_entre(fecha_inicio, fecha_fin, agrupacion)
+            ],
+        },
+    }
@@ -0,0 +1,79 @@
+# cmms_api/roles.py
+# Resolución del rol CMMS del usuario, memoizada por request y por proceso
+
+import threading
+import time
+
+from django.conf import settings
+from .models import Usuarios
+
+# Segundos que un rol resuelto se reutiliza entre requests del mismo proceso.
+# Las escrituras sobre Usuarios / Roles invalidan de inmediato en este proceso;
+# en los demás procesos el rol anterior se ve como máximo durante este lapso.
+TTL_ROLES = getattr(settings, 'CACHE_ROLES_TTL', 60)
+
+_SIN_ROL = object()
+
+
+class _CacheRoles:
+    """Caché en memoria de proceso: id de usuario -> (nombre del rol, expiración)."""
+
+    def __init__(self):
+        self._datos = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, user_id):
+        with self._lock:
+            entrada = self._datos.get(user_id)
+        if entrada is None or entrada[1] < time.monotonic():
+            return None
+        return entrada[0]
+
+    def guardar(self, user_id, nombre_rol):
+        with self._lock:
+            self._datos[user_id] = (nombre_rol, time.monotonic() + TTL_ROLES)
+
+    def invalidar(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._datos.clear()
+            else:
+                self._datos.pop(user_id, None)
+
+
+cache_roles = _CacheRoles()
+
+
+def memorizar_rol(request, nombre_rol):
+    """Memoiza en el request un rol ya resuelto (por ejemplo, por la autenticación)."""
+    request._cmms_nombre_rol = _SIN_ROL if nombre_rol is None else nombre_rol
+
+
+def obtener_nombre_rol(request):
+    """
+    Retorna el nombre del rol CMMS del usuario autenticado del request, o None
+    si no está autenticado o no tiene perfil `Usuarios`.
+
+    El rol se memoiza en el propio request, así que los chequeos de permisos
+    posteriores del mismo request no consultan la base de datos; entre
+    requests se reutiliza desde la caché de proceso.
+    """
+    memo = getattr(request, '_cmms_nombre_rol', None)
+    if memo is not None:
+        return None if memo is _SIN_ROL else memo
+
+    user = getattr(request, 'user', None)
+    if not user or not user.is_authenticated:
+        return None
+
+    nombre_rol = cache_roles.obtener(user.pk)
+    if nombre_rol is None:
+        try:
+            usuario = Usuarios.objects.select_related('idrol').get(user_id=user.pk)
+            nombre_rol = usuario.idrol.nombrerol
+        except Usuarios.DoesNotExist:
+            nombre_rol = _SIN_ROL
+        cache_roles.guardar(user.pk, nombre_rol)
+
+    request._cmms_nombre_rol = nombre_rol
+    return None if nombre_rol is _SIN_ROL else nombre_rol
@@ -0,0 +1,73 @@
+# cmms_api/secuencias_ot.py
+# Asignación de números de OT correlativos por prefijo, sin colisiones
+
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from .models import SecuenciasOT
+
+TAMANO_BLOQUE = getattr(settings, 'SECUENCIA_OT_TAMANO_BLOQUE', 20)
+
+
+class AsignadorSecuencias:
+    """
+    Entrega correlativos únicos por prefijo a partir de la tabla `SecuenciasOT`.
+
+    Cada proceso reserva un bloque de números con un único UPDATE (que bloquea
+    la fila del prefijo) y los entrega desde memoria, así que crear una OT no
+    agrega lecturas salvo cuando se agota el bloque. Los números que un proceso
+    no alcanza a usar quedan como saltos en la numeración, nunca repetidos.
+
+    Si se llama dentro de una transacción sólo se reserva el número necesario:
+    la reserva se revierte junto con la OT y no quedan en memoria números
+    cuya reserva podría deshacerse.
+    """
+
+    def __init__(self, tamano_bloque=TAMANO_BLOQUE):
+        self.tamano_bloque = tamano_bloque
+        self._bloques = {}  # prefijo -> [siguiente, ultimo]
+        self._lock = threading.Lock()
+
+    def _reservar(self, prefijo, cantidad):
+        with transaction.atomic():
+            secuencias = SecuenciasOT.objects.filter(prefijo=prefijo)
+            if not secuencias.update(ultimovalor=F('ultimovalor') + cantidad):
+                SecuenciasOT.objects.get_or_create(prefijo=prefijo)
+                secuencias.update(ultimovalor=F('ultimovalor') + cantidad)
+            ultimo = secuencias.values_list('ultimovalor', flat=True).get()
+        return ultimo - cantidad + 1, ultimo
+
+    def siguiente(self, prefijo):
+        """Retorna el siguiente correlativo del prefijo."""
+        with self._lock:
+            bloque = self._bloques.get(prefijo)
+            if bloque and bloque[0] <= bloque[1]:
+                numero = bloque[0]
+                bloque[0] += 1
+                return numero
+
+        if connection.in_atomic_block:
+            return self._reservar(prefijo, 1)[0]
+
+        inicio, ultimo = self._reservar(prefijo, self.tamano_bloque)
+        with self._lock:
+            self._bloques[prefijo] = [inicio + 1, ultimo]
+        return inicio
+
+    def descartar_bloques(self):
+        with self._lock:
+            self._bloques.clear()
+
+
+asignador = AsignadorSecuencias()
+
+
+def numero_ot(prefijo, equipo):
+    """
+    Genera el número de una nueva OT, por ejemplo `OT-CORR-MC-001-000042`.
+    La unicidad la garantiza el correlativo del prefijo; el código del equipo
+    se incluye sólo como referencia.
+    """
+    return f"OT-{prefijo}-{equipo.codigointerno or equipo.idequipo}-{asignador.siguiente(prefijo):06d}"
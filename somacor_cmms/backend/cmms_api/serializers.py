@@ -3,15 +3,22 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.db import transaction
+from django.db.models import Prefetch, Q, prefetch_related_objects
+from django.urls import reverse
 import json
+from collections import Counter
 from .models import (
     Roles, Usuarios, TiposEquipo, Faenas, EstadosEquipo, Equipos,
     ChecklistTemplate, ChecklistCategory, ChecklistItem,
     ChecklistInstance, ChecklistAnswer, ChecklistImage, TiposTarea, TareasEstandar,
     PlanesMantenimiento, DetallesPlanMantenimiento, TiposMantenimientoOT,
     EstadosOrdenTrabajo, OrdenesTrabajo, ActividadesOrdenTrabajo, Agendas,
-    EvidenciaOT
+    ExcepcionesAgenda, EvidenciaOT
 )
+from .almacen_blobs import almacen, BlobPendiente
+from .secuencias_ot import numero_ot
+from .horometros import registrar_lectura
+from .recurrencia import interpretar_regla, es_ocurrencia
 
 # --- Serializers Anteriores ---
 class RolSerializer(serializers.ModelSerializer):
@@ -112,6 +119,227 @@ class EquipoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Equipos
         fields = '__all__'
+        read_only_fields = ['fechahorometro', 'tasausodiaria']
+
+    def create(self, validated_data):
+        equipo = super().create(validated_data)
+        if equipo.horometroactual:
+            self._registrar_horometro(equipo, equipo.horometroactual)
+        return equipo
+
+    def update(self, instance, validated_data):
+        horometro = validated_data.pop('horometroactual', None)
+        equipo = super().update(instance, validated_data)
+        if horometro is not None and horometro != equipo.horometroactual:
+            self._registrar_horometro(equipo, horometro)
+        return equipo
+
+    def _registrar_horometro(self, equipo, horometro):
+        # El horómetro manual entra al historial, que recalcula lectura y tasa del equipo
+        request = self.context.get('request')
+        registrar_lectura(
+            equipo.pk, horometro, 'manual',
+            usuario_id=getattr(getattr(request, 'user', None), 'pk', None)
+        )
+        equipo.refresh_from_db(fields=['horometroactual', 'fechahorometro', 'tasausodiaria'])
+
+# --- REPRESENTACIÓN COMPACTA Y CAMPOS A PEDIDO ---
+
+def _parametro_lista(params, nombre):
+    return {campo.strip() for campo in params.get(nombre, '').split(',') if campo.strip()}
+
+class CamposDinamicosMixin:
+    """
+    Permite que un mismo serializer entregue una representación compacta en
+    los listados y la completa en el detalle:
+
+    - `Meta.campos_lista`: campos que se entregan cuando el contexto indica
+      `vista='lista'` (lo fija el viewset en la acción `list`).
+    - `?expand=a,b`: agrega al listado campos de la representación completa.
+    - `?fields=a,b`: limita la respuesta (listado o detalle) a esos campos.
+
+    Sólo afecta al serializer raíz en peticiones de lectura; los campos de
+    sólo escritura se conservan siempre.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        padre = self.parent
+        if isinstance(padre, serializers.ListSerializer):
+            padre = padre.parent
+        if request is None or padre is not None or request.method not in ('GET', 'HEAD'):
+            return fields
+
+        params = getattr(request, 'query_params', request.GET)
+        campos_lista = getattr(self.Meta, 'campos_lista', None)
+        if self.context.get('vista') == 'lista' and campos_lista:
+            visibles = set(campos_lista) | _parametro_lista(params, 'expand')
+            fields = {nombre: campo for nombre, campo in fields.items()
+                      if nombre in visibles or campo.write_only}
+
+        pedidos = _parametro_lista(params, 'fields')
+        if pedidos:
+            fields = {nombre: campo for nombre, campo in fields.items()
+                      if nombre in pedidos or campo.write_only}
+        return fields
+
+# --- CAMPO PARA IMÁGENES EN EL ALMACÉN DE BLOBS ---
+
+class ImagenBlobField(serializers.Field):
+    """
+    Campo para imágenes guardadas en el almacén de blobs.
+
+    Acepta un texto Base64 (con o sin prefijo `data:`) o un archivo subido por
+    multipart, cuyo contenido se guarda en streaming junto con su miniatura.
+    Como se declara con `source='*'`, al validar retorna los campos
+    `<prefijo>_blob`, `<prefijo>_tamano` y `<prefijo>_mime` del modelo; al
+    leer retorna la URL del endpoint de imágenes (de la miniatura si
+    `miniatura=True`). Con `allow_null=True`, un `null` quita la imagen.
+
+    Al validar, el contenido sólo queda en un archivo temporal: el serializer
+    raíz debe usar `BlobsPendientesMixin`, que lo mueve al almacén (y genera
+    la miniatura) al guardar, o lo borra si la validación falla.
+    """
+    default_error_messages = {
+        'invalid': 'Se esperaba una imagen en Base64 o un archivo.',
+        'empty': 'La imagen está vacía.',
+    }
+
+    def __init__(self, prefijo='imagen', miniatura=False, **kwargs):
+        self.prefijo = prefijo
+        self.miniatura = miniatura
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def run_validation(self, data=serializers.empty):
+        if data is None and self.allow_null:
+            return {f'{self.prefijo}_{campo}': None for campo in ('blob', 'tamano', 'mime', 'miniatura')}
+        if data is None or data == '':
+            if not self.allow_null and self.required:
+                self.fail('empty')
+            return {}
+        return super().run_validation(data)
+
+    def to_internal_value(self, data):
+        if hasattr(data, 'chunks'):
+            preparar = almacen.preparar_archivo
+        elif isinstance(data, str):
+            preparar = almacen.preparar_base64
+        else:
+            self.fail('invalid')
+        try:
+            blob = preparar(data)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        self.root.__dict__.setdefault('_blobs_pendientes', []).append(blob)
+        return {
+            f'{self.prefijo}_blob': blob,
+            f'{self.prefijo}_tamano': blob.tamano,
+            f'{self.prefijo}_mime': blob.mime,
+        }
+
+    def to_representation(self, instance):
+        campo = f'{self.prefijo}_miniatura' if self.miniatura else f'{self.prefijo}_blob'
+        ref = getattr(instance, campo, None)
+        if not ref:
+            return None
+        url = reverse('imagen-blob', kwargs={'ref': ref})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+# (modelo, prefijo de los campos del blob) de cada tabla que referencia el almacén
+ORIGENES_BLOBS = [
+    (EvidenciaOT, 'imagen'),
+    (ChecklistImage, 'imagen'),
+    (ChecklistInstance, 'imagen_evidencia'),
+]
+
+
+def eliminar_blobs_huerfanos(refs):
+    """
+    Borra del almacén los blobs de `refs` que ya no referencia ninguna fila.
+    Como el almacén deduplica por contenido, otra fila puede compartir la
+    misma imagen o miniatura: esas se conservan.
+    """
+    refs = set(refs)
+    en_uso = set()
+    for modelo, prefijo in ORIGENES_BLOBS:
+        campos = (f'{prefijo}_blob', f'{prefijo}_miniatura')
+        filas = modelo.objects.filter(
+            Q(**{f'{campos[0]}__in': refs}) | Q(**{f'{campos[1]}__in': refs})
+        ).values_list(*campos)
+        for blob, miniatura in filas:
+            en_uso.update((blob, miniatura))
+    for ref in refs - en_uso:
+        almacen.eliminar(ref)
+
+
+def _confirmar_blobs(datos):
+    """
+    Mueve al almacén los `BlobPendiente` de los datos validados (también los
+    de serializers anidados) y los reemplaza por su referencia y miniatura.
+    """
+    if isinstance(datos, list):
+        for elemento in datos:
+            _confirmar_blobs(elemento)
+    elif isinstance(datos, dict):
+        for clave, valor in list(datos.items()):
+            if isinstance(valor, BlobPendiente):
+                datos[clave] = almacen.confirmar(valor)
+                datos[clave.removesuffix('_blob') + '_miniatura'] = almacen.generar_miniatura(datos[clave])
+            elif isinstance(valor, (dict, list)):
+                _confirmar_blobs(valor)
+
+
+class BlobsPendientesMixin:
+    """
+    Para serializers con `ImagenBlobField` (propios o anidados): las imágenes
+    pasan al almacén recién en `save()`. Si la validación falla, se borran
+    sus archivos temporales y no quedan blobs huérfanos; si algo falla entre
+    `is_valid()` y `save()`, quien llama debe usar `descartar_blobs()`.
+
+    Al reemplazar o quitar la imagen de una fila, la anterior se borra del
+    almacén al confirmar la transacción, si ninguna otra fila la usa.
+    """
+
+    def is_valid(self, *, raise_exception=False):
+        try:
+            valido = super().is_valid(raise_exception=raise_exception)
+        except serializers.ValidationError:
+            self.descartar_blobs()
+            raise
+        if not valido:
+            self.descartar_blobs()
+        return valido
+
+    def save(self, **kwargs):
+        _confirmar_blobs(self.validated_data)
+        self.descartar_blobs()
+        reemplazados = self._blobs_reemplazados()
+        instancia = super().save(**kwargs)
+        if reemplazados:
+            transaction.on_commit(lambda: eliminar_blobs_huerfanos(reemplazados))
+        return instancia
+
+    def descartar_blobs(self):
+        """Borra los archivos temporales que no llegaron a `save()`. Se puede llamar más de una vez."""
+        for blob in self.__dict__.pop('_blobs_pendientes', []):
+            almacen.descartar(blob)
+
+    def _blobs_reemplazados(self):
+        # Imagen y miniatura anteriores de los campos de blob que cambian en esta fila
+        if self.instance is None or isinstance(self.validated_data, list):
+            return set()
+        refs = set()
+        for campo, ref in self.validated_data.items():
+            if not campo.endswith('_blob'):
+                continue
+            anterior = getattr(self.instance, campo, None)
+            if anterior and anterior != ref:
+                miniatura = getattr(self.instance, campo.removesuffix('_blob') + '_miniatura', None)
+                refs.update(filter(None, (anterior, miniatura)))
+        return refs
 
 # --- SERIALIZERS PARA EL MÓDULO DE CHECKLISTS ---
 
@@ -146,16 +374,23 @@ class ChecklistAnswerSerializer(serializers.ModelSerializer):
         model = ChecklistAnswer
         fields = ['item', 'estado', 'observacion_item']
 
-class ChecklistImageSerializer(serializers.ModelSerializer):
+class ChecklistImageSerializer(BlobsPendientesMixin, serializers.ModelSerializer):
     """ Serializer para procesar las imágenes de un checklist. """
     usuario_subida_nombre = serializers.CharField(source='usuario_subida.get_full_name', read_only=True)
+    imagen_base64 = ImagenBlobField(write_only=True)
+    imagen_url = ImagenBlobField(read_only=True)
+    miniatura_url = ImagenBlobField(read_only=True, miniatura=True)
     
     class Meta:
         model = ChecklistImage
-        fields = ['id_imagen', 'descripcion', 'imagen_base64', 'fecha_subida', 'usuario_subida_nombre']
-        read_only_fields = ['id_imagen', 'fecha_subida', 'usuario_subida_nombre']
+        fields = [
+            'id_imagen', 'descripcion', 'imagen_base64', 'imagen_url', 'miniatura_url',
+            'imagen_mime', 'imagen_tamano', 'fecha_subida', 'usuario_subida_nombre'
+        ]
+        read_only_fields = ['id_imagen', 'imagen_mime', 'imagen_tamano', 'fecha_subida', 'usuario_subida_nombre']
+        campos_diferidos = ['imagen_base64']
 
-class ChecklistInstanceSerializer(serializers.ModelSerializer):
+class ChecklistInstanceSerializer(BlobsPendientesMixin, CamposDinamicosMixin, serializers.ModelSerializer):
     """
     Serializer principal para crear y leer un checklist completado.
     Maneja la creación anidada de las respuestas y la subida de múltiples imágenes.
@@ -169,8 +404,9 @@ class ChecklistInstanceSerializer(serializers.ModelSerializer):
     template_nombre = serializers.CharField(source='template.nombre', read_only=True)
     imagenes_list = ChecklistImageSerializer(source='imagenes', many=True, read_only=True)
     
-    # Mantener compatibilidad con imagen_evidencia para casos legacy
-    imagen_evidencia = serializers.CharField(allow_null=True, allow_blank=True, required=False)
+    # Mantener compatibilidad con imagen_evidencia para casos legacy (se guarda como blob)
+    imagen_evidencia = ImagenBlobField(prefijo='imagen_evidencia', allow_null=True, required=False)
+    imagen_evidencia_miniatura_url = ImagenBlobField(prefijo='imagen_evidencia', miniatura=True, read_only=True)
 
     class Meta:
         model = ChecklistInstance
@@ -178,16 +414,56 @@ class ChecklistInstanceSerializer(serializers.ModelSerializer):
             'id_instance', 'template', 'equipo', 'fecha_inspeccion', 
             'horometro_inspeccion', 'lugar_inspeccion', 'observaciones_generales', 
             'fecha_creacion', 'answers', 'imagenes', 'operador_nombre', 'equipo_nombre', 
-            'template_nombre', 'imagenes_list', 'imagen_evidencia'
+            'template_nombre', 'imagenes_list', 'imagen_evidencia', 'imagen_evidencia_miniatura_url'
         ]
+        campos_lista = [
+            'id_instance', 'template', 'template_nombre', 'equipo', 'equipo_nombre',
+            'fecha_inspeccion', 'horometro_inspeccion', 'operador_nombre', 'fecha_creacion',
+            'imagen_evidencia_miniatura_url'
+        ]
+        campos_diferidos = ['imagen_evidencia']
+
+    def validate(self, attrs):
+        """
+        Resuelve todos los ítems de las respuestas contra la plantilla con una
+        sola consulta. Los ítems inexistentes, de otra plantilla o repetidos se
+        rechazan juntos en un único error de validación.
+        """
+        attrs = super().validate(attrs)
+        answers_data = attrs.get('answers', [])
+        template = attrs.get('template')
+        item_ids = [answer['item'] for answer in answers_data]
+
+        items = {}
+        if template is not None and item_ids:
+            items = ChecklistItem.objects.filter(
+                id_item__in=set(item_ids),
+                category__template=template
+            ).in_bulk()
+
+        invalidos = sorted({item_id for item_id in item_ids if item_id not in items})
+        repetidos = sorted(item_id for item_id, veces in Counter(item_ids).items() if veces > 1)
+        errores = []
+        if invalidos:
+            errores.append(f"Ítems que no pertenecen a la plantilla: {invalidos}")
+        if repetidos:
+            errores.append(f"Ítems respondidos más de una vez: {repetidos}")
+        if errores:
+            raise serializers.ValidationError({'answers': errores})
+
+        self._items_validados = items
+        return attrs
 
     def create(self, validated_data):
         """
         Sobrescribe el método de creación para manejar la creación anidada de
         la instancia del checklist, sus respuestas y múltiples imágenes.
+        Las respuestas y las imágenes se insertan con `bulk_create`, usando
+        los ítems ya resueltos en `validate`.
         """
         answers_data = validated_data.pop('answers')
         imagenes_data = validated_data.pop('imagenes', [])
+        items = self._items_validados
         
         # Asignamos el usuario de la solicitud actual como el operador.
         user = self.context["request"].user
@@ -195,24 +471,41 @@ class ChecklistInstanceSerializer(serializers.ModelSerializer):
             validated_data["operador"] = user
         else:
             raise serializers.ValidationError("Usuario no autenticado para asignar como operador.")
+
+        # Resumen desnormalizado calculado en memoria antes de insertar
+        malas = [answer for answer in answers_data if answer.get('estado') == 'malo']
+        validated_data['total_respuestas'] = len(answers_data)
+        validated_data['respuestas_malas'] = len(malas)
+        validated_data['respuestas_criticas_malas'] = sum(
+            1 for answer in malas if items[answer['item']].es_critico
+        )
         
         with transaction.atomic():
             instance = ChecklistInstance.objects.create(**validated_data)
             
             # Crear respuestas
-            for answer_data in answers_data:
-                item_id = answer_data.pop('item')
-                item = ChecklistItem.objects.get(id_item=item_id)
-                ChecklistAnswer.objects.create(instance=instance, item=item, **answer_data)
-            
-            # Crear imágenes
-            for imagen_data in imagenes_data:
-                ChecklistImage.objects.create(
+            ChecklistAnswer.objects.bulk_create([
+                ChecklistAnswer(
                     instance=instance,
-                    usuario_subida=user,
-                    **imagen_data
+                    item=items[answer_data['item']],
+                    estado=answer_data['estado'],
+                    observacion_item=answer_data.get('observacion_item')
                 )
-                
+                for answer_data in answers_data
+            ])
+            
+            # Crear imágenes
+            if imagenes_data:
+                ChecklistImage.objects.bulk_create([
+                    ChecklistImage(instance=instance, usuario_subida=user, **imagen_data)
+                    for imagen_data in imagenes_data
+                ])
+
+        # La respuesta lista las imágenes: se cargan con su usuario en una sola consulta
+        prefetch_related_objects([instance], Prefetch(
+            'imagenes',
+            queryset=ChecklistImage.objects.select_related('usuario_subida').defer('imagen_base64')
+        ))
         return instance
 
 # --- SERIALIZERS PARA AGENDA DE MANTENIMIENTO PREVENTIVO ---
@@ -270,7 +563,7 @@ class ActividadOrdenTrabajoSerializer(serializers.ModelSerializer):
         model = ActividadesOrdenTrabajo
         fields = '__all__'
 
-class OrdenTrabajoSerializer(serializers.ModelSerializer):
+class OrdenTrabajoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     equipo_nombre = serializers.CharField(source='idequipo.nombreequipo', read_only=True)
     plan_nombre = serializers.CharField(source='idplanorigen.nombreplan', read_only=True)
     tipo_mantenimiento_nombre = serializers.CharField(source='idtipomantenimientoot.nombretipomantenimientoot', read_only=True)
@@ -282,8 +575,21 @@ class OrdenTrabajoSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrdenesTrabajo
         fields = '__all__'
+        campos_lista = [
+            'idordentrabajo', 'numeroot', 'idequipo', 'equipo_nombre', 'idtipomantenimientoot',
+            'tipo_mantenimiento_nombre', 'idestadoot', 'estado_nombre', 'prioridad',
+            'fechacreacionot', 'fechaemision', 'fechaejecucion', 'fechacompletado',
+            'idtecnicoasignado', 'tecnico_nombre'
+        ]
+        extra_kwargs = {'numeroot': {'required': False}}
+
+    def create(self, validated_data):
+        # Sin número explícito se asigna el siguiente correlativo
+        if not validated_data.get('numeroot'):
+            validated_data['numeroot'] = numero_ot('MAN', validated_data['idequipo'])
+        return super().create(validated_data)
 
-class AgendaSerializer(serializers.ModelSerializer):
+class AgendaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     equipo_nombre = serializers.CharField(source='idequipo.nombreequipo', read_only=True)
     orden_trabajo_numero = serializers.CharField(source='idordentrabajo.numeroot', read_only=True)
     plan_nombre = serializers.CharField(source='idplanmantenimiento.nombreplan', read_only=True)
@@ -293,16 +599,71 @@ class AgendaSerializer(serializers.ModelSerializer):
     class Meta:
         model = Agendas
         fields = '__all__'
+        read_only_fields = ['clavegeneracion']
+        campos_lista = [
+            'idagenda', 'tituloevento', 'fechahorainicio', 'fechahorafin', 'descripcionevento',
+            'tipoevento', 'colorevento', 'esdiacompleto', 'idequipo', 'idordentrabajo',
+            'idplanmantenimiento', 'idusuarioasignado'
+        ]
+
+    def validate(self, attrs):
+        recursivo = attrs.get('recursivo', getattr(self.instance, 'recursivo', False))
+        regla = attrs.get('reglarecursividad', getattr(self.instance, 'reglarecursividad', None))
+        inicio = attrs.get('fechahorainicio', getattr(self.instance, 'fechahorainicio', None))
+        if recursivo and regla and inicio:
+            try:
+                interpretar_regla(regla, inicio)
+            except ValueError as e:
+                raise serializers.ValidationError({'reglarecursividad': f'Regla de recurrencia inválida: {e}'})
+        return attrs
+
+
+class ExcepcionAgendaSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ExcepcionesAgenda
+        fields = '__all__'
+        read_only_fields = ['idagenda']
+
+    def validate(self, attrs):
+        evento = self.context['evento']
+        if not es_ocurrencia(evento.reglarecursividad, evento.fechahorainicio, attrs['fechaocurrencia']):
+            raise serializers.ValidationError({'fechaocurrencia': 'No corresponde a una ocurrencia del evento.'})
+        inicio = attrs.get('fechahorainicio')
+        fin = attrs.get('fechahorafin')
+        if inicio and fin and fin <= inicio:
+            raise serializers.ValidationError({'fechahorafin': 'Debe ser posterior a fechahorainicio.'})
+        return attrs
 
 # --- SERIALIZER PARA EVIDENCIAS FOTOGRÁFICAS ---
 
-class EvidenciaOTSerializer(serializers.ModelSerializer):
+class EvidenciaOTSerializer(BlobsPendientesMixin, CamposDinamicosMixin, serializers.ModelSerializer):
     usuario_subida_nombre = serializers.CharField(source='usuario_subida.get_full_name', read_only=True)
     orden_trabajo_numero = serializers.CharField(source='idordentrabajo.numeroot', read_only=True)
     
+    imagen_base64 = ImagenBlobField(write_only=True, required=False)
+    imagen = ImagenBlobField(write_only=True, required=False)
+    imagen_url = ImagenBlobField(read_only=True)
+    miniatura_url = ImagenBlobField(read_only=True, miniatura=True)
+    
     class Meta:
         model = EvidenciaOT
-        fields = '__all__'
+        fields = [
+            'idevidencia', 'idordentrabajo', 'orden_trabajo_numero', 'descripcion',
+            'imagen_base64', 'imagen', 'imagen_url', 'miniatura_url', 'imagen_mime', 'imagen_tamano',
+            'fecha_subida', 'usuario_subida', 'usuario_subida_nombre'
+        ]
+        read_only_fields = ['imagen_mime', 'imagen_tamano']
+        campos_lista = [
+            'idevidencia', 'idordentrabajo', 'descripcion', 'miniatura_url', 'imagen_url',
+            'fecha_subida', 'usuario_subida_nombre'
+        ]
+        campos_diferidos = ['imagen_base64']
+
+    def validate(self, attrs):
+        # Al crear se exige la imagen, ya sea en Base64 o como archivo (multipart)
+        if self.instance is None and not attrs.get('imagen_blob'):
+            raise serializers.ValidationError({'imagen': 'Debe enviar imagen_base64 o un archivo en imagen.'})
+        return attrs
         
     def create(self, validated_data):
         # Obtener o crear usuario por defecto si no hay autenticación
@@ -0,0 +1,254 @@
+# cmms_api/signals.py
+# Señales que mantienen sincronizadas las cachés de la API
+
+from django.db import IntegrityError, transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+from .models import (
+    ChecklistTemplate, ChecklistCategory, ChecklistItem, Usuarios, Roles,
+    EstadosOrdenTrabajo, TiposMantenimientoOT, ChecklistInstance, OrdenesTrabajo,
+    HistorialHorometro, Equipos, EstadosEquipo, Agendas, ExcepcionesAgenda
+)
+from . import cache_plantillas, dashboard, indicadores
+from .roles import cache_roles
+from .authentication import cache_tokens
+from .catalogos import estados_ot, tipos_mantenimiento_ot
+from .horometros import registrar_lectura, fecha_lectura_checklist
+from .reportes_checklist import recalcular_resumenes
+from .sincronizacion_agenda import USUARIO_SISTEMA, olvidar_usuario_sistema
+
+
+# --- Caché de plantillas de checklist ---
+
+@receiver(pre_save, sender=ChecklistTemplate)
+def recordar_tipo_equipo_anterior(sender, instance, **kwargs):
+    # Si la plantilla cambia de tipo de equipo hay que invalidar ambos tipos
+    instance._tipo_equipo_anterior = None
+    if instance.pk:
+        instance._tipo_equipo_anterior = ChecklistTemplate.objects.filter(
+            pk=instance.pk
+        ).values_list('tipo_equipo_id', flat=True).first()
+
+
+@receiver(post_save, sender=ChecklistTemplate)
+@receiver(post_delete, sender=ChecklistTemplate)
+def invalidar_cache_template(sender, instance, **kwargs):
+    cache_plantillas.invalidar_tipo_equipo(instance.tipo_equipo_id)
+    anterior = getattr(instance, '_tipo_equipo_anterior', None)
+    if anterior and anterior != instance.tipo_equipo_id:
+        cache_plantillas.invalidar_tipo_equipo(anterior)
+
+
+@receiver(post_save, sender=ChecklistCategory)
+@receiver(post_delete, sender=ChecklistCategory)
+@receiver(post_save, sender=ChecklistItem)
+@receiver(post_delete, sender=ChecklistItem)
+def invalidar_cache_categoria_item(sender, instance, created=True, **kwargs):
+    # Al editar, la categoría / ítem pudo cambiar de plantilla: se invalida todo
+    if not created:
+        cache_plantillas.invalidar_todo()
+        return
+
+    if sender is ChecklistCategory:
+        plantillas = ChecklistTemplate.objects.filter(pk=instance.template_id)
+    else:
+        plantillas = ChecklistTemplate.objects.filter(categories__pk=instance.category_id)
+    tipo_equipo_id = plantillas.values_list('tipo_equipo_id', flat=True).first()
+
+    # En un borrado en cascada la plantilla puede no existir ya
+    if tipo_equipo_id is None:
+        cache_plantillas.invalidar_todo()
+    else:
+        cache_plantillas.invalidar_tipo_equipo(tipo_equipo_id)
+
+
+# --- Resumen de los checklists que respondieron un ítem ---
+
+@receiver(pre_save, sender=ChecklistItem)
+def recordar_criticidad_item(sender, instance, update_fields=None, **kwargs):
+    instance._es_critico_anterior = None
+    if instance.pk and (update_fields is None or 'es_critico' in update_fields):
+        instance._es_critico_anterior = ChecklistItem.objects.filter(
+            pk=instance.pk
+        ).values_list('es_critico', flat=True).first()
+
+
+@receiver(post_save, sender=ChecklistItem)
+def recalcular_resumen_por_criticidad(sender, instance, created, **kwargs):
+    # Marcar o desmarcar un ítem como crítico cambia `respuestas_criticas_malas`
+    # de cada checklist que lo respondió como malo (y sus indicadores diarios)
+    anterior = getattr(instance, '_es_critico_anterior', None)
+    if created or anterior is None or anterior == instance.es_critico:
+        return
+    afectados = ChecklistInstance.objects.filter(answers__item=instance, answers__estado='malo')
+    dias = set(afectados.order_by().values_list('equipo', 'fecha_inspeccion').distinct())
+    recalcular_resumenes(afectados)
+    indicadores.programar_recalculo(dias)
+
+
+# --- Caché de roles de usuario ---
+
+@receiver(post_save, sender=Usuarios)
+@receiver(post_delete, sender=Usuarios)
+def invalidar_rol_usuario(sender, instance, **kwargs):
+    cache_roles.invalidar(instance.user_id)
+    cache_tokens.invalidar_usuario(instance.user_id)
+
+
+@receiver(post_save, sender=Roles)
+@receiver(post_delete, sender=Roles)
+def invalidar_roles(sender, instance, **kwargs):
+    # Un cambio de nombre de rol afecta a todos sus usuarios
+    cache_roles.invalidar()
+    cache_tokens.limpiar()
+
+
+# --- Caché de tokens de autenticación ---
+
+@receiver(post_delete, sender=Token)
+def invalidar_token(sender, instance, **kwargs):
+    # Cubre el logout y la revocación manual de tokens, también en los demás procesos
+    cache_tokens.invalidar(instance.key)
+    cache_tokens.invalidar_usuario(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_tokens_usuario(sender, instance, **kwargs):
+    # Desactivar o modificar un usuario debe reflejarse de inmediato
+    cache_tokens.invalidar_usuario(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def olvidar_usuario_agenda(sender, instance, **kwargs):
+    # El usuario de los eventos automáticos se recuerda por proceso
+    if instance.username == USUARIO_SISTEMA:
+        olvidar_usuario_sistema()
+
+
+# --- Registro de catálogos de OT ---
+
+@receiver(post_save, sender=EstadosOrdenTrabajo)
+@receiver(post_delete, sender=EstadosOrdenTrabajo)
+def invalidar_estados_ot(sender, **kwargs):
+    estados_ot.invalidar()
+
+
+@receiver(post_save, sender=TiposMantenimientoOT)
+@receiver(post_delete, sender=TiposMantenimientoOT)
+def invalidar_tipos_mantenimiento_ot(sender, **kwargs):
+    tipos_mantenimiento_ot.invalidar()
+
+
+# --- Historial de horómetro (y horómetro / tasa de uso guardados en el equipo) ---
+
+@receiver(post_save, sender=ChecklistInstance)
+def registrar_horometro_checklist(sender, instance, created, **kwargs):
+    if created:
+        registrar_lectura(
+            instance.equipo_id,
+            instance.horometro_inspeccion,
+            'checklist',
+            fecha=fecha_lectura_checklist(instance.fecha_inspeccion, instance.fecha_creacion),
+            referencia=instance.pk,
+            usuario_id=instance.operador_id
+        )
+
+
+@receiver(post_save, sender=OrdenesTrabajo)
+def registrar_horometro_ot(sender, instance, created, **kwargs):
+    # Una lectura por OT: la primera vez que la OT trae horómetro. Si ya la
+    # tiene, la restricción (origen, idreferencia) rechaza la segunda
+    if instance.horometro is None:
+        return
+    datos = dict(
+        fecha=instance.fechacompletado or (instance.fechacreacionot if created else timezone.now()),
+        referencia=instance.pk,
+        usuario_id=instance.idtecnicoasignado_id or instance.idsolicitante_id
+    )
+    if created:
+        registrar_lectura(instance.idequipo_id, instance.horometro, 'ot', **datos)
+        return
+    try:
+        with transaction.atomic():
+            registrar_lectura(instance.idequipo_id, instance.horometro, 'ot', **datos)
+    except IntegrityError:
+        pass
+
+
+# --- Snapshot del dashboard: cada modelo invalida solo su sección ---
+
+@receiver(post_save, sender=Equipos)
+@receiver(post_delete, sender=Equipos)
+@receiver(post_save, sender=EstadosEquipo)
+@receiver(post_delete, sender=EstadosEquipo)
+def invalidar_dashboard_equipos(sender, **kwargs):
+    dashboard.invalidar('equipos')
+
+
+@receiver(post_save, sender=OrdenesTrabajo)
+@receiver(post_delete, sender=OrdenesTrabajo)
+@receiver(post_save, sender=TiposMantenimientoOT)
+@receiver(post_delete, sender=TiposMantenimientoOT)
+@receiver(post_save, sender=EstadosOrdenTrabajo)
+@receiver(post_delete, sender=EstadosOrdenTrabajo)
+def invalidar_dashboard_ordenes(sender, **kwargs):
+    dashboard.invalidar('ordenes')
+
+
+@receiver(post_save, sender=Agendas)
+@receiver(post_delete, sender=Agendas)
+@receiver(post_save, sender=ExcepcionesAgenda)
+@receiver(post_delete, sender=ExcepcionesAgenda)
+def invalidar_dashboard_agenda(sender, **kwargs):
+    dashboard.invalidar('agenda')
+
+
+# --- Indicadores diarios por equipo: se recalculan los días que toca cada cambio ---
+
+# Campos de los que dependen los días a recalcular; si un save con `update_fields`
+# no toca ninguno, no hace falta leer la fila anterior
+CAMPOS_DIA_OT = {
+    'idequipo', 'idequipo_id', 'fechacreacionot', 'fechareportefalla', 'fechacompletado'
+}
+CAMPOS_DIA_CHECKLIST = {'equipo', 'equipo_id', 'fecha_inspeccion'}
+
+
+@receiver(pre_save, sender=OrdenesTrabajo)
+def recordar_dias_indicadores_ot(sender, instance, update_fields=None, **kwargs):
+    # Si cambian las fechas o el equipo, también hay que recalcular los días anteriores
+    instance._dias_indicadores_anteriores = set()
+    if instance.pk and (update_fields is None or CAMPOS_DIA_OT & set(update_fields)):
+        anterior = OrdenesTrabajo.objects.filter(pk=instance.pk).values(*indicadores.CAMPOS_OT).first()
+        if anterior:
+            instance._dias_indicadores_anteriores = indicadores.dias_afectados_ot(anterior)
+
+
+@receiver(post_save, sender=OrdenesTrabajo)
+@receiver(post_delete, sender=OrdenesTrabajo)
+def recalcular_indicadores_ot(sender, instance, **kwargs):
+    indicadores.programar_recalculo(
+        indicadores.dias_afectados_ot(instance) | getattr(instance, '_dias_indicadores_anteriores', set())
+    )
+
+
+@receiver(pre_save, sender=ChecklistInstance)
+def recordar_dia_indicadores_checklist(sender, instance, update_fields=None, **kwargs):
+    # `actualizar_resumen` guarda sólo los contadores: el día no cambia
+    instance._dia_indicadores_anterior = None
+    if instance.pk and (update_fields is None or CAMPOS_DIA_CHECKLIST & set(update_fields)):
+        anterior = ChecklistInstance.objects.filter(pk=instance.pk).values_list('equipo', 'fecha_inspeccion').first()
+        instance._dia_indicadores_anterior = anterior
+
+
+@receiver(post_save, sender=ChecklistInstance)
+@receiver(post_delete, sender=ChecklistInstance)
+def recalcular_indicadores_checklist(sender, instance, **kwargs):
+    dias = {indicadores.dia_checklist(instance)}
+    anterior = getattr(instance, '_dia_indicadores_anterior', None)
+    if anterior:
+        dias.add(anterior)
+    indicadores.programar_recalculo(dias)
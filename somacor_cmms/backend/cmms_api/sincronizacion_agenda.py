@@ -0,0 +1,153 @@
+# cmms_api/sincronizacion_agenda.py
+# Sincronización por conjuntos de la agenda con las OTs programadas y los planes preventivos
+
+import datetime
+import threading
+
+from django.contrib.auth.models import User
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from .models import OrdenesTrabajo, Agendas, Equipos
+from .proyeccion_agenda import generar_agenda_preventiva, eventos_por_clave, TAMANO_LOTE_INSERCION
+from . import dashboard
+
+ESTADOS_PROGRAMADOS = ['Abierta', 'En Progreso']
+DIAS_PLANES = 30
+HORA_INICIO_OT = datetime.time(8, 0)
+DURACION_EVENTO_OT = datetime.timedelta(hours=4)
+
+# Tipo de evento y color según el tipo de mantenimiento de la OT
+ESTILOS_EVENTO = {
+    'Correctivo': ('correctivo', '#F59E0B'),  # Naranja
+    'Predictivo': ('predictivo', '#10B981'),  # Verde
+}
+ESTILO_POR_DEFECTO = ('preventivo', '#3B82F6')  # Azul
+
+USUARIO_SISTEMA = 'sistema_agenda'
+_usuario_sistema = None
+_lock = threading.Lock()
+
+
+def usuario_sistema():
+    """Usuario creador de los eventos automáticos; se resuelve una vez por proceso."""
+    global _usuario_sistema
+    with _lock:
+        if _usuario_sistema is None:
+            _usuario_sistema, _ = User.objects.get_or_create(
+                username=USUARIO_SISTEMA,
+                defaults={
+                    'first_name': 'Sistema',
+                    'last_name': 'Agenda',
+                    'email': 'sistema@somacor.com',
+                    'is_active': True
+                }
+            )
+        return _usuario_sistema
+
+
+def olvidar_usuario_sistema():
+    global _usuario_sistema
+    with _lock:
+        _usuario_sistema = None
+
+
+def clave_evento_ot(orden_id):
+    """Clave de generación del evento de una OT: a lo más uno por OT."""
+    return f"ot:{orden_id}"
+
+
+def _descripcion(orden):
+    descripcion = f"OT: {orden['numeroot']}\n"
+    descripcion += f"Equipo: {orden['idequipo__nombreequipo']}\n"
+    descripcion += f"Tipo: {orden['idtipomantenimientoot__nombretipomantenimientoot']}\n"
+    descripcion += f"Prioridad: {orden['prioridad']}\n"
+    if orden['descripcionproblemareportado']:
+        descripcion += f"Problema: {orden['descripcionproblemareportado']}\n"
+    if orden['horometro']:
+        descripcion += f"Horómetro: {orden['horometro']}h\n"
+    return descripcion
+
+
+def sincronizar_agenda(dias_planes=DIAS_PLANES, equipo_id=None, planes=True):
+    """
+    Lleva a la agenda las OTs programadas (abiertas o en progreso, con fecha
+    de ejecución) que aún no tienen evento y, si `planes`, los vencimientos
+    de los planes preventivos de los próximos `dias_planes` días. Con
+    `equipo_id` se limita a las OTs y planes de ese equipo.
+
+    Las OTs pendientes se obtienen con un anti-join (NOT EXISTS) contra la
+    agenda y se insertan con `bulk_create`; cada evento lleva la clave
+    `ot:<id>`, única en la agenda, así que dos sincronizaciones simultáneas
+    no duplican eventos. Los planes se resuelven con `generar_agenda_preventiva`.
+
+    Retorna un resumen de lo que cambió:
+    {'eventos': [eventos de OT creados], 'ots_ya_agendadas': int, 'eventos_plan_creados': int}
+    """
+    programadas = OrdenesTrabajo.objects.filter(
+        fechaejecucion__isnull=False,
+        idestadoot__nombreestadoot__in=ESTADOS_PROGRAMADOS
+    )
+    if equipo_id is not None:
+        programadas = programadas.filter(idequipo_id=equipo_id)
+    agendadas = Agendas.objects.filter(idordentrabajo=OuterRef('pk'))
+
+    pendientes = list(programadas.filter(~Exists(agendadas)).order_by('fechaejecucion', 'idordentrabajo').values(
+        'idordentrabajo', 'numeroot', 'prioridad', 'descripcionproblemareportado', 'horometro',
+        'fechaejecucion', 'idequipo', 'idequipo__nombreequipo', 'idtecnicoasignado',
+        'idtipomantenimientoot__nombretipomantenimientoot'
+    ))
+    ya_agendadas = programadas.filter(Exists(agendadas)).count()
+    usuario = usuario_sistema()
+
+    nuevos = []
+    for orden in pendientes:
+        tipo_mantenimiento = orden['idtipomantenimientoot__nombretipomantenimientoot']
+        tipo_evento, color_evento = ESTILOS_EVENTO.get(tipo_mantenimiento, ESTILO_POR_DEFECTO)
+        fecha_inicio = timezone.make_aware(datetime.datetime.combine(orden['fechaejecucion'], HORA_INICIO_OT))
+        nuevos.append(Agendas(
+            tituloevento=f"Mantenimiento {tipo_mantenimiento} - {orden['idequipo__nombreequipo']}",
+            fechahorainicio=fecha_inicio,
+            fechahorafin=fecha_inicio + DURACION_EVENTO_OT,
+            descripcionevento=_descripcion(orden),
+            tipoevento=tipo_evento,
+            colorevento=color_evento,
+            esdiacompleto=False,
+            idequipo_id=orden['idequipo'],
+            idordentrabajo_id=orden['idordentrabajo'],
+            idusuarioasignado_id=orden['idtecnicoasignado'],
+            idusuariocreador=usuario,
+            clavegeneracion=clave_evento_ot(orden['idordentrabajo'])
+        ))
+    Agendas.objects.bulk_create(nuevos, batch_size=TAMANO_LOTE_INSERCION, ignore_conflicts=True)
+    if nuevos:
+        # bulk_create no dispara post_save
+        dashboard.invalidar('agenda')
+
+    creados = eventos_por_clave(
+        [evento.clavegeneracion for evento in nuevos], 'idagenda', 'tituloevento', 'fechahorainicio'
+    )
+    eventos = []
+    for orden in pendientes:
+        fila = creados.get(clave_evento_ot(orden['idordentrabajo']))
+        if fila is None:
+            continue
+        eventos.append({
+            'id': fila['idagenda'],
+            'titulo': fila['tituloevento'],
+            'fecha': fila['fechahorainicio'].isoformat(),
+            'orden_trabajo': orden['numeroot'],
+            'equipo': orden['idequipo__nombreequipo']
+        })
+
+    eventos_plan = 0
+    if planes:
+        equipos = Equipos.objects.filter(activo=True)
+        if equipo_id is not None:
+            equipos = equipos.filter(idequipo=equipo_id)
+        eventos_plan = generar_agenda_preventiva(equipos, dias_adelante=dias_planes, usuario=usuario)
+
+    return {
+        'eventos': eventos,
+        'ots_ya_agendadas': ya_agendadas,
+        'eventos_plan_creados': eventos_plan,
+    }
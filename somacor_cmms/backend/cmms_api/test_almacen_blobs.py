@@ -0,0 +1,184 @@
+import base64
+import hashlib
+from io import StringIO
+from unittest import mock
+
+from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import ChecklistInstance, EvidenciaOT
+from .almacen_blobs import almacen
+from .datos_prueba import MediaTemporalMixin, ChecklistDatosMixin, OrdenesTrabajoDatosMixin, PNG_1PX
+
+
+class AlmacenBlobsTest(MediaTemporalMixin, OrdenesTrabajoDatosMixin, TestCase):
+    """Pruebas del almacén de imágenes direccionado por contenido"""
+
+    def setUp(self):
+        self.usar_media_temporal()
+        self.client = APIClient()
+        self.crear_datos_ot()
+        self.ot = self.crear_ot(cantidad_actividades=0)
+        self.data_uri = 'data:image/png;base64,' + base64.b64encode(PNG_1PX).decode()
+
+    def test_evidencia_base64_se_guarda_como_blob_deduplicado(self):
+        """Dos subidas de la misma imagen comparten un único blob"""
+        for _ in range(2):
+            response = self.client.post('/api/evidencias-ot/', {
+                'idordentrabajo': self.ot.idordentrabajo,
+                'imagen_base64': self.data_uri
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        evidencias = EvidenciaOT.objects.all()
+        self.assertEqual({e.imagen_blob for e in evidencias}, {hashlib.sha256(PNG_1PX).hexdigest()})
+        self.assertTrue(all(e.imagen_base64 is None for e in evidencias))
+        self.assertEqual(response.data['imagen_mime'], 'image/png')
+        self.assertEqual(response.data['imagen_tamano'], len(PNG_1PX))
+        self.assertNotIn('imagen_base64', response.data)
+
+        # Un blob para la imagen y otro para su miniatura, sin duplicados
+        self.assertEqual(len(self.archivos_blobs()), 2)
+        self.assertEqual(almacen.ruta(evidencias[0].imagen_blob).read_bytes(), PNG_1PX)
+
+    def test_subida_multipart(self):
+        """La imagen puede subirse como archivo multipart"""
+        archivo = SimpleUploadedFile('falla.png', PNG_1PX, content_type='image/png')
+        response = self.client.post('/api/evidencias-ot/', {
+            'idordentrabajo': self.ot.idordentrabajo,
+            'imagen': archivo
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.data['imagen_url'].endswith(f'/api/imagenes/{hashlib.sha256(PNG_1PX).hexdigest()}/'))
+        self.assertIsNotNone(response.data['miniatura_url'])
+
+    def test_rechazos_no_dejan_blobs(self):
+        """Una imagen vacía o una subida que no pasa la validación no escribe en el almacén"""
+        vacia = SimpleUploadedFile('vacia.png', b'', content_type='image/png')
+        for datos, formato in (
+            ({'idordentrabajo': self.ot.idordentrabajo, 'imagen_base64': 'data:image/png;base64,'}, 'json'),
+            ({'idordentrabajo': self.ot.idordentrabajo, 'imagen': vacia}, 'multipart'),
+            ({'idordentrabajo': 999999, 'imagen_base64': self.data_uri}, 'json'),
+        ):
+            response = self.client.post('/api/evidencias-ot/', datos, format=formato)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertFalse(EvidenciaOT.objects.exists())
+        # Ni blobs ni archivos temporales de subida
+        self.assertEqual(self.archivos_blobs(), [])
+
+    def test_comando_migra_base64_legado(self):
+        """El comando mueve las imágenes Base64 existentes al almacén y vacía la columna"""
+        evidencia = EvidenciaOT.objects.create(idordentrabajo=self.ot, imagen_base64=self.data_uri)
+        invalida = EvidenciaOT.objects.create(idordentrabajo=self.ot, imagen_base64='no-es-base64!')
+
+        call_command('migrar_imagenes_blobs', tamano_lote=1, stdout=StringIO())
+
+        evidencia.refresh_from_db()
+        invalida.refresh_from_db()
+        self.assertEqual(evidencia.imagen_blob, hashlib.sha256(PNG_1PX).hexdigest())
+        self.assertEqual(evidencia.imagen_tamano, len(PNG_1PX))
+        self.assertIsNone(evidencia.imagen_base64)
+        self.assertIsNone(invalida.imagen_blob)
+        self.assertEqual(invalida.imagen_base64, 'no-es-base64!')
+
+    def test_endpoint_imagen_etag_y_rango(self):
+        """El endpoint de imagen soporta ETag (304) y Range (206)"""
+        response = self.client.post('/api/evidencias-ot/', {
+            'idordentrabajo': self.ot.idordentrabajo,
+            'imagen_base64': self.data_uri
+        }, format='json')
+        url = response.data['imagen_url']
+
+        completa = self.client.get(url)
+        self.assertEqual(completa.status_code, status.HTTP_200_OK)
+        self.assertEqual(completa['Content-Type'], 'image/png')
+        self.assertEqual(b''.join(completa.streaming_content), PNG_1PX)
+
+        no_modificada = self.client.get(url, HTTP_IF_NONE_MATCH=completa['ETag'])
+        self.assertEqual(no_modificada.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        parcial = self.client.get(url, HTTP_RANGE='bytes=0-7')
+        self.assertEqual(parcial.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(parcial['Content-Range'], f'bytes 0-7/{len(PNG_1PX)}')
+        self.assertEqual(b''.join(parcial.streaming_content), PNG_1PX[:8])
+
+        fuera_de_rango = self.client.get(url, HTTP_RANGE=f'bytes={len(PNG_1PX)}-')
+        self.assertEqual(fuera_de_rango.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+        miniatura = self.client.get(response.data['miniatura_url'])
+        self.assertEqual(miniatura['Content-Type'], 'image/jpeg')
+
+    def test_comando_genera_miniaturas_faltantes(self):
+        """El comando de relleno genera miniaturas para blobs sin miniatura"""
+        blob = almacen.guardar([PNG_1PX])
+        evidencia = EvidenciaOT.objects.create(
+            idordentrabajo=self.ot, imagen_blob=blob.ref, imagen_tamano=blob.tamano, imagen_mime=blob.mime
+        )
+
+        call_command('generar_miniaturas', stdout=StringIO())
+
+        evidencia.refresh_from_db()
+        self.assertIsNotNone(evidencia.imagen_miniatura)
+        self.assertTrue(almacen.existe(evidencia.imagen_miniatura))
+
+
+class ImagenEvidenciaChecklistTest(MediaTemporalMixin, ChecklistDatosMixin, TestCase):
+    """Quitar la imagen de un checklist y archivos temporales de subidas que fallan"""
+
+    def setUp(self):
+        self.usar_media_temporal()
+        self.crear_datos_checklist()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.data_uri = 'data:image/png;base64,' + base64.b64encode(PNG_1PX).decode()
+
+    def con_imagen(self):
+        instancia = self.crear_instancia(['bueno'] * len(self.items))
+        respuesta = self.client.patch(
+            f'/api/checklist-instances/{instancia.pk}/', {'imagen_evidencia': self.data_uri}, format='json'
+        )
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        instancia.refresh_from_db()
+        return instancia
+
+    def test_null_quita_la_imagen_y_borra_el_blob_sin_uso(self):
+        primera, segunda = self.con_imagen(), self.con_imagen()
+        refs = {primera.imagen_evidencia_blob, primera.imagen_evidencia_miniatura}
+        self.assertEqual(self.archivos_blobs(), sorted(refs))
+
+        # La otra fila comparte el blob deduplicado: se conserva
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.patch(
+                f'/api/checklist-instances/{primera.pk}/', {'imagen_evidencia': None}, format='json'
+            )
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        self.assertIsNone(respuesta.data['imagen_evidencia'])
+        primera.refresh_from_db()
+        self.assertEqual(
+            (primera.imagen_evidencia_blob, primera.imagen_evidencia_tamano,
+             primera.imagen_evidencia_mime, primera.imagen_evidencia_miniatura),
+            (None, None, None, None)
+        )
+        self.assertEqual(self.archivos_blobs(), sorted(refs))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/checklist-instances/{segunda.pk}/', {'imagen_evidencia': None}, format='json')
+        self.assertEqual(self.archivos_blobs(), [])
+
+    def test_falla_antes_de_guardar_no_deja_temporales(self):
+        data = {
+            'template': self.template.id_template,
+            'equipo': self.equipo.idequipo,
+            'fecha_inspeccion': '2025-06-23',
+            'horometro_inspeccion': 1200,
+            'answers': [{'item': self.items[0].id_item, 'estado': 'malo'}],
+            'imagen_evidencia': self.data_uri,
+        }
+        with mock.patch('cmms_api.views_checklist.numero_ot', side_effect=RuntimeError('sin secuencia')):
+            respuesta = self.client.post('/api/checklist-workflow/completar-checklist/', data, format='json')
+        self.assertEqual(respuesta.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertFalse(ChecklistInstance.objects.exists())
+        self.assertEqual(self.archivos_blobs(), [])
@@ -0,0 +1,99 @@
+from unittest import mock
+
+from django.test import TestCase
+from django.core.cache.backends.locmem import LocMemCache
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import Roles, Usuarios
+from .roles import cache_roles
+from .authentication import CacheTokens, cache_tokens
+
+
+class CacheTokensTest(TestCase):
+    """Autenticación por token servida desde la caché LRU"""
+
+    def setUp(self):
+        cache_tokens.limpiar()
+        cache_roles.invalidar()
+        rol = Roles.objects.create(nombrerol='Admin')
+        self.user = User.objects.create_user(username='admin', password='x')
+        Usuarios.objects.create(user=self.user, idrol=rol)
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.url = reverse('auth-cache-estadisticas')
+
+    def test_segundo_request_no_consulta_token_ni_rol(self):
+        antes = self.client.get(self.url).data
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['aciertos'], antes['aciertos'] + 1)
+        self.assertEqual(response.data['fallos'], antes['fallos'])
+
+    def test_logout_y_desactivacion_expulsan_la_entrada(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        self.client.post(reverse('logout'))
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_lru_acotado(self):
+        lru = CacheTokens(maximo=2, ttl=60)
+        for clave in ('a', 'b'):
+            lru.guardar(clave, (self.user, None, None))
+        lru.obtener('a')
+        lru.guardar('c', (self.user, None, None))
+        self.assertIsNone(lru.obtener('b'))
+        self.assertIsNotNone(lru.obtener('a'))
+        self.assertEqual(lru.estadisticas()['expulsiones'], 1)
+
+    def test_revocacion_se_propaga_a_otros_procesos(self):
+        """Dos procesos (dos cachés de tokens) comparten la caché de Django"""
+        compartida = LocMemCache('tokens-compartida', {})
+        worker_a = CacheTokens(ttl=300, cache=compartida)
+        worker_b = CacheTokens(ttl=300, cache=compartida)
+        entrada = (self.user, self.token, 'Admin')
+        worker_a.guardar(self.token.key, entrada)
+        worker_b.guardar(self.token.key, entrada)
+
+        # El logout atendido por el worker B invalida la entrada del worker A
+        worker_b.invalidar_usuario(self.user.pk)
+        self.assertIsNone(worker_b.obtener(self.token.key))
+        self.assertIsNone(worker_a.obtener(self.token.key))
+
+        worker_a.guardar(self.token.key, entrada)
+        self.assertIsNotNone(worker_a.obtener(self.token.key))
+        worker_b.limpiar()
+        self.assertIsNone(worker_a.obtener(self.token.key))
+
+        # Si la caché compartida pierde la generación, la entrada local tampoco vale
+        worker_a.guardar(self.token.key, entrada)
+        compartida.clear()
+        self.assertIsNone(worker_a.obtener(self.token.key))
+
+    def test_sin_cache_compartida_la_revocacion_vence_en_segundos(self):
+        """Con cachés de Django separadas por proceso, la entrada revocada dura a lo más ttl_local"""
+        worker_a = CacheTokens(ttl=300, cache=LocMemCache('tokens-a', {}), ttl_local=5)
+        worker_b = CacheTokens(ttl=300, cache=LocMemCache('tokens-b', {}), ttl_local=5)
+        self.assertEqual(worker_a.ttl, 5)
+        entrada = (self.user, self.token, 'Admin')
+        with mock.patch('cmms_api.authentication.time.monotonic', return_value=1000.0):
+            worker_a.guardar(self.token.key, entrada)
+            worker_b.invalidar_usuario(self.user.pk)
+            # La generación no llega al worker A: su entrada sigue vigente...
+            self.assertIsNotNone(worker_a.obtener(self.token.key))
+        # ...pero sólo unos segundos, no los 300 de CACHE_TOKENS_TTL
+        with mock.patch('cmms_api.authentication.time.monotonic', return_value=1006.0):
+            self.assertIsNone(worker_a.obtener(self.token.key))
+
+        # La caché por defecto de las pruebas (LocMemCache) también acorta el TTL
+        self.assertEqual(CacheTokens(ttl=300).ttl, CacheTokens().ttl_local)
@@ -0,0 +1,73 @@
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import ChecklistItem
+from . import cache_plantillas
+from .datos_prueba import ChecklistDatosMixin
+
+
+class CachePlantillasTest(ChecklistDatosMixin, TestCase):
+    """Pruebas de la caché de plantillas para templates-por-equipo"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.crear_datos_checklist()
+        self.url = f'/api/checklist-workflow/templates-por-equipo/{self.equipo.idequipo}/'
+
+    def test_sirve_desde_cache_y_responde_304(self):
+        """La segunda petición no serializa el árbol y el ETag permite un 304"""
+        primera = self.client.get(self.url)
+        self.assertEqual(primera.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(primera.data['templates'][0]['categories'][0]['items']), 4)
+
+        with self.assertNumQueries(1):
+            segunda = self.client.get(self.url)
+        self.assertEqual(segunda.data, primera.data)
+
+        with self.assertNumQueries(1):
+            no_modificada = self.client.get(self.url, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(no_modificada.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_invalida_al_modificar_items(self):
+        """Crear, editar o borrar un ítem invalida el snapshot"""
+        etag = self.client.get(self.url)['ETag']
+
+        item = ChecklistItem.objects.create(category=self.category, texto="Ítem nuevo", orden=10)
+        respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(respuesta.data['templates'][0]['categories'][0]['items']), 5)
+
+        item.texto = "Ítem renombrado"
+        item.save()
+        respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertIn("Ítem renombrado", [i['texto'] for i in respuesta.data['templates'][0]['categories'][0]['items']])
+
+        self.template.delete()
+        respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta.data['templates'], [])
+
+    def test_invalida_otra_vez_al_confirmar(self):
+        """Un snapshot reconstruido antes del commit no sobrevive a la confirmación"""
+        tipo = self.tipo_equipo.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.items[0].texto = "Ítem editado"
+            self.items[0].save()
+            # Request concurrente que reconstruye el snapshot con la versión nueva antes del commit
+            clave_previa = cache_plantillas._clave_snapshot(tipo)
+            cache_plantillas.obtener_snapshot(tipo)
+        self.assertNotEqual(cache_plantillas._clave_snapshot(tipo), clave_previa)
+
+    def test_lectura_de_horometro_no_cambia_el_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.equipo.horometroactual = 1500
+        self.equipo.save()
+        respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_cache_local_usa_plazo_corto(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual(cache_plantillas._timeout(), cache_plantillas.TIMEOUT_CACHE_LOCAL)
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+            self.assertEqual(cache_plantillas._timeout(), cache_plantillas.TIMEOUT)
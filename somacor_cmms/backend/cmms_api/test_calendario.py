@@ -0,0 +1,76 @@
+import datetime
+import json
+from unittest import mock
+
+from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import Agendas, Equipos, Faenas
+from . import calendario
+from .datos_prueba import OrdenesTrabajoDatosMixin
+
+
+class CalendarioTest(OrdenesTrabajoDatosMixin, TestCase):
+    """Feed del calendario con proyección, solapamiento y streaming"""
+
+    def setUp(self):
+        self.crear_datos_ot()
+        self.client = APIClient()
+        self.url = '/api/agendas/calendario/'
+        self.otra_faena = Faenas.objects.create(nombrefaena='Faena Sur')
+        self.otro_equipo = Equipos.objects.create(
+            nombreequipo='Camión 7', idtipoequipo=self.tipo_equipo,
+            idestadoactual=self.estado_equipo, idfaenaactual=self.otra_faena
+        )
+        self.ot = self.crear_ot(cantidad_actividades=0)
+
+    def evento(self, titulo, inicio, horas, **extra):
+        inicio = timezone.make_aware(datetime.datetime.combine(datetime.date(2025, 6, 1), datetime.time())) + inicio
+        return Agendas.objects.create(
+            tituloevento=titulo, fechahorainicio=inicio, fechahorafin=inicio + datetime.timedelta(hours=horas),
+            idusuariocreador=self.user, **extra
+        )
+
+    def titulos(self, **params):
+        respuesta = self.client.get(self.url, {'start': '2025-06-01', 'end': '2025-06-08', **params})
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        return sorted(evento['title'] for evento in respuesta.data)
+
+    def test_solapamiento_y_nombres_unidos(self):
+        dia = datetime.timedelta(days=1)
+        self.evento('Cruza el inicio', -dia, 48, idequipo=self.equipo, idordentrabajo=self.ot)
+        self.evento('Dentro', 2 * dia, 2, idequipo=self.otro_equipo)
+        self.evento('Cruza el fin', 7 * dia - datetime.timedelta(hours=1), 3)
+        self.evento('Termina justo al inicio', -dia, 24)
+        self.evento('Posterior', 8 * dia, 1)
+
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(self.url, {'start': '2025-06-01', 'end': '2025-06-08'})
+        # Eventos simples y eventos recurrentes (sin recurrentes no se consultan excepciones)
+        self.assertEqual(len(consultas), 2)
+        self.assertEqual([e['title'] for e in respuesta.data], ['Cruza el inicio', 'Dentro', 'Cruza el fin'])
+        self.assertEqual(respuesta.data[0]['extendedProps']['equipo'], 'Minicargador 1')
+        self.assertEqual(respuesta.data[0]['extendedProps']['orden_trabajo'], self.ot.numeroot)
+
+    def test_filtros_por_tecnico_y_faena(self):
+        self.evento('De la OT del técnico', datetime.timedelta(hours=8), 1, idordentrabajo=self.ot)
+        self.evento('Asignado al técnico', datetime.timedelta(hours=9), 1, idusuarioasignado=self.tecnico)
+        self.evento('De la faena sur', datetime.timedelta(hours=10), 1, idequipo=self.otro_equipo)
+
+        self.assertEqual(self.titulos(tecnico=self.tecnico.pk), ['Asignado al técnico', 'De la OT del técnico'])
+        self.assertEqual(self.titulos(faena=self.otra_faena.pk), ['De la faena sur'])
+        for invalido in ({'start': 'ayer'}, {'tecnico': 'abc'}, {'faena': '1.5'}, {'equipo': '2;3'}):
+            self.assertEqual(self.client.get(self.url, invalido).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rangos_grandes_en_streaming(self):
+        for hora in range(5):
+            self.evento(f'Evento {hora}', datetime.timedelta(hours=hora), 1, idequipo=self.equipo)
+
+        with mock.patch.object(calendario, 'EVENTOS_SIN_STREAMING', 2):
+            respuesta = self.client.get(self.url, {'start': '2025-06-01T00:00:00-00:00', 'end': '2025-06-02'})
+        self.assertTrue(respuesta.streaming)
+        eventos = json.loads(b''.join(respuesta.streaming_content))
+        self.assertEqual([e['title'] for e in eventos], [f'Evento {hora}' for hora in range(5)])
@@ -0,0 +1,60 @@
+from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import EstadosOrdenTrabajo, TiposMantenimientoOT
+from .catalogos import estados_ot, invalidar_catalogos
+from .datos_prueba import OrdenesTrabajoDatosMixin
+
+
+class RegistroCatalogosTest(OrdenesTrabajoDatosMixin, TestCase):
+    """Estados y tipos de OT resueltos en memoria"""
+
+    def setUp(self):
+        invalidar_catalogos()
+        self.crear_datos_ot()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _consultas_a_catalogos(self, consultas):
+        # Consultas cuya tabla principal es un catálogo (los JOIN no cuentan)
+        tablas = ('estadosordentrabajo', 'tiposmantenimientoot')
+        return [
+            q['sql'] for q in consultas.captured_queries
+            if any(f'FROM {tabla} ' in q['sql'].replace('"', '').replace('`', '') + ' ' for tabla in tablas)
+            or any(f'INTO {tabla}' in q['sql'].replace('"', '').replace('`', '') for tabla in tablas)
+        ]
+
+    def test_reportar_falla_no_consulta_catalogos(self):
+        url = reverse('ordenestrabajo-reportar-falla')
+        datos = {'idequipo': self.equipo.pk, 'descripcionproblemareportado': 'Pérdida de aceite'}
+
+        # El tipo 'Correctivo' no existe: la primera OT lo crea y la segunda recarga el catálogo
+        for _ in range(2):
+            response = self.client.post(url, datos, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['tipo_mantenimiento_nombre'], 'Correctivo')
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.post(url, datos, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self._consultas_a_catalogos(consultas), [])
+        self.assertEqual(TiposMantenimientoOT.objects.filter(nombretipomantenimientoot='Correctivo').count(), 1)
+
+    def test_completar_orden_y_invalidacion(self):
+        EstadosOrdenTrabajo.objects.create(nombreestadoot='Completada')
+        self.assertEqual(estados_ot.id('Abierta'), self.estado_abierta.pk)
+
+        orden = self.crear_ot()
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.post(reverse('ordenestrabajo-completar-orden', args=[orden.pk]), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._consultas_a_catalogos(consultas), [])
+
+        # Editar el catálogo invalida el registro
+        self.estado_abierta.nombreestadoot = 'Pendiente'
+        self.estado_abierta.save()
+        self.assertEqual(estados_ot.obtener('Pendiente').pk, self.estado_abierta.pk)
+        self.assertNotEqual(estados_ot.id('Abierta'), self.estado_abierta.pk)
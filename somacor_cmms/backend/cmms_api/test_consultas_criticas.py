@@ -0,0 +1,53 @@
+import datetime
+from io import StringIO
+
+from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+from .models import Agendas, Equipos
+from .consultas_criticas import consultas_criticas
+from .datos_prueba import OrdenesTrabajoDatosMixin
+
+
+class PlanesConsultasTest(OrdenesTrabajoDatosMixin, TestCase):
+    """
+    Verifica con EXPLAIN que las consultas de ventana de tiempo usan su índice
+    compuesto. Corre contra el motor configurado (SQLite o MySQL con USE_MYSQL).
+    """
+
+    def setUp(self):
+        self.crear_datos_ot()
+        otro_equipo = Equipos.objects.create(
+            nombreequipo='Minicargador 2', codigointerno='MC-002',
+            idtipoequipo=self.tipo_equipo, idestadoactual=self.estado_equipo
+        )
+        # Datos suficientes para que el planificador no prefiera recorrer la tabla
+        for i in range(30):
+            equipo = self.equipo if i % 2 else otro_equipo
+            self.crear_ot(cantidad_actividades=0, idequipo=equipo,
+                          fechaejecucion=datetime.date.today() - datetime.timedelta(days=i))
+            Agendas.objects.create(
+                tituloevento=f'Evento {i}',
+                fechahorainicio=timezone.now() + datetime.timedelta(days=i),
+                fechahorafin=timezone.now() + datetime.timedelta(days=i, hours=2),
+                tipoevento='Mantenimiento Preventivo' if i % 3 else 'Reunión',
+                idequipo=equipo,
+                idplanmantenimiento=self.plan,
+                idusuariocreador=self.user
+            )
+            self.crear_instancia(['bueno', 'malo', 'bueno', 'na'], equipo=equipo,
+                                 fecha=datetime.date.today() - datetime.timedelta(days=i))
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def test_consultas_usan_indices_compuestos(self):
+        for consulta in consultas_criticas(equipo_id=self.equipo.pk, plan_id=self.plan.pk):
+            with self.subTest(consulta=consulta.nombre):
+                self.assertIn(consulta.indice, consulta.queryset.explain())
+
+    def test_comando_medir_consultas(self):
+        salida = StringIO()
+        call_command('medir_consultas', repeticiones=1, stdout=salida)
+        self.assertNotIn(': NO', salida.getvalue())
@@ -0,0 +1,99 @@
+import datetime
+
+from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import Agendas, Equipos, EstadosEquipo, EstadosOrdenTrabajo, TiposMantenimientoOT
+from . import dashboard
+from .datos_prueba import OrdenesTrabajoDatosMixin
+
+
+class DashboardSnapshotTest(OrdenesTrabajoDatosMixin, TestCase):
+    """Snapshot del dashboard: agregación condicional y caché por secciones"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = '/api/mantenimiento-workflow/dashboard/'
+        self.crear_datos_ot()
+        EstadosEquipo.objects.create(nombreestado='En Mantenimiento')
+        Equipos.objects.create(
+            nombreequipo='Camión inactivo', idtipoequipo=self.tipo_equipo,
+            idestadoactual=self.estado_equipo, activo=False
+        )
+        self.estado_completada = EstadosOrdenTrabajo.objects.create(nombreestadoot='Completada')
+        TiposMantenimientoOT.objects.create(nombretipomantenimientoot='Correctivo')
+        hoy = timezone.localdate()
+        self.crear_ot(cantidad_actividades=0, fechaejecucion=hoy - datetime.timedelta(days=2))
+        self.crear_ot(cantidad_actividades=0, fechaejecucion=hoy + datetime.timedelta(days=2))
+        self.crear_ot(
+            cantidad_actividades=0, idestadoot=self.estado_completada,
+            fechaejecucion=hoy - datetime.timedelta(days=5)
+        )
+        inicio = timezone.make_aware(datetime.datetime.combine(hoy + datetime.timedelta(days=1), datetime.time(8)))
+        Agendas.objects.create(
+            tituloevento='Preventivo', fechahorainicio=inicio, fechahorafin=inicio + datetime.timedelta(hours=2),
+            tipoevento='Mantenimiento Preventivo', idusuariocreador=self.user
+        )
+
+    def test_indicadores_con_pocas_consultas(self):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(consultas), 3)
+        self.assertEqual(respuesta.data['estadisticas_generales'], {
+            'total_equipos': 1,
+            'equipos_operativos': 1,
+            'ots_abiertas': 2,
+            'ots_vencidas': 1,
+            'mantenimientos_proximos': 1
+        })
+        self.assertEqual(respuesta.data['equipos_por_estado'], [
+            {'nombreestado': 'En Mantenimiento', 'cantidad': 0},
+            {'nombreestado': 'Operativo', 'cantidad': 2},
+        ])
+        self.assertEqual(respuesta.data['ots_por_tipo'], [
+            {'nombretipomantenimientoot': 'Correctivo', 'cantidad': 0},
+            {'nombretipomantenimientoot': 'Preventivo', 'cantidad': 3},
+        ])
+
+        # Segunda carga: desde la caché
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(self.url)
+        self.assertEqual(len(consultas), 0)
+
+    def test_guardar_una_ot_recalcula_solo_su_seccion(self):
+        self.client.get(self.url)
+        self.crear_ot(cantidad_actividades=0)
+
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(self.url)
+        self.assertEqual(len(consultas), 1)
+        self.assertEqual(respuesta.data['estadisticas_generales']['ots_abiertas'], 3)
+
+    def test_invalida_otra_vez_al_confirmar(self):
+        """Una sección recalculada antes del commit se vuelve a calcular después"""
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.crear_ot(cantidad_actividades=0)
+            # Request concurrente que recalcula la sección antes del commit
+            self.client.get(self.url)
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(self.url)
+        self.assertEqual(len(consultas), 1)
+
+    def test_mientras_otro_proceso_recalcula_se_sirve_la_copia_anterior(self):
+        hoy = timezone.localdate()
+        self.client.get(self.url)
+        dashboard.invalidar('ordenes')
+        cache.add(f'dashboard:ordenes:{hoy.isoformat()}:recalculando', 1)
+
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(self.url)
+        self.assertEqual(len(consultas), 0)
+        self.assertEqual(respuesta.data['estadisticas_generales']['ots_abiertas'], 2)
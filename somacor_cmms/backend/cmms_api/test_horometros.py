@@ -0,0 +1,114 @@
+import datetime
+from io import StringIO
+
+from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import (
+    Agendas, ChecklistInstance, ChecklistTemplate, DetallesPlanMantenimiento, Equipos,
+    HistorialHorometro, OrdenesTrabajo
+)
+from .proyeccion_agenda import generar_agenda_preventiva
+from .horometros import estimar_tasa_uso
+from .datos_prueba import OrdenesTrabajoDatosMixin, vencimientos_iterativos
+
+
+class HistorialHorometroTest(OrdenesTrabajoDatosMixin, TestCase):
+    """Historial de horómetro y tasa de uso estimada por equipo"""
+
+    def setUp(self):
+        self.crear_datos_ot()
+        self.ahora = timezone.now()
+
+    def lecturas_diarias(self, horas_por_dia, dias=30, inicial=1000):
+        return [
+            (self.ahora - datetime.timedelta(days=dias - d), inicial + horas_por_dia * d)
+            for d in range(dias + 1)
+        ]
+
+    def test_estimar_tasa_uso(self):
+        self.assertEqual(estimar_tasa_uso(self.lecturas_diarias(10)), 10.0)
+        self.assertIsNone(estimar_tasa_uso(self.lecturas_diarias(10)[:1]))
+        # Horómetro reemplazado: la pendiente no es positiva
+        self.assertIsNone(estimar_tasa_uso([(self.ahora - datetime.timedelta(days=5), 900), (self.ahora, 10)]))
+        # Las lecturas fuera de la ventana no cuentan
+        antiguas = [(fecha - datetime.timedelta(days=200), horas - 5000) for fecha, horas in self.lecturas_diarias(2)]
+        self.assertEqual(estimar_tasa_uso(antiguas + self.lecturas_diarias(10)), 10.0)
+        # Una copia del horómetro (OT automática) no se interpreta como equipo detenido
+        copia = self.lecturas_diarias(10) + [(self.ahora + datetime.timedelta(days=3), 1300)]
+        self.assertEqual(estimar_tasa_uso(copia), 10.0)
+
+    def test_checklists_y_ots_alimentan_el_historial(self):
+        ChecklistInstance.objects.create(
+            template=ChecklistTemplate.objects.create(nombre='Check', tipo_equipo=self.tipo_equipo),
+            equipo=self.equipo, operador=self.user,
+            fecha_inspeccion=timezone.localdate() - datetime.timedelta(days=10), horometro_inspeccion=1000
+        )
+        ot = self.crear_ot(horometro=1120)
+        # Guardar de nuevo no duplica la lectura: la restricción la rechaza, sin consultar antes
+        with CaptureQueriesContext(connection) as consultas:
+            ot.save()
+        self.assertFalse(any(
+            c['sql'].startswith('SELECT') and 'historialhorometro' in c['sql'] for c in consultas.captured_queries
+        ))
+
+        self.assertEqual(
+            list(HistorialHorometro.objects.order_by('fechalectura').values_list('origen', 'horometro')),
+            [('checklist', 1000), ('ot', 1120)]
+        )
+        self.equipo.refresh_from_db()
+        self.assertEqual(self.equipo.horometroactual, 1120)
+        self.assertAlmostEqual(self.equipo.tasausodiaria, 12.0, delta=0.5)
+
+    def test_actualizar_horometro_manual(self):
+        # Las lecturas manuales no tienen referencia y no chocan con la restricción
+        for dias in (20, 30):
+            HistorialHorometro.objects.create(
+                idequipo=self.equipo, horometro=1000 - 10 * dias, origen='manual',
+                fechalectura=self.ahora - datetime.timedelta(days=dias)
+            )
+        respuesta = APIClient().post('/api/mantenimiento-workflow/actualizar-horometro/', {
+            'equipo_id': self.equipo.idequipo, 'horometro': 1000, 'observaciones': 'Lectura en terreno'
+        }, format='json')
+
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        self.assertEqual(respuesta.data['horometro_nuevo'], 1000)
+        self.assertAlmostEqual(respuesta.data['tasa_uso_diaria'], 10.0, delta=0.1)
+        self.equipo.refresh_from_db()
+        self.assertEqual(self.equipo.horometroactual, 1000)
+        self.assertEqual(HistorialHorometro.objects.filter(observaciones='Lectura en terreno').count(), 1)
+
+        respuesta = APIClient().post('/api/mantenimiento-workflow/actualizar-horometro/', {
+            'equipo_id': self.equipo.idequipo, 'horometro': 'mucho'
+        }, format='json')
+        self.assertEqual(respuesta.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_reconstruir_historial_es_idempotente(self):
+        ots = [self.crear_ot(horometro=horas) for horas in (500, 700)]
+        HistorialHorometro.objects.all().delete()
+        for ot, dias in zip(ots, (20, 0)):
+            OrdenesTrabajo.objects.filter(pk=ot.pk).update(fechacompletado=self.ahora - datetime.timedelta(days=dias))
+
+        for _ in range(2):
+            call_command('reconstruir_historial_horometro', stdout=StringIO())
+        self.assertEqual(HistorialHorometro.objects.count(), 2)
+        self.equipo.refresh_from_db()
+        self.assertEqual(self.equipo.horometroactual, 700)
+        self.assertEqual(self.equipo.tasausodiaria, 10.0)
+
+    def test_la_agenda_usa_la_tasa_del_equipo(self):
+        detalle = DetallesPlanMantenimiento.objects.create(
+            idplanmantenimiento=self.plan, idtareaestandar=self.tarea, intervalohorasoperacion=250
+        )
+        Equipos.objects.filter(pk=self.equipo.pk).update(horometroactual=1000, tasausodiaria=25 / 2)
+        generar_agenda_preventiva(dias_adelante=60, usuario=self.user)
+
+        dias = sorted(
+            (timezone.localtime(inicio).date() - timezone.localdate()).days
+            for inicio in Agendas.objects.values_list('fechahorainicio', flat=True)
+        )
+        self.assertEqual(dias, vencimientos_iterativos(1000, detalle.intervalohorasoperacion, 12.5, 60))
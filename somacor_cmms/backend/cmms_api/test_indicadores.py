@@ -0,0 +1,166 @@
+import datetime
+from io import StringIO
+
+from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import (
+    ChecklistInstance, EstadosOrdenTrabajo, IndicadoresDiariosEquipo, OrdenesTrabajo,
+    TiposMantenimientoOT
+)
+from .consultas_criticas import rango_dias
+from .indicadores import CAMPOS_INDICADORES
+from .datos_prueba import OrdenesTrabajoDatosMixin
+
+
+class IndicadoresConfiabilidadTest(OrdenesTrabajoDatosMixin, TestCase):
+    """Indicadores diarios por equipo mantenidos desde OTs y checklists, y MTBF / MTTR / disponibilidad"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.crear_datos_ot()
+        self.dia = datetime.date(2025, 6, 10)
+        self.correctivo = TiposMantenimientoOT.objects.create(nombretipomantenimientoot='Correctivo')
+        self.completada = EstadosOrdenTrabajo.objects.create(nombreestadoot='Completada')
+
+    def hora(self, dias, hora):
+        dia = self.dia + datetime.timedelta(days=dias)
+        return timezone.make_aware(datetime.datetime.combine(dia, datetime.time(hora)))
+
+    def cargar_actividad(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            falla = self.crear_ot(
+                cantidad_actividades=0, idtipomantenimientoot=self.correctivo, fechareportefalla=self.hora(0, 8)
+            )
+            falla.idestadoot = self.completada
+            falla.fechacompletado = self.hora(0, 14)
+            falla.tiempototalminutos = 240
+            falla.save()
+            self.crear_ot(
+                cantidad_actividades=0, idestadoot=self.completada,
+                fechacompletado=self.hora(1, 10), tiempototalminutos=120
+            )
+            for criticas_malas in (0, 1):
+                ChecklistInstance.objects.create(
+                    template=self.template, equipo=self.equipo, operador=self.user, fecha_inspeccion=self.dia,
+                    horometro_inspeccion=1000, respuestas_criticas_malas=criticas_malas
+                )
+        return falla
+
+    def indicadores(self):
+        return {
+            fila.fecha: {campo: getattr(fila, campo) for campo in CAMPOS_INDICADORES if getattr(fila, campo)}
+            for fila in IndicadoresDiariosEquipo.objects.filter(idequipo=self.equipo)
+        }
+
+    def test_se_mantienen_al_guardar_y_coinciden_con_la_reconstruccion(self):
+        falla = self.cargar_actividad()
+        esperado = {
+            self.dia: {
+                'fallas': 1, 'reparaciones': 1, 'minutosreparacion': 240, 'minutosdetencion': 360,
+                'horascorrectivo': 4.0, 'checklists': 2, 'checklistsconformes': 1
+            },
+            self.dia + datetime.timedelta(days=1): {'horaspreventivo': 2.0},
+        }
+        self.assertEqual(self.indicadores(), esperado)
+
+        IndicadoresDiariosEquipo.objects.all().delete()
+        call_command('reconstruir_indicadores', stdout=StringIO())
+        self.assertEqual(self.indicadores(), esperado)
+
+        # Mover el cierre recalcula el día anterior y el nuevo; la detención se reparte entre los días
+        with self.captureOnCommitCallbacks(execute=True):
+            falla.fechacompletado = self.hora(2, 8)
+            falla.save()
+        indicadores = self.indicadores()
+        self.assertNotIn('reparaciones', indicadores[self.dia])
+        self.assertEqual(
+            [indicadores[self.dia + datetime.timedelta(days=d)]['minutosdetencion'] for d in range(3)],
+            [16 * 60, 24 * 60, 8 * 60]
+        )
+        self.assertEqual(indicadores[self.dia + datetime.timedelta(days=2)]['reparaciones'], 1)
+
+        IndicadoresDiariosEquipo.objects.all().delete()
+        call_command('reconstruir_indicadores', stdout=StringIO())
+        self.assertEqual(self.indicadores(), indicadores)
+
+    def confiabilidad(self, desde, hasta):
+        respuesta = self.client.get('/api/mantenimiento-workflow/reportes/confiabilidad/', {
+            'fecha_inicio': desde.isoformat(), 'fecha_fin': hasta.isoformat()
+        })
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        return respuesta.data['flota']
+
+    def test_reparacion_que_cruza_el_borde_de_la_ventana(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.crear_ot(
+                cantidad_actividades=0, idtipomantenimientoot=self.correctivo, idestadoot=self.completada,
+                fechareportefalla=self.hora(0, 20), fechacompletado=self.hora(1, 4)
+            )
+        # 8 horas de detención: 4 en cada día
+        dia_siguiente = self.dia + datetime.timedelta(days=1)
+        self.assertEqual(self.confiabilidad(self.dia, self.dia)['horas_detencion'], 4.0)
+        flota = self.confiabilidad(dia_siguiente, dia_siguiente)
+        self.assertEqual((flota['horas_detencion'], flota['disponibilidad']), (4.0, 83.33))
+        self.assertEqual(flota['mttr_horas'], 8.0)
+
+    def test_falla_abierta_cuenta_hasta_ahora(self):
+        hoy = timezone.localdate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.crear_ot(
+                cantidad_actividades=0, idtipomantenimientoot=self.correctivo,
+                fechareportefalla=timezone.now() - datetime.timedelta(hours=6)
+            )
+        # 10 días = 240 horas calendario, 6 horas de detención hasta ahora
+        flota = self.confiabilidad(hoy - datetime.timedelta(days=9), hoy)
+        self.assertEqual((flota['fallas'], flota['reparaciones'], flota['fallas_abiertas']), (1, 0, 1))
+        self.assertEqual(flota['horas_detencion'], 6.0)
+        self.assertEqual(flota['disponibilidad'], 97.5)
+        self.assertEqual(flota['mtbf_horas'], 234.0)
+        self.assertEqual(flota['mttr_horas'], 6.0)
+
+        # En una ventana ya cerrada, la detención se cuenta hasta su fin
+        inicio_falla = timezone.now() - datetime.timedelta(days=3)
+        OrdenesTrabajo.objects.filter(idtipomantenimientoot=self.correctivo).update(fechareportefalla=inicio_falla)
+        dia_falla = timezone.localdate(inicio_falla)
+        _, fin_ventana = rango_dias(dia_falla, dia_falla)
+        flota = self.confiabilidad(dia_falla, dia_falla)
+        self.assertEqual(flota['horas_detencion'], round((fin_ventana - inicio_falla).total_seconds() // 60 / 60, 2))
+
+    def test_confiabilidad_desde_los_indicadores(self):
+        self.cargar_actividad()
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get('/api/mantenimiento-workflow/reportes/confiabilidad/', {
+                'fecha_inicio': '2025-06-10', 'fecha_fin': '2025-06-19'
+            })
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        # Indicadores agrupados, fallas abiertas y cantidad de equipos
+        self.assertEqual(len(consultas), 3)
+
+        # 10 días = 240 horas calendario, 6 horas de detención
+        flota = respuesta.data['flota']
+        self.assertEqual(flota['equipos'], 1)
+        self.assertEqual(flota['mtbf_horas'], 234.0)
+        self.assertEqual(flota['mttr_horas'], 4.0)
+        self.assertEqual(flota['disponibilidad'], 97.5)
+        self.assertEqual(respuesta.data['por_equipo'][0]['horas_preventivo'], 2.0)
+        self.assertEqual(respuesta.data['por_equipo'][0]['checklists_conformes'], 1)
+
+        respuesta = self.client.get('/api/mantenimiento-workflow/reportes/confiabilidad/', {
+            'fecha_inicio': '10-06-2025', 'fecha_fin': '2025-06-19'
+        })
+        self.assertEqual(respuesta.status_code, status.HTTP_400_BAD_REQUEST)
+        for invalido in ({'equipo': 'abc'}, {'faena': 'x'}, {'tipo_equipo': '1;2'}):
+            respuesta = self.client.get('/api/mantenimiento-workflow/reportes/confiabilidad/', invalido)
+            self.assertEqual(respuesta.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_guardar_contadores_no_lee_la_fila_anterior(self):
+        instancia = self.crear_instancia(['malo', 'bueno', 'bueno', 'bueno'], fecha=datetime.date(2025, 6, 12))
+        with CaptureQueriesContext(connection) as consultas:
+            instancia.actualizar_resumen()
+        # El agregado de respuestas y el UPDATE; sin SELECT de la fila para el día anterior
+        self.assertEqual(len(consultas), 2)
@@ -0,0 +1,54 @@
+from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from .datos_prueba import OrdenesTrabajoDatosMixin
+
+
+class ListadoOrdenesTrabajoTest(OrdenesTrabajoDatosMixin, TestCase):
+    """El listado de OTs usa una cantidad fija de consultas por página"""
+
+    def setUp(self):
+        self.crear_datos_ot()
+        self.client = APIClient()
+        self.url = reverse('ordenestrabajo-list')
+
+    def test_consultas_por_pagina_constantes(self):
+        self.crear_ot()
+        # OTs con sus FKs + COUNT de la paginación (+ actividades al expandirlas)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['tecnico_nombre'], 'Juan Pérez')
+        self.assertNotIn('actividades', response.data['results'][0])
+
+        for _ in range(49):
+            self.crear_ot(cantidad_actividades=5)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['results']), 50)
+        # Sin COUNT si el cliente no lo necesita
+        with self.assertNumQueries(1):
+            self.client.get(self.url, {'count': 'none'})
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {'expand': 'actividades'})
+        self.assertEqual(len(response.data['results'][0]['actividades']), 5)
+        self.assertEqual(response.data['results'][-1]['actividades'][0]['tarea_nombre'], 'Cambio de aceite')
+
+    def test_fields_limita_la_respuesta_y_las_consultas(self):
+        orden = self.crear_ot()
+        response = self.client.get(self.url, {'fields': 'numeroot,estado_nombre'})
+        self.assertEqual(response.data['results'], [{'numeroot': orden.numeroot, 'estado_nombre': 'Abierta'}])
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse('ordenestrabajo-detail', args=[orden.pk]), {'fields': 'numeroot'})
+        self.assertNotIn('JOIN', consultas.captured_queries[-1]['sql'])
+
+    def test_detalle(self):
+        orden = self.crear_ot()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('ordenestrabajo-detail', args=[orden.pk]))
+        self.assertEqual(response.data['equipo_nombre'], 'Minicargador 1')
+        self.assertEqual(len(response.data['actividades']), 2)
@@ -0,0 +1,63 @@
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import OrdenesTrabajo
+from .datos_prueba import OrdenesTrabajoDatosMixin
+
+
+class PaginacionCursorTest(OrdenesTrabajoDatosMixin, TestCase):
+    """Colecciones grandes paginadas por cursor, con conteo opcional"""
+
+    def setUp(self):
+        self.crear_datos_ot()
+        self.client = APIClient()
+        self.url = reverse('ordenestrabajo-list')
+        self.ordenes = [self.crear_ot() for _ in range(7)]
+        # Misma fecha de creación en varias OTs: el desempate es la clave primaria
+        OrdenesTrabajo.objects.filter(pk__in=[orden.pk for orden in self.ordenes[2:5]]).update(
+            fechacreacionot=self.ordenes[2].fechacreacionot
+        )
+
+    def _recorrer(self, enlace, clave):
+        vistos = []
+        while enlace:
+            respuesta = self.client.get(enlace)
+            self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+            vistos += [fila['idordentrabajo'] for fila in respuesta.data['results']]
+            ultima = respuesta
+            enlace = respuesta.data[clave]
+        return vistos, ultima
+
+    def test_recorre_hacia_adelante_y_atras(self):
+        esperados = list(OrdenesTrabajo.objects.order_by('-fechacreacionot', '-idordentrabajo')
+                         .values_list('idordentrabajo', flat=True))
+        primera = self.client.get(self.url, {'limite': 3})
+        self.assertIsNone(primera.data['previous'])
+        self.assertEqual(primera.data['count'], 7)
+
+        vistos, ultima = self._recorrer(f'{self.url}?limite=3', 'next')
+        self.assertEqual(vistos, esperados)
+        self.assertEqual(len(ultima.data['results']), 1)
+
+        # Desde la última página hacia atrás se obtienen las mismas páginas
+        atras = self.client.get(ultima.data['previous'])
+        self.assertEqual([fila['idordentrabajo'] for fila in atras.data['results']], esperados[3:6])
+        atras = self.client.get(atras.data['previous'])
+        self.assertEqual([fila['idordentrabajo'] for fila in atras.data['results']], esperados[:3])
+        self.assertIsNone(atras.data['previous'])
+
+    def test_conteo_opcional(self):
+        with self.assertNumQueries(1):
+            respuesta = self.client.get(self.url, {'count': 'none'})
+        self.assertIsNone(respuesta.data['count'])
+        self.assertEqual(self.client.get(self.url, {'count': 'estimate'}).data['count'], 7)
+
+        # page (paginación por número) se rechaza en vez de ignorarse
+        for params in ({'count': 'todo'}, {'cursor': 'xyz'}, {'limite': 500}, {'page': 2}):
+            self.assertEqual(self.client.get(self.url, params).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_catalogos_mantienen_paginacion_por_numero(self):
+        respuesta = self.client.get(reverse('tiposmantenimientoot-list'), {'page': 1})
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        self.assertEqual(respuesta.data['count'], 1)
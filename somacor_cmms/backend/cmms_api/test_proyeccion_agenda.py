@@ -0,0 +1,138 @@
+import datetime
+from io import StringIO
+
+from django.test import TestCase
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import Agendas, DetallesPlanMantenimiento, Equipos, TareasEstandar
+from .proyeccion_agenda import proyectar_vencimientos, generar_agenda_preventiva
+from .datos_prueba import OrdenesTrabajoDatosMixin, vencimientos_iterativos
+
+
+class ProyeccionAgendaTest(OrdenesTrabajoDatosMixin, TestCase):
+    """Proyección vectorizada de la agenda preventiva"""
+
+    def setUp(self):
+        self.crear_datos_ot()
+        for intervalo, critica in ((250, False), (500, True)):
+            DetallesPlanMantenimiento.objects.create(
+                idplanmantenimiento=self.plan, idtareaestandar=TareasEstandar.objects.create(
+                    nombretarea=f'Servicio {intervalo}h', idtipotarea=self.tarea.idtipotarea
+                ),
+                intervalohorasoperacion=intervalo, escritic=critica
+            )
+
+    def test_coincide_con_el_calculo_iterativo(self):
+        casos = [(0, 250, 8), (1000, 250, 8), (1249, 250, 8), (1, 500, 12.5), (777, 100, 3), (5, 40, 24)]
+        indices, dias, _ = proyectar_vencimientos(*zip(*[c[:3] for c in casos]), 365)
+        for i, (horometro, intervalo, tasa) in enumerate(casos):
+            with self.subTest(caso=casos[i]):
+                self.assertEqual(dias[indices == i].tolist(), vencimientos_iterativos(horometro, intervalo, tasa, 365))
+
+    def test_genera_sin_duplicar_y_con_consultas_acotadas(self):
+        for i in range(2, 12):
+            Equipos.objects.create(
+                nombreequipo=f'Minicargador {i}', codigointerno=f'MC-{i:03d}',
+                idtipoequipo=self.tipo_equipo, idestadoactual=self.estado_equipo
+            )
+        self.crear_ot(horometro=1245)
+
+        # equipos (con horómetro y tasa) + detalles + agenda existente, más los INSERT por lote
+        with CaptureQueriesContext(connection) as consultas:
+            creados = generar_agenda_preventiva(dias_adelante=365, usuario=self.user)
+        lecturas = [q for q in consultas.captured_queries if not q['sql'].startswith('INSERT')]
+        self.assertEqual(len(lecturas), 3)
+        # Equipo con 1245 h: el servicio de 250 h vence hoy (faltan 5 h, menos de un día de uso)
+        self.assertEqual(Agendas.objects.filter(idequipo=self.equipo).count(),
+                         len(vencimientos_iterativos(1245, 250, 8, 365)) +
+                         len(vencimientos_iterativos(1245, 500, 8, 365)))
+        self.assertEqual(Agendas.objects.count(), creados)
+        self.assertTrue(Agendas.objects.filter(idequipo=self.equipo, fechahorainicio__date=timezone.localdate()).exists())
+
+        self.assertEqual(generar_agenda_preventiva(dias_adelante=365, usuario=self.user), 0)
+
+    def test_comando(self):
+        salida = StringIO()
+        call_command('generar_agenda_preventiva', dias_adelante=60, stdout=salida)
+        self.assertIn('eventos creados', salida.getvalue())
+        self.assertTrue(Agendas.objects.filter(tipoevento='Mantenimiento Preventivo').exists())
+
+
+class GenerarAgendaPlanTest(OrdenesTrabajoDatosMixin, TestCase):
+    """Generación de la agenda de un plan por lotes e idempotente"""
+
+    def setUp(self):
+        self.crear_datos_ot()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = f'/api/planes-mantenimiento/{self.plan.pk}/generar-agenda/'
+        for intervalo in (250, 500):
+            DetallesPlanMantenimiento.objects.create(
+                idplanmantenimiento=self.plan, idtareaestandar=TareasEstandar.objects.create(
+                    nombretarea=f'Servicio {intervalo}h', idtipotarea=self.tarea.idtipotarea
+                ),
+                intervalohorasoperacion=intervalo
+            )
+
+    def crear_equipos(self, cantidad):
+        for i in range(cantidad):
+            Equipos.objects.create(
+                nombreequipo=f'Minicargador extra {Equipos.objects.count()}', idtipoequipo=self.tipo_equipo,
+                idestadoactual=self.estado_equipo, horometroactual=100 * i
+            )
+
+    def generar(self):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.post(self.url)
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        return respuesta, len(consultas)
+
+    def test_consultas_constantes_e_idempotente(self):
+        self.crear_equipos(1)
+        respuesta, consultas_pocos = self.generar()
+        self.assertEqual(len(respuesta.data['eventos']), 2 * 2)
+
+        Agendas.objects.all().delete()
+        self.crear_equipos(10)
+        respuesta, consultas_muchos = self.generar()
+        self.assertEqual(consultas_muchos, consultas_pocos)
+        self.assertEqual(len(respuesta.data['eventos']), 12 * 2)
+        self.assertTrue(all(evento['id'] for evento in respuesta.data['eventos']))
+
+        respuesta, _ = self.generar()
+        self.assertEqual(respuesta.data['eventos'], [])
+        self.assertEqual(respuesta.data['eventos_existentes'], 12 * 2)
+        self.assertEqual(Agendas.objects.count(), 12 * 2)
+
+    def test_respeta_eventos_sin_clave(self):
+        # Evento creado antes de las claves de generación, para el vencimiento de hoy
+        inicio = timezone.make_aware(datetime.datetime.combine(timezone.localdate(), datetime.time(8)))
+        Agendas.objects.create(
+            tituloevento='Mantenimiento Servicio 250h - Minicargador 1', fechahorainicio=inicio,
+            fechahorafin=inicio + datetime.timedelta(hours=1), idequipo=self.equipo,
+            idplanmantenimiento=self.plan, idusuariocreador=self.user
+        )
+        respuesta, _ = self.generar()
+        self.assertEqual(respuesta.data['eventos_existentes'], 1)
+        self.assertEqual([e['tarea'] for e in respuesta.data['eventos']], ['Servicio 500h'])
+
+    def test_restriccion_sin_condicion(self):
+        """La unicidad de la clave no depende de índices parciales (MySQL no los tiene)"""
+        restriccion, = Agendas._meta.constraints
+        self.assertIsNone(restriccion.condition)
+
+        inicio = timezone.now()
+        for clave in (None, None, 'plan:x'):
+            Agendas.objects.create(
+                tituloevento='Evento', fechahorainicio=inicio, fechahorafin=inicio,
+                idusuariocreador=self.user, clavegeneracion=clave
+            )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Agendas.objects.create(
+                tituloevento='Duplicado', fechahorainicio=inicio, fechahorafin=inicio,
+                idusuariocreador=self.user, clavegeneracion='plan:x'
+            )
@@ -0,0 +1,116 @@
+import datetime
+
+from django.test import TestCase
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import Agendas, ExcepcionesAgenda
+from .recurrencia import CAMPOS_RECURRENCIA, ocurrencias_en_rango, _inicios
+from .datos_prueba import OrdenesTrabajoDatosMixin
+
+
+class RecurrenciaAgendaTest(OrdenesTrabajoDatosMixin, TestCase):
+    """Expansión de eventos recurrentes por ventana, con excepciones"""
+
+    def setUp(self):
+        self.crear_datos_ot()
+        self.client = APIClient()
+        # Lunes 31-03-2025 a las 08:00; el domingo 06-04 Chile vuelve al horario de invierno
+        self.inicio = timezone.make_aware(datetime.datetime(2025, 3, 31, 8, 0))
+        self.evento = Agendas.objects.create(
+            tituloevento='Lubricación semanal', fechahorainicio=self.inicio,
+            fechahorafin=self.inicio + datetime.timedelta(hours=2), tipoevento='Mantenimiento Preventivo',
+            recursivo=True, reglarecursividad='RRULE:FREQ=WEEKLY;COUNT=8',
+            idequipo=self.equipo, idusuariocreador=self.user
+        )
+
+    def calendario(self, inicio, fin):
+        respuesta = self.client.get('/api/agendas/calendario/', {'start': inicio, 'end': fin})
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        return respuesta.data
+
+    def test_expande_en_la_ventana_conservando_la_hora_local(self):
+        Agendas.objects.create(
+            tituloevento='Evento simple', fechahorainicio=timezone.make_aware(datetime.datetime(2025, 4, 10, 9)),
+            fechahorafin=timezone.make_aware(datetime.datetime(2025, 4, 10, 10)), idusuariocreador=self.user
+        )
+        eventos = self.calendario('2025-04-01', '2025-04-22')
+
+        self.assertEqual(
+            [e['title'] for e in eventos],
+            ['Lubricación semanal', 'Evento simple', 'Lubricación semanal', 'Lubricación semanal']
+        )
+        recurrentes = [e for e in eventos if 'ocurrencia' in e['extendedProps']]
+        self.assertEqual(
+            [timezone.localtime(datetime.datetime.fromisoformat(e['start'])).hour for e in recurrentes], [8, 8, 8]
+        )
+        self.assertTrue(all(e['id'] == self.evento.pk for e in recurrentes))
+        # COUNT=8 termina el 19-05
+        self.assertEqual(len(self.calendario('2025-05-01', '2025-06-30')), 3)
+        self.assertEqual(Agendas.objects.count(), 2)
+
+    def test_excepciones_cancelan_y_mueven_ocurrencias(self):
+        url = f'/api/agendas/{self.evento.pk}/excepciones/'
+        eventos = self.calendario('2025-04-07', '2025-04-14')
+        ocurrencia = eventos[0]['extendedProps']['ocurrencia']
+
+        respuesta = self.client.post(url, {'fechaocurrencia': ocurrencia, 'cancelada': True}, format='json')
+        self.assertEqual(respuesta.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.calendario('2025-04-07', '2025-04-14'), [])
+
+        # La misma ocurrencia movida a la semana siguiente, con otro título
+        nuevo_inicio = timezone.make_aware(datetime.datetime(2025, 4, 15, 14, 0))
+        respuesta = self.client.post(url, {
+            'fechaocurrencia': ocurrencia, 'fechahorainicio': nuevo_inicio.isoformat(),
+            'tituloevento': 'Lubricación reprogramada'
+        }, format='json')
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        self.assertEqual(ExcepcionesAgenda.objects.count(), 1)
+        self.assertEqual(self.calendario('2025-04-07', '2025-04-14'), [])
+        semana = self.calendario('2025-04-14', '2025-04-21')
+        self.assertEqual([e['title'] for e in semana], ['Lubricación semanal', 'Lubricación reprogramada'])
+        self.assertEqual(
+            datetime.datetime.fromisoformat(semana[1]['end']) - nuevo_inicio, datetime.timedelta(hours=2)
+        )
+
+        respuesta = self.client.post(url, {'fechaocurrencia': '2025-04-08T08:00:00-04:00'}, format='json')
+        self.assertEqual(respuesta.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_expansiones_en_cache_por_evento_y_ventana(self):
+        _inicios.cache_clear()
+        desde = timezone.make_aware(datetime.datetime(2025, 4, 1))
+        hasta = desde + datetime.timedelta(days=30)
+        for _ in range(3):
+            ocurrencias = ocurrencias_en_rango(Agendas.objects.filter(pk=self.evento.pk).values(*CAMPOS_RECURRENCIA), desde, hasta)
+        self.assertEqual(len(ocurrencias), 4)
+        self.assertEqual(_inicios.cache_info().hits, 2)
+
+        # Cambiar la regla cambia la clave del caché
+        Agendas.objects.filter(pk=self.evento.pk).update(reglarecursividad='FREQ=DAILY;COUNT=60')
+        ocurrencias = ocurrencias_en_rango(Agendas.objects.filter(pk=self.evento.pk).values(*CAMPOS_RECURRENCIA), desde, hasta)
+        self.assertEqual(len(ocurrencias), 30)
+
+    def test_regla_invalida_rechazada(self):
+        respuesta = self.client.patch(
+            f'/api/agendas/{self.evento.pk}/', {'reglarecursividad': 'FREQ=CADA-TANTO'}, format='json'
+        )
+        self.assertEqual(respuesta.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('reglarecursividad', respuesta.data)
+
+    def test_dashboard_cuenta_ocurrencias(self):
+        cache.clear()
+        hoy = timezone.make_aware(datetime.datetime.combine(timezone.localdate(), datetime.time(8, 0)))
+        Agendas.objects.filter(pk=self.evento.pk).update(
+            fechahorainicio=hoy - datetime.timedelta(days=30), fechahorafin=hoy - datetime.timedelta(days=30, hours=-2),
+            reglarecursividad='FREQ=DAILY'
+        )
+        Agendas.objects.create(
+            tituloevento='Preventivo simple', fechahorainicio=hoy + datetime.timedelta(days=1),
+            fechahorafin=hoy + datetime.timedelta(days=1, hours=1), tipoevento='Mantenimiento Preventivo',
+            idusuariocreador=self.user
+        )
+        respuesta = self.client.get('/api/mantenimiento-workflow/dashboard/')
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        # Una ocurrencia diaria por cada uno de los 8 días del rango (hoy y los 7 siguientes) más el evento simple
+        self.assertEqual(respuesta.data['estadisticas_generales']['mantenimientos_proximos'], 9)
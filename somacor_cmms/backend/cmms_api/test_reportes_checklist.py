@@ -0,0 +1,313 @@
+import datetime
+from io import StringIO
+
+from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework import serializers, status
+from .models import (
+    ChecklistAnswer, ChecklistInstance, ChecklistItem, Equipos, Faenas, IndicadoresDiariosEquipo
+)
+from .views import ChecklistAnswerViewSet
+from .datos_prueba import ChecklistDatosMixin
+
+
+class ReporteConformidadTest(ChecklistDatosMixin, TestCase):
+    """Pruebas del motor de conformidad de checklists"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.crear_datos_checklist()
+        self.url = '/api/checklist-workflow/reportes/conformidad/'
+
+    def test_conformidad_por_equipo(self):
+        """Cuenta fallas críticas, no críticas y checklists conformes por equipo"""
+        # Ítems 0 y 2 son críticos, 1 y 3 no críticos
+        self.crear_instancia(['bueno', 'bueno', 'bueno', 'bueno'])
+        self.crear_instancia(['malo', 'malo', 'bueno', 'na'])
+        self.crear_instancia(['bueno', 'malo', 'bueno', 'malo'])
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_checklists_periodo'], 3)
+
+        datos = response.data['conformidad_por_equipo']["Minicargador 1 (MC-001)"]
+        self.assertEqual(datos['total_checklists'], 3)
+        self.assertEqual(datos['checklists_conformes'], 2)
+        self.assertEqual(datos['fallas_criticas'], 1)
+        self.assertEqual(datos['fallas_no_criticas'], 3)
+        self.assertEqual(datos['porcentaje_conformidad'], 66.67)
+
+    def test_filtro_por_faena(self):
+        """El filtro de faena excluye equipos de otras faenas"""
+        otra_faena = Faenas.objects.create(nombrefaena="Faena Sur")
+        otro_equipo = Equipos.objects.create(
+            nombreequipo="Minicargador 2",
+            codigointerno="MC-002",
+            idtipoequipo=self.tipo_equipo,
+            idestadoactual=self.estado_equipo,
+            idfaenaactual=otra_faena
+        )
+        self.crear_instancia(['bueno'] * 4)
+        self.crear_instancia(['malo'] * 4, equipo=otro_equipo)
+
+        response = self.client.get(self.url, {'faena': otra_faena.idfaena})
+        self.assertEqual(response.data['total_checklists_periodo'], 1)
+        self.assertEqual(list(response.data['conformidad_por_equipo']), ["Minicargador 2 (MC-002)"])
+
+    def test_benchmark_consultas_acotadas(self):
+        """Con 100k respuestas el reporte mantiene un número constante de consultas"""
+        self.items += [
+            ChecklistItem.objects.create(
+                category=self.category,
+                texto=f"Ítem {i}",
+                es_critico=(i % 10 == 0),
+                orden=i
+            )
+            for i in range(len(self.items), 50)
+        ]
+        equipos = [self.equipo] + [
+            Equipos.objects.create(
+                nombreequipo=f"Minicargador {i}",
+                codigointerno=f"MC-{i:03d}",
+                idtipoequipo=self.tipo_equipo,
+                idestadoactual=self.estado_equipo,
+                idfaenaactual=self.faena
+            )
+            for i in range(2, 21)
+        ]
+        hoy = datetime.date.today()
+        instancias = ChecklistInstance.objects.bulk_create([
+            ChecklistInstance(
+                template=self.template,
+                equipo=equipos[i % len(equipos)],
+                operador=self.user,
+                fecha_inspeccion=hoy - datetime.timedelta(days=i % 30),
+                horometro_inspeccion=1000 + i
+            )
+            for i in range(2000)
+        ])
+        ChecklistAnswer.objects.bulk_create([
+            ChecklistAnswer(
+                instance=instance,
+                item=item,
+                estado='malo' if (n + instance.horometro_inspeccion) % 7 == 0 else 'bueno'
+            )
+            for instance in instancias
+            for n, item in enumerate(self.items)
+        ], batch_size=5000)
+        self.assertEqual(ChecklistAnswer.objects.count(), 100000)
+        call_command('recalcular_resumen_checklists', stdout=StringIO())
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_checklists_periodo'], 2000)
+        self.assertEqual(len(response.data['conformidad_por_equipo']), 20)
+
+
+class ResumenChecklistTest(ChecklistDatosMixin, TestCase):
+    """Pruebas de los contadores desnormalizados de ChecklistInstance"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.crear_datos_checklist()
+
+    def test_create_calcula_resumen(self):
+        """El serializer completa los contadores al crear el checklist"""
+        self.client.force_authenticate(user=self.user)
+        data = {
+            'template': self.template.id_template,
+            'equipo': self.equipo.idequipo,
+            'fecha_inspeccion': '2025-06-23',
+            'horometro_inspeccion': 1200,
+            'answers': [
+                {'item': self.items[0].id_item, 'estado': 'malo'},
+                {'item': self.items[1].id_item, 'estado': 'malo'},
+                {'item': self.items[2].id_item, 'estado': 'bueno'},
+                {'item': self.items[3].id_item, 'estado': 'na'},
+            ]
+        }
+        response = self.client.post('/api/checklist-instances/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        instance = ChecklistInstance.objects.get(pk=response.data['id_instance'])
+        self.assertEqual(instance.total_respuestas, 4)
+        self.assertEqual(instance.respuestas_malas, 2)
+        self.assertEqual(instance.respuestas_criticas_malas, 1)
+
+    def test_comando_recalcula_resumen(self):
+        """El comando reconstruye contadores desactualizados"""
+        instance = self.crear_instancia(['malo', 'malo', 'malo', 'bueno'])
+        ChecklistInstance.objects.update(total_respuestas=0, respuestas_malas=0, respuestas_criticas_malas=0)
+
+        call_command('recalcular_resumen_checklists', stdout=StringIO())
+
+        instance.refresh_from_db()
+        self.assertEqual(instance.total_respuestas, 4)
+        self.assertEqual(instance.respuestas_malas, 3)
+        self.assertEqual(instance.respuestas_criticas_malas, 2)
+
+    def test_cambiar_criticidad_recalcula_resumenes(self):
+        """Marcar o desmarcar un ítem crítico actualiza los checklists que lo respondieron mal"""
+        fecha = datetime.date(2025, 6, 2)
+        con_falla = self.crear_instancia(['bueno', 'malo', 'bueno', 'bueno'], fecha=fecha)
+        sin_falla = self.crear_instancia(['bueno', 'bueno', 'bueno', 'bueno'], fecha=fecha)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.items[1].es_critico = True
+            self.items[1].save()
+        con_falla.refresh_from_db()
+        sin_falla.refresh_from_db()
+        self.assertEqual(con_falla.respuestas_criticas_malas, 1)
+        self.assertEqual(sin_falla.respuestas_criticas_malas, 0)
+        self.assertEqual(
+            IndicadoresDiariosEquipo.objects.get(idequipo=self.equipo, fecha=fecha).checklistsconformes, 1
+        )
+
+        self.items[1].es_critico = False
+        self.items[1].save(update_fields=['es_critico'])
+        con_falla.refresh_from_db()
+        self.assertEqual(con_falla.respuestas_criticas_malas, 0)
+
+    def test_mover_respuesta_actualiza_ambos_checklists(self):
+        origen = self.crear_instancia(['bueno', 'bueno', 'malo', 'bueno'])
+        destino = self.crear_instancia(['bueno', 'bueno'])
+        respuesta = origen.answers.get(item=self.items[2])
+
+        class MoverRespuesta(serializers.ModelSerializer):
+            class Meta:
+                model = ChecklistAnswer
+                fields = ['instance']
+
+        serializer = MoverRespuesta(respuesta, data={'instance': destino.pk}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        ChecklistAnswerViewSet().perform_update(serializer)
+        origen.refresh_from_db()
+        destino.refresh_from_db()
+        self.assertEqual((origen.total_respuestas, origen.respuestas_malas), (3, 0))
+        self.assertEqual((destino.total_respuestas, destino.respuestas_criticas_malas), (3, 1))
+
+
+class ElementosMasFallidosTest(ChecklistDatosMixin, TestCase):
+    """Top de ítems con fallas agrupado en la base de datos, con equipos y serie"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = '/api/checklist-workflow/elementos-mas-fallidos/'
+        self.crear_datos_checklist()
+        self.otro_equipo = Equipos.objects.create(
+            nombreequipo='Minicargador 2', idtipoequipo=self.tipo_equipo, idestadoactual=self.estado_equipo
+        )
+        # Ítem 1: 3 fallas en 2 equipos; ítem 0 (crítico): 2 fallas; ítem 2 (crítico): 1 falla
+        lunes = datetime.date(2025, 6, 2)
+        self.crear_instancia(['malo', 'malo', 'malo', 'bueno'], fecha=lunes)
+        self.crear_instancia(['malo', 'malo', 'bueno', 'bueno'], fecha=lunes + datetime.timedelta(days=7))
+        self.crear_instancia(['bueno', 'malo', 'bueno', 'bueno'], equipo=self.otro_equipo, fecha=lunes)
+        self.crear_instancia(['malo', 'malo', 'malo', 'malo'], fecha=datetime.date(2025, 8, 1))
+        self.params = {'fecha_inicio': '2025-06-01', 'fecha_fin': '2025-06-15'}
+
+    def test_top_en_consultas_fijas(self):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(self.url, self.params)
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(consultas), 3)
+
+        elementos = respuesta.data['elementos_mas_fallidos']
+        self.assertEqual([e['elemento'] for e in elementos], ['Ítem 1', 'Ítem 0', 'Ítem 2'])
+        self.assertEqual(elementos[0]['cantidad_fallas'], 3)
+        self.assertEqual(elementos[0]['equipos_afectados'], ['Minicargador 1', 'Minicargador 2'])
+        self.assertEqual(elementos[0]['cantidad_equipos_afectados'], 2)
+        self.assertEqual(
+            respuesta.data['tendencia']['periodos'],
+            [datetime.date(2025, 5, 26), datetime.date(2025, 6, 2), datetime.date(2025, 6, 9)]
+        )
+        self.assertEqual(elementos[0]['tendencia'], [0, 2, 1])
+
+    def test_limite_y_filtros(self):
+        respuesta = self.client.get(self.url, {**self.params, 'critico': 'true', 'limite': 1})
+        self.assertEqual([e['elemento'] for e in respuesta.data['elementos_mas_fallidos']], ['Ítem 0'])
+
+        faena_sur = Faenas.objects.create(nombrefaena='Faena Sur')
+        respuesta = self.client.get(self.url, {**self.params, 'faena': faena_sur.pk})
+        self.assertEqual(respuesta.data['elementos_mas_fallidos'], [])
+
+        self.assertEqual(
+            self.client.get(self.url, {**self.params, 'limite': 0}).status_code, status.HTTP_400_BAD_REQUEST
+        )
+        for invalido in ({'critico': 'yes'}, {'tipo_equipo': 'abc'}, {'faena': 'x1'}):
+            self.assertEqual(
+                self.client.get(self.url, {**self.params, **invalido}).status_code, status.HTTP_400_BAD_REQUEST
+            )
+        for invalido in ({'faena': 'abc'}, {'template': 'x'}, {'tipo_equipo': '1.5'}):
+            self.assertEqual(
+                self.client.get('/api/checklist-workflow/reportes/conformidad/', invalido).status_code,
+                status.HTTP_400_BAD_REQUEST
+            )
+
+
+class HistorialEquipoTest(ChecklistDatosMixin, TestCase):
+    """Historial de checklists por equipo paginado por cursor, con estadísticas en una consulta"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.crear_datos_checklist()
+        self.url = f'/api/checklist-workflow/historial-equipo/{self.equipo.idequipo}/'
+        # Dos checklists por día, para que el desempate por id_instance importe
+        self.instancias = []
+        for dia in range(1, 4):
+            for estados in (['malo', 'bueno', 'bueno', 'bueno'], ['bueno', 'bueno', 'bueno', 'bueno']):
+                self.instancias.append(self.crear_instancia(estados, fecha=datetime.date(2025, 6, dia)))
+
+    def test_primera_pagina_en_consultas_fijas(self):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(self.url, {'limite': 4})
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        # Equipo, página de checklists y estadísticas
+        self.assertEqual(len(consultas), 3)
+        self.assertEqual(respuesta.data['estadisticas'], {
+            'total_checklists': 6,
+            'checklists_con_fallas': 3,
+            'checklists_con_fallas_criticas': 3,
+            'porcentaje_conformidad': 50.0,
+        })
+        self.assertEqual(respuesta.data['equipo']['idequipo'], self.equipo.idequipo)
+        fila = respuesta.data['historial'][0]
+        self.assertNotIn('imagenes_list', fila)
+        self.assertNotIn('imagen_evidencia', fila)
+        self.assertEqual(fila['equipo_nombre'], self.equipo.nombreequipo)
+
+    def test_recorre_paginas_sin_repetir(self):
+        vistos = []
+        params = {'limite': 4}
+        while True:
+            respuesta = self.client.get(self.url, params)
+            self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+            vistos += [fila['id_instance'] for fila in respuesta.data['historial']]
+            if not respuesta.data['siguiente']:
+                break
+            siguiente = self.client.get(self.url, {**params, 'cursor': respuesta.data['siguiente']}).data
+            self.assertIsNone(siguiente['estadisticas'])
+            self.assertEqual(siguiente['equipo']['idequipo'], self.equipo.idequipo)
+            params = {'limite': 4, 'cursor': respuesta.data['siguiente']}
+
+        esperados = [
+            instancia.pk for instancia in sorted(
+                self.instancias, key=lambda i: (i.fecha_inspeccion, i.pk), reverse=True
+            )
+        ]
+        self.assertEqual(vistos, esperados)
+
+    def test_filtros_y_parametros_invalidos(self):
+        respuesta = self.client.get(self.url, {'fecha_inicio': '2025-06-02', 'fecha_fin': '2025-06-02'})
+        self.assertEqual(respuesta.data['estadisticas']['total_checklists'], 2)
+        self.assertEqual(len(respuesta.data['historial']), 2)
+
+        for params in ({'cursor': 'no-es-un-cursor'}, {'limite': 0}, {'fecha_inicio': 'ayer'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.client.get('/api/checklist-workflow/historial-equipo/999999/').status_code,
+            status.HTTP_404_NOT_FOUND
+        )
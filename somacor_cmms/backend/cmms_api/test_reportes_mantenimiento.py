@@ -0,0 +1,104 @@
+import datetime
+
+import numpy as np
+from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import Equipos, EstadosOrdenTrabajo, Faenas, TiposEquipo, TiposMantenimientoOT
+from .catalogos import tipos_mantenimiento_ot
+from .reportes_mantenimiento import percentiles_histograma
+from .datos_prueba import OrdenesTrabajoDatosMixin
+
+
+class ReporteEficienciaTest(OrdenesTrabajoDatosMixin, TestCase):
+    """Reporte de eficiencia agregado en la base de datos, con desgloses y tendencia"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = '/api/mantenimiento-workflow/reportes/eficiencia/'
+        self.crear_datos_ot()
+        self.completada = EstadosOrdenTrabajo.objects.create(nombreestadoot='Completada')
+        TiposMantenimientoOT.objects.create(nombretipomantenimientoot='Correctivo')
+        otra_faena = Faenas.objects.create(nombrefaena='Faena Sur')
+        camion = Equipos.objects.create(
+            nombreequipo='Camión 7', idtipoequipo=TiposEquipo.objects.create(nombretipo='Camión'),
+            idestadoactual=self.estado_equipo, idfaenaactual=otra_faena
+        )
+        # Lunes 02-06-2025 y la semana siguiente
+        for dia, minutos, equipo in [(2, 10, self.equipo), (3, 20, self.equipo), (4, 30, camion),
+                                     (10, 40, self.equipo), (11, None, camion)]:
+            self.crear_ot(
+                cantidad_actividades=0, idequipo=equipo, idestadoot=self.completada, tiempototalminutos=minutos,
+                fechacompletado=timezone.make_aware(datetime.datetime(2025, 6, dia, 12))
+            )
+        # Fuera del período y sin completar
+        self.crear_ot(cantidad_actividades=0, idestadoot=self.completada, tiempototalminutos=999,
+                      fechacompletado=timezone.make_aware(datetime.datetime(2025, 7, 1, 12)))
+        self.crear_ot(cantidad_actividades=0)
+
+    def test_consultas_fijas_con_desgloses(self):
+        tipos_mantenimiento_ot.nombres()
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(self.url, {
+                'fecha_inicio': '2025-06-01', 'fecha_fin': '2025-06-15', 'agrupacion': 'semana'
+            })
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        # Agregado por grupo (GROUP BY) e histograma de tiempos para los percentiles
+        self.assertEqual(len(consultas), 2)
+        for consulta in consultas.captured_queries:
+            self.assertIn('GROUP BY', consulta['sql'])
+
+        datos = respuesta.data
+        self.assertEqual(datos['total_ots_completadas'], 5)
+        self.assertEqual(datos['tiempo_promedio_resolucion'], 25.0)
+        self.assertEqual(datos['resumen']['tiempo_p50'], 25.0)
+        self.assertEqual(datos['resumen']['tiempo_total'], 100)
+        self.assertEqual(datos['eficiencia_por_tipo']['Correctivo']['total_ots'], 0)
+        self.assertEqual(datos['eficiencia_por_tipo']['Preventivo']['total_ots'], 5)
+        self.assertEqual(
+            [(f['faena'], f['total_ots'], f['tiempo_total']) for f in datos['por_faena']],
+            [('Faena Norte', 3, 70), ('Faena Sur', 2, 30)]
+        )
+        self.assertEqual(datos['por_tecnico'][0]['tecnico'], 'Juan Pérez')
+        self.assertEqual([t['tipo_equipo'] for t in datos['por_tipo_equipo']], ['Camión', 'Minicargador'])
+        # Semanas del 26-05 (el 01-06 es domingo), 02-06 y 09-06
+        self.assertEqual(
+            [(p['periodo'], p['total_ots']) for p in datos['tendencia']['periodos']],
+            [(datetime.date(2025, 5, 26), 0), (datetime.date(2025, 6, 2), 3), (datetime.date(2025, 6, 9), 2)]
+        )
+
+        por_mes = self.client.get(self.url, {
+            'fecha_inicio': '2025-06-01', 'fecha_fin': '2025-06-15', 'agrupacion': 'mes'
+        }).data['tendencia']['periodos']
+        self.assertEqual([(p['periodo'], p['total_ots'], p['tiempo_p50']) for p in por_mes],
+                         [(datetime.date(2025, 6, 1), 5, 25.0)])
+        por_dia = self.client.get(self.url, {
+            'fecha_inicio': '2025-06-02', 'fecha_fin': '2025-06-03', 'agrupacion': 'dia'
+        }).data['tendencia']['periodos']
+        self.assertEqual([p['tiempo_total'] for p in por_dia], [10, 20])
+
+    def test_percentiles_con_tiempos_repetidos(self):
+        # Los tiempos repetidos llegan como una fila con su cantidad
+        for minutos in [10] * 6 + [40] * 3:
+            self.crear_ot(
+                cantidad_actividades=0, idestadoot=self.completada, tiempototalminutos=minutos,
+                fechacompletado=timezone.make_aware(datetime.datetime(2025, 6, 20, 12))
+            )
+        resumen = self.client.get(self.url, {
+            'fecha_inicio': '2025-06-20', 'fecha_fin': '2025-06-20', 'agrupacion': 'dia'
+        }).data['resumen']
+        esperados = np.percentile([10] * 6 + [40] * 3, [50, 90])
+        self.assertEqual((resumen['tiempo_p50'], resumen['tiempo_p90']), tuple(esperados))
+        self.assertEqual(resumen['tiempo_p90'], 40.0)
+
+        self.assertEqual(
+            list(percentiles_histograma({5: 1, 10: 2, 30: 1}, [0, 25, 50, 75, 100])),
+            list(np.percentile([5, 10, 10, 30], [0, 25, 50, 75, 100]))
+        )
+
+    def test_parametros_invalidos(self):
+        for params in ({'agrupacion': 'trimestre'}, {'fecha_inicio': '01-06-2025', 'fecha_fin': '2025-06-15'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, status.HTTP_400_BAD_REQUEST)
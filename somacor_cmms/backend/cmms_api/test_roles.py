@@ -0,0 +1,53 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from .models import Roles, Usuarios
+from .permissions import IsAdminRole, IsSupervisorRole, IsOperadorRole, IsAdminOrSupervisorRole, IsAnyRole
+from .roles import cache_roles
+
+
+class CacheRolesTest(TestCase):
+    """Resolución del rol una vez por request y reutilizada entre requests"""
+
+    def setUp(self):
+        cache_roles.invalidar()
+        self.rol = Roles.objects.create(nombrerol='Supervisor')
+        self.user = User.objects.create_user(username='supervisor', password='x')
+        self.perfil = Usuarios.objects.create(user=self.user, idrol=self.rol)
+        self.factory = APIRequestFactory()
+
+    def _request(self, user):
+        request = Request(self.factory.get('/'))
+        request.user = user
+        return request
+
+    def test_segundo_chequeo_no_consulta_base_de_datos(self):
+        request = self._request(self.user)
+        with self.assertNumQueries(1):
+            self.assertTrue(IsSupervisorRole().has_permission(request, None))
+        with self.assertNumQueries(0):
+            self.assertTrue(IsAdminOrSupervisorRole().has_permission(request, None))
+            self.assertFalse(IsAdminRole().has_permission(request, None))
+            self.assertTrue(IsAnyRole().has_permission(request, None))
+
+        # Otro request del mismo usuario reutiliza la caché de proceso
+        with self.assertNumQueries(0):
+            self.assertTrue(IsSupervisorRole().has_permission(self._request(self.user), None))
+
+    def test_cambio_de_rol_invalida_cache(self):
+        self.assertTrue(IsSupervisorRole().has_permission(self._request(self.user), None))
+
+        self.perfil.idrol = Roles.objects.create(nombrerol='Admin')
+        self.perfil.save()
+        request = self._request(self.user)
+        self.assertFalse(IsSupervisorRole().has_permission(request, None))
+        self.assertTrue(IsAdminRole().has_permission(request, None))
+
+    def test_usuario_sin_perfil(self):
+        sin_perfil = User.objects.create_user(username='visitante', password='x')
+        request = self._request(sin_perfil)
+        with self.assertNumQueries(1):
+            self.assertFalse(IsAnyRole().has_permission(request, None))
+        with self.assertNumQueries(0):
+            self.assertFalse(IsOperadorRole().has_permission(request, None))
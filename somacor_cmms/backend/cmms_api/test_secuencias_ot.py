@@ -0,0 +1,79 @@
+from django.test import TransactionTestCase
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import EstadosOrdenTrabajo, SecuenciasOT, TiposMantenimientoOT
+from .catalogos import invalidar_catalogos
+from .secuencias_ot import asignador, numero_ot
+from .datos_prueba import ChecklistDatosMixin
+
+
+class SecuenciasOTTest(ChecklistDatosMixin, TransactionTestCase):
+    """Números de OT correlativos reservados por bloques"""
+
+    def setUp(self):
+        asignador.descartar_bloques()
+        self.crear_datos_checklist(cantidad_items=0)
+
+    def test_bloque_sin_lecturas_por_ot(self):
+        self.assertEqual(numero_ot('CORR', self.equipo), 'OT-CORR-MC-001-000001')
+
+        with self.assertNumQueries(0):
+            numeros = [numero_ot('CORR', self.equipo) for _ in range(asignador.tamano_bloque - 1)]
+        self.assertEqual(numeros[-1], f'OT-CORR-MC-001-{asignador.tamano_bloque:06d}')
+
+        # Otro proceso (simulado descartando los bloques) continúa después de lo reservado;
+        # reservar un bloque cuesta BEGIN + UPDATE + SELECT + COMMIT
+        asignador.descartar_bloques()
+        with self.assertNumQueries(4):
+            numero = numero_ot('CORR', self.equipo)
+        self.assertEqual(numero, f'OT-CORR-MC-001-{asignador.tamano_bloque + 1:06d}')
+        self.assertEqual(numero_ot('PREV', self.equipo), 'OT-PREV-MC-001-000001')
+
+    def test_dentro_de_transaccion_no_guarda_bloque(self):
+        with transaction.atomic():
+            numero_ot('CHK', self.equipo)
+        self.assertEqual(SecuenciasOT.objects.get(prefijo='CHK').ultimovalor, 1)
+
+        try:
+            with transaction.atomic():
+                numero_ot('CHK', self.equipo)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        # La reserva revertida no deja números repetibles en memoria
+        self.assertEqual(numero_ot('CHK', self.equipo), 'OT-CHK-MC-001-000002')
+
+
+class SecuenciaChecklistTest(ChecklistDatosMixin, TransactionTestCase):
+    """El checklist con fallas críticas reserva el número de su OT fuera de la transacción"""
+
+    def setUp(self):
+        asignador.descartar_bloques()
+        invalidar_catalogos()
+        self.crear_datos_checklist()
+        TiposMantenimientoOT.objects.create(nombretipomantenimientoot='Correctivo')
+        EstadosOrdenTrabajo.objects.create(nombreestadoot='Abierta')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_ot_correctiva_usa_el_bloque_del_proceso(self):
+        data = {
+            'template': self.template.id_template,
+            'equipo': self.equipo.idequipo,
+            'fecha_inspeccion': '2025-06-23',
+            'horometro_inspeccion': 1200,
+            'answers': [{'item': self.items[0].id_item, 'estado': 'malo'}],
+        }
+        url = '/api/checklist-workflow/completar-checklist/'
+
+        self.assertEqual(self.client.post(url, data, format='json').status_code, status.HTTP_201_CREATED)
+        # Con el bloque ya reservado, el segundo checklist no toca la tabla de secuencias
+        with CaptureQueriesContext(connection) as segunda:
+            respuesta = self.client.post(url, data, format='json')
+        self.assertEqual(respuesta.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(respuesta.data['alertas']['ot_creada']['numero_ot'], 'OT-CHK-MC-001-000002')
+        self.assertFalse([c for c in segunda.captured_queries if 'secuenciasot' in c['sql']])
+        self.assertEqual(len(segunda), 35)
+        self.assertEqual(SecuenciasOT.objects.get(prefijo='CHK').ultimovalor, asignador.tamano_bloque)
@@ -0,0 +1,107 @@
+import base64
+import datetime
+
+from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import (
+    Agendas, ChecklistAnswer, ChecklistCategory, ChecklistImage, ChecklistInstance, ChecklistItem,
+    ChecklistTemplate
+)
+from .datos_prueba import MediaTemporalMixin, ChecklistDatosMixin, OrdenesTrabajoDatosMixin, PNG_1PX
+
+
+class CrearChecklistBulkTest(MediaTemporalMixin, ChecklistDatosMixin, TestCase):
+    """Pruebas de la creación masiva de respuestas e imágenes"""
+
+    def setUp(self):
+        self.usar_media_temporal()
+        self.client = APIClient()
+        self.crear_datos_checklist(cantidad_items=60)
+        self.client.force_authenticate(user=self.user)
+
+    def _payload(self, items, **extra):
+        data = {
+            'template': self.template.id_template,
+            'equipo': self.equipo.idequipo,
+            'fecha_inspeccion': '2025-06-23',
+            'horometro_inspeccion': 1200,
+            'answers': [{'item': item.id_item, 'estado': 'bueno'} for item in items],
+        }
+        data.update(extra)
+        return data
+
+    def test_consultas_no_dependen_de_cantidad_de_respuestas(self):
+        """Un checklist de 60 ítems con imágenes no hace una consulta por respuesta"""
+        imagenes = [{'descripcion': f'Foto {i}', 'imagen_base64': 'aGVsbG8='} for i in range(3)]
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.post(
+                '/api/checklist-instances/', self._payload(self.items, imagenes=imagenes), format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertLess(len(consultas), 15)
+        self.assertEqual(ChecklistAnswer.objects.count(), 60)
+        self.assertEqual(ChecklistImage.objects.count(), 3)
+
+    def test_rechaza_items_de_otra_plantilla(self):
+        """Los ítems ajenos a la plantilla se informan en un único error"""
+        otro_template = ChecklistTemplate.objects.create(nombre="Otra plantilla", tipo_equipo=self.tipo_equipo)
+        otra_categoria = ChecklistCategory.objects.create(template=otro_template, nombre="Luces")
+        item_ajeno = ChecklistItem.objects.create(category=otra_categoria, texto="Luces altas")
+
+        data = self._payload(self.items[:2])
+        data['answers'] += [{'item': item_ajeno.id_item, 'estado': 'bueno'}, {'item': 999999, 'estado': 'malo'}]
+        response = self.client.post('/api/checklist-instances/', data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(item_ajeno.id_item), response.data['answers'][0])
+        self.assertIn('999999', response.data['answers'][0])
+        self.assertFalse(ChecklistInstance.objects.exists())
+
+
+class RepresentacionListaTest(MediaTemporalMixin, OrdenesTrabajoDatosMixin, TestCase):
+    """Los listados pesados entregan su representación compacta"""
+
+    def setUp(self):
+        self.usar_media_temporal()
+        self.crear_datos_ot()
+        self.client = APIClient()
+
+    def test_checklist_sin_imagenes_en_listado(self):
+        instance = self.crear_instancia(['bueno'] * 4)
+        response = self.client.get(reverse('checklistinstance-list'))
+        fila = response.data['results'][0]
+        self.assertNotIn('imagenes_list', fila)
+        self.assertNotIn('observaciones_generales', fila)
+        self.assertEqual(fila['equipo_nombre'], 'Minicargador 1')
+
+        response = self.client.get(reverse('checklistinstance-detail', args=[instance.pk]))
+        self.assertEqual(response.data['imagenes_list'], [])
+
+    def test_agenda_y_evidencias(self):
+        orden = self.crear_ot()
+        Agendas.objects.create(
+            tituloevento='Preventivo 250h',
+            fechahorainicio=timezone.now(),
+            fechahorafin=timezone.now() + datetime.timedelta(hours=2),
+            idequipo=self.equipo,
+            idusuariocreador=self.user
+        )
+        fila = self.client.get(reverse('agendas-list')).data['results'][0]
+        self.assertNotIn('usuario_creador_nombre', fila)
+        self.assertIn('usuario_creador_nombre', self.client.get(
+            reverse('agendas-list'), {'expand': 'usuario_creador_nombre'}
+        ).data['results'][0])
+
+        self.client.post(reverse('evidenciaot-list'), {
+            'idordentrabajo': orden.pk,
+            'descripcion': 'Filtro',
+            'imagen_base64': base64.b64encode(PNG_1PX).decode()
+        }, format='json')
+        fila = self.client.get(reverse('evidenciaot-list')).data['results'][0]
+        self.assertNotIn('imagen_mime', fila)
+        self.assertTrue(fila['miniatura_url'].endswith('/'))
@@ -0,0 +1,87 @@
+import datetime
+from io import StringIO
+
+from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import Agendas, DetallesPlanMantenimiento, Equipos
+from .sincronizacion_agenda import olvidar_usuario_sistema
+from .datos_prueba import OrdenesTrabajoDatosMixin
+
+
+class SincronizarAgendaTest(OrdenesTrabajoDatosMixin, TestCase):
+    """Sincronización por conjuntos de la agenda con las OTs programadas"""
+
+    def setUp(self):
+        self.crear_datos_ot()
+        olvidar_usuario_sistema()  # El usuario recordado pertenece a otra prueba
+        self.client = APIClient()
+        self.url = '/api/agendas/sincronizar-mantenciones/'
+
+    def crear_programadas(self, cantidad):
+        return [
+            self.crear_ot(cantidad_actividades=0, fechaejecucion=timezone.localdate() + datetime.timedelta(days=i))
+            for i in range(cantidad)
+        ]
+
+    def sincronizar(self):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.post(self.url)
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        return respuesta.data, len(consultas)
+
+    def test_crea_eventos_por_lote_sin_duplicar(self):
+        ya_agendada, *_ = self.crear_programadas(3)
+        Agendas.objects.create(
+            tituloevento='Evento manual', fechahorainicio=timezone.now(), fechahorafin=timezone.now(),
+            idordentrabajo=ya_agendada, idusuariocreador=self.user
+        )
+        self.crear_ot(cantidad_actividades=0)  # Sin fecha de ejecución: no se agenda
+
+        resumen, consultas_pocas = self.sincronizar()
+        self.assertEqual(len(resumen['eventos']), 2)
+        self.assertEqual(resumen['ots_ya_agendadas'], 1)
+        evento = Agendas.objects.get(idagenda=resumen['eventos'][0]['id'])
+        self.assertEqual((evento.tipoevento, evento.idusuarioasignado), ('preventivo', self.tecnico))
+        self.assertEqual(evento.idusuariocreador.username, 'sistema_agenda')
+
+        self.crear_programadas(10)
+        resumen, consultas_muchas = self.sincronizar()
+        self.assertEqual(len(resumen['eventos']), 10)
+        self.assertEqual(resumen['ots_ya_agendadas'], 3)
+        # El usuario de sistema ya está resuelto: no más consultas que la primera vez
+        self.assertLessEqual(consultas_muchas, consultas_pocas)
+
+        resumen, _ = self.sincronizar()
+        self.assertEqual((resumen['eventos'], resumen['ots_ya_agendadas']), ([], 13))
+        self.assertEqual(Agendas.objects.filter(idordentrabajo__isnull=False).count(), 13)
+
+    def test_planes_solo_del_equipo_pedido(self):
+        """La API no proyecta los planes de toda la flota; con ?equipo= sólo los de ese equipo"""
+        DetallesPlanMantenimiento.objects.create(
+            idplanmantenimiento=self.plan, idtareaestandar=self.tarea, intervalohorasoperacion=250
+        )
+        otro = Equipos.objects.create(
+            nombreequipo='Minicargador 2', idtipoequipo=self.tipo_equipo, idestadoactual=self.estado_equipo
+        )
+
+        resumen, _ = self.sincronizar()
+        self.assertEqual(resumen['eventos_plan_creados'], 0)
+
+        respuesta = self.client.post(f'{self.url}?equipo={otro.idequipo}')
+        self.assertEqual(respuesta.data['eventos_plan_creados'], 1)
+        self.assertEqual(
+            list(Agendas.objects.filter(idplanmantenimiento__isnull=False).values_list('idequipo', flat=True)),
+            [otro.idequipo]
+        )
+        self.assertEqual(self.client.post(f'{self.url}?equipo=abc').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_comando(self):
+        self.crear_programadas(2)
+        salida = StringIO()
+        call_command('sincronizar_agenda', stdout=salida)
+        self.assertIn('Eventos de OT creados: 2', salida.getvalue())
@@ -1,6 +1,6 @@
 # cmms_api/urls.py
 
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
 from . import views
 from .views_maintenance import MantenimientoWorkflowViewSet
@@ -47,5 +47,8 @@ urlpatterns = [
     # Rutas de autenticación
     path('login/', views.CustomAuthToken.as_view(), name='auth_token'),
     path('logout/', views.LogoutView.as_view(), name='logout'),
+    path('auth/cache/', views.EstadisticasCacheAutenticacionView.as_view(), name='auth-cache-estadisticas'),
+    # Imágenes y miniaturas del almacén de blobs (direccionadas por sha256)
+    re_path(r'^imagenes/(?P<ref>[0-9a-f]{64})/$', views.ImagenBlobView.as_view(), name='imagen-blob'),
 ]
 
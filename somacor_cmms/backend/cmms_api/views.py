@@ -8,36 +8,24 @@ from rest_framework.authtoken.models import Token
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.db import models, transaction
-import uuid
-import random
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.cache import quote_etag
+from django.utils.http import parse_etags
 from .models import *
 from .serializers import *
+from .almacen_blobs import almacen, detectar_mime
+from .authentication import cache_tokens
+from .optimizacion_consultas import optimizar_queryset
+from .paginacion import PaginacionCursor
+from .catalogos import estados_ot, tipos_mantenimiento_ot
+from .secuencias_ot import numero_ot
+from .proyeccion_agenda import programar_proximos_vencimientos
+from .sincronizacion_agenda import sincronizar_agenda
+from .views_checklist import parametro_id
+from .calendario import eventos_calendario, ocurrencias_calendario, feed_calendario, interpretar_fecha
 from .permissions import IsAdminRole, IsSupervisorRole, IsOperadorRole, IsAdminOrSupervisorRole, IsAnyRole
 
 # --- Funciones Auxiliares ---
-def generar_numero_ot_unico(equipo, tipo_mantenimiento='CORR'):
-    """
-    Genera un número de OT único para evitar conflictos de constraint UNIQUE
-    """
-    max_intentos = 10
-    for intento in range(max_intentos):
-        # Generar timestamp con microsegundos para mayor unicidad
-        timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
-        
-        # Agregar componente aleatorio para evitar colisiones
-        componente_aleatorio = random.randint(100, 999)
-        
-        # Generar número de OT
-        numero_ot = f"OT-{tipo_mantenimiento}-{equipo.codigointerno or equipo.idequipo}-{timestamp}-{componente_aleatorio}"
-        
-        # Verificar si ya existe
-        if not OrdenesTrabajo.objects.filter(numeroot=numero_ot).exists():
-            return numero_ot
-    
-    # Si después de 10 intentos no se puede generar un número único, usar UUID
-    uuid_suffix = str(uuid.uuid4())[:8].upper()
-    return f"OT-{tipo_mantenimiento}-{equipo.codigointerno or equipo.idequipo}-{timezone.now().strftime('%Y%m%d%H%M%S')}-{uuid_suffix}"
-
 # --- Vistas de Autenticación ---
 class CustomAuthToken(ObtainAuthToken):
     def post(self, request, *args, **kwargs):
@@ -79,6 +67,27 @@ class LogoutView(generics.GenericAPIView):
             request.user.auth_token.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+class EstadisticasCacheAutenticacionView(generics.GenericAPIView):
+    """Contadores de la caché de tokens de este proceso, para monitoreo."""
+    permission_classes = [IsAdminRole]
+    def get(self, request):
+        return Response(cache_tokens.estadisticas())
+
+class SerializacionOptimizadaMixin:
+    """
+    Usa la representación compacta del serializer en los listados y ajusta el
+    queryset (joins, prefetch y columnas diferidas) a los campos que se
+    entregarán realmente, incluidos `?fields=` y `?expand=`.
+    """
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'list':
+            context['vista'] = 'lista'
+        return context
+
+    def get_queryset(self):
+        return optimizar_queryset(super().get_queryset(), self.get_serializer())
+
 # --- ViewSets de Catálogos ---
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all().order_by('id')
@@ -127,15 +136,34 @@ class ChecklistItemViewSet(viewsets.ModelViewSet):
     serializer_class = ChecklistItemSerializer
     permission_classes = [permissions.AllowAny]
 
-class ChecklistInstanceViewSet(viewsets.ModelViewSet):
+class ChecklistInstanceViewSet(SerializacionOptimizadaMixin, viewsets.ModelViewSet):
     queryset = ChecklistInstance.objects.all()
     serializer_class = ChecklistInstanceSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = PaginacionCursor
+    orden_paginacion = ('-fecha_inspeccion', '-id_instance')
 
 class ChecklistAnswerViewSet(viewsets.ModelViewSet):
     queryset = ChecklistAnswer.objects.all()
     serializer_class = ChecklistAnswerSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = PaginacionCursor
+    # Checklists más recientes primero y sus respuestas en el orden en que se guardaron
+    orden_paginacion = ('-instance_id', 'id_answer')
+
+    # Mantener sincronizado el resumen desnormalizado de la instancia
+    def perform_update(self, serializer):
+        instancia_anterior_id = serializer.instance.instance_id
+        answer = serializer.save()
+        answer.instance.actualizar_resumen()
+        # Si la respuesta se movió a otro checklist, el anterior también cambia
+        if answer.instance_id != instancia_anterior_id:
+            ChecklistInstance.objects.get(pk=instancia_anterior_id).actualizar_resumen()
+
+    def perform_destroy(self, answer):
+        instance = answer.instance
+        answer.delete()
+        instance.actualizar_resumen()
 
 # --- NUEVOS VIEWSETS PARA AGENDA DE MANTENIMIENTO PREVENTIVO ---
 
@@ -160,65 +188,15 @@ class PlanMantenimientoViewSet(viewsets.ModelViewSet):
         Genera eventos de agenda basados en el plan de mantenimiento y los equipos asociados
         """
         plan = self.get_object()
-        equipos = Equipos.objects.filter(idtipoequipo=plan.idtipoequipo, activo=True)
-        
-        eventos_creados = []
-        for equipo in equipos:
-            detalles = DetallesPlanMantenimiento.objects.filter(
-                idplanmantenimiento=plan, 
-                activo=True
-            ).select_related('idtareaestandar').order_by('intervalohorasoperacion')
-            
-            for detalle in detalles:
-                # Calcular próxima fecha de mantenimiento basada en horometro estimado
-                # Como el modelo Equipos no tiene un campo de horómetro, usamos un valor predeterminado
-                # o podríamos obtenerlo de la última orden de trabajo
-                horometro_estimado = 0  # Valor predeterminado
-                
-                # Intentar obtener el último horómetro registrado en órdenes de trabajo
-                ultima_ot = OrdenesTrabajo.objects.filter(
-                    idequipo=equipo,
-                    horometro__isnull=False
-                ).order_by('-fechacreacionot').first()
-                
-                if ultima_ot and ultima_ot.horometro:
-                    horometro_estimado = ultima_ot.horometro
-                
-                # Calcular horas restantes
-                horas_restantes = detalle.intervalohorasoperacion - (horometro_estimado % detalle.intervalohorasoperacion)
-                if horas_restantes == detalle.intervalohorasoperacion:
-                    horas_restantes = 0  # Ya es tiempo de mantenimiento
-                
-                # Estimar fecha (asumiendo 8 horas de operación por día)
-                dias_estimados = horas_restantes / 8
-                fecha_estimada = timezone.now().date() + timezone.timedelta(days=int(dias_estimados))
-                
-                # Crear evento en agenda
-                evento = Agendas.objects.create(
-                    tituloevento=f"Mantenimiento {detalle.idtareaestandar.nombretarea} - {equipo.nombreequipo}",
-                    fechahorainicio=timezone.datetime.combine(fecha_estimada, timezone.datetime.min.time().replace(hour=8)),
-                    fechahorafin=timezone.datetime.combine(fecha_estimada, timezone.datetime.min.time().replace(hour=8)) + timezone.timedelta(minutes=detalle.idtareaestandar.tiempoestimadominutos),
-                    descripcionevento=f"Mantenimiento preventivo programado cada {detalle.intervalohorasoperacion} horas",
-                    tipoevento="Mantenimiento Preventivo",
-                    colorevento="#28a745",
-                    idequipo=equipo,
-                    idplanmantenimiento=plan,
-                    idusuariocreador=request.user if request.user.is_authenticated else User.objects.first()
-                )
-                eventos_creados.append({
-                    'id': evento.idagenda,
-                    'tituloevento': evento.tituloevento,
-                    'fechahorainicio': evento.fechahorainicio,
-                    'fechahorafin': evento.fechahorafin,
-                    'tipoevento': evento.tipoevento,
-                    'equipo': equipo.nombreequipo,
-                    'tarea': detalle.idtareaestandar.nombretarea,
-                    'intervalo': detalle.intervalohorasoperacion
-                })
+        usuario = request.user if request.user.is_authenticated else User.objects.first()
+
+        # Carga por lote e inserción única; los vencimientos ya agendados se omiten
+        eventos_creados, eventos_existentes = programar_proximos_vencimientos(plan, usuario)
         
         return Response({
             'message': f'Se crearon {len(eventos_creados)} eventos de agenda',
             'eventos': eventos_creados,
+            'eventos_existentes': eventos_existentes,
             'plan': {
                 'id': plan.idplanmantenimiento,
                 'nombre': plan.nombreplan,
@@ -261,10 +239,12 @@ class EstadosOrdenTrabajoViewSet(viewsets.ModelViewSet):
 
 # --- NUEVOS VIEWSETS PARA REGISTRO DE MANTENIMIENTOS ---
 
-class OrdenTrabajoViewSet(viewsets.ModelViewSet):
+class OrdenTrabajoViewSet(SerializacionOptimizadaMixin, viewsets.ModelViewSet):
     queryset = OrdenesTrabajo.objects.all().order_by('-fechacreacionot')
     serializer_class = OrdenTrabajoSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = PaginacionCursor
+    orden_paginacion = ('-fechacreacionot', '-idordentrabajo')
 
     @action(detail=False, methods=['post'], url_path='crear-desde-plan')
     def crear_desde_plan(self, request):
@@ -286,22 +266,9 @@ class OrdenTrabajoViewSet(viewsets.ModelViewSet):
             tecnico = User.objects.get(pk=id_tecnico)
             solicitante = User.objects.get(pk=id_solicitante)
             
-            # Obtener o crear registros necesarios
-            try:
-                estado_inicial = EstadosOrdenTrabajo.objects.get(nombreestadoot='Abierta')
-            except EstadosOrdenTrabajo.DoesNotExist:
-                estado_inicial = EstadosOrdenTrabajo.objects.create(
-                    nombreestadoot='Abierta', 
-                    descripcion='OT recién creada.'
-                )
-            
-            try:
-                tipo_ot = TiposMantenimientoOT.objects.get(nombretipomantenimientoot='Preventivo')
-            except TiposMantenimientoOT.DoesNotExist:
-                tipo_ot = TiposMantenimientoOT.objects.create(
-                    nombretipomantenimientoot='Preventivo', 
-                    descripcion='Mantenimiento planificado.'
-                )
+            # Estado y tipo de OT desde el registro de catálogos
+            estado_inicial = estados_ot.obtener('Abierta')
+            tipo_ot = tipos_mantenimiento_ot.obtener('Preventivo')
             
             # Buscar tareas aplicables para el horometro
             detalles_aplicables = DetallesPlanMantenimiento.objects.filter(
@@ -318,9 +285,12 @@ class OrdenTrabajoViewSet(viewsets.ModelViewSet):
                     'error': 'No se encontraron tareas aplicables para el intervalo.'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
+            # El número se reserva fuera de la transacción para aprovechar el bloque del proceso
+            numero = numero_ot('PLAN', equipo)
+
             with transaction.atomic():
                 nueva_ot = OrdenesTrabajo.objects.create(
-                    numeroot=f"OT-{equipo.codigointerno or equipo.idequipo}-{timezone.now().strftime('%Y%m%d%H%M')}",
+                    numeroot=numero,
                     idequipo=equipo,
                     idplanorigen=plan,
                     idtipomantenimientoot=tipo_ot,
@@ -388,22 +358,9 @@ class OrdenTrabajoViewSet(viewsets.ModelViewSet):
                     }
                 )
 
-            # Obtener o crear el estado y tipo de OT
-            try:
-                estado_inicial = EstadosOrdenTrabajo.objects.get(nombreestadoot='Abierta')
-            except EstadosOrdenTrabajo.DoesNotExist:
-                estado_inicial = EstadosOrdenTrabajo.objects.create(
-                    nombreestadoot='Abierta', 
-                    descripcion='OT recién creada.'
-                )
-            
-            try:
-                tipo_ot = TiposMantenimientoOT.objects.get(nombretipomantenimientoot='Correctivo')
-            except TiposMantenimientoOT.DoesNotExist:
-                tipo_ot = TiposMantenimientoOT.objects.create(
-                    nombretipomantenimientoot='Correctivo', 
-                    descripcion='Mantenimiento por falla no planificada.'
-                )
+            # Estado y tipo de OT desde el registro de catálogos
+            estado_inicial = estados_ot.obtener('Abierta')
+            tipo_ot = tipos_mantenimiento_ot.obtener('Correctivo')
 
             # Preparar datos para la OT
             horometro = request.data.get('horometro')
@@ -420,6 +377,7 @@ class OrdenTrabajoViewSet(viewsets.ModelViewSet):
             observaciones = request.data.get('observacionesfinales') or request.data.get('observacionesadicionales') or ''
 
             try:
+                numero = numero_ot('CORR', equipo)
                 with transaction.atomic():
                     # Establecer fechas automáticamente
                     fecha_actual = timezone.now()
@@ -429,7 +387,7 @@ class OrdenTrabajoViewSet(viewsets.ModelViewSet):
                     fecha_ejecucion = fecha_emision
                     
                     nueva_ot = OrdenesTrabajo.objects.create(
-                        numeroot=generar_numero_ot_unico(equipo, 'CORR'),
+                        numeroot=numero,
                         idequipo=equipo,
                         idtipomantenimientoot=tipo_ot,
                         idestadoot=estado_inicial,
@@ -473,14 +431,7 @@ class OrdenTrabajoViewSet(viewsets.ModelViewSet):
                     'error': 'Esta orden de trabajo ya está completada.'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Obtener o crear estado "Completada"
-            try:
-                estado_completada = EstadosOrdenTrabajo.objects.get(nombreestadoot='Completada')
-            except EstadosOrdenTrabajo.DoesNotExist:
-                estado_completada = EstadosOrdenTrabajo.objects.create(
-                    nombreestadoot='Completada',
-                    descripcion='Orden de trabajo completada exitosamente.'
-                )
+            estado_completada = estados_ot.obtener('Completada')
             
             # Actualizar la orden con fecha de completado y estado
             orden.fechacompletado = timezone.now()
@@ -520,135 +471,56 @@ class ActividadOrdenTrabajoViewSet(viewsets.ModelViewSet):
     serializer_class = ActividadOrdenTrabajoSerializer
     permission_classes = [permissions.AllowAny]
 
-class AgendaViewSet(viewsets.ModelViewSet):
+class AgendaViewSet(SerializacionOptimizadaMixin, viewsets.ModelViewSet):
     queryset = Agendas.objects.all()
     serializer_class = AgendaSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = PaginacionCursor
+    orden_paginacion = ('fechahorainicio', 'idagenda')
 
     @action(detail=False, methods=['get'], url_path='calendario')
     def calendario(self, request):
         """
-        Retorna eventos de agenda en formato compatible con calendarios
+        Retorna eventos de agenda en formato compatible con calendarios.
+
+        Parámetros: `start` y `end` (fecha o fecha y hora ISO 8601; se incluyen
+        los eventos que se solapan con el rango), `tecnico`, `faena` y `equipo`.
+        Los eventos recurrentes se entregan expandidos en sus ocurrencias del
+        rango. Los rangos con muchos eventos se entregan como JSON en streaming.
         """
-        start_date = request.query_params.get('start')
-        end_date = request.query_params.get('end')
-        
-        queryset = self.get_queryset()
-        
-        if start_date:
-            queryset = queryset.filter(fechahorainicio__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(fechahorafin__lte=end_date)
-        
-        eventos = []
-        for agenda in queryset:
-            eventos.append({
-                'id': agenda.idagenda,
-                'title': agenda.tituloevento,
-                'start': agenda.fechahorainicio.isoformat(),
-                'end': agenda.fechahorafin.isoformat(),
-                'description': agenda.descripcionevento,
-                'color': agenda.colorevento,
-                'allDay': agenda.esdiacompleto,
-                'extendedProps': {
-                    'equipo': agenda.equipo_nombre if hasattr(agenda, 'equipo_nombre') else None,
-                    'tipo': agenda.tipoevento,
-                    'orden_trabajo': agenda.orden_trabajo_numero if hasattr(agenda, 'orden_trabajo_numero') else None
-                }
-            })
-        
+        try:
+            inicio, fin = (
+                interpretar_fecha(valor) if valor else None
+                for valor in (request.query_params.get('start'), request.query_params.get('end'))
+            )
+            filtros = {
+                f'{nombre}_id': parametro_id(request.query_params, nombre)
+                for nombre in ('tecnico', 'faena', 'equipo')
+            }
+            filas = eventos_calendario(inicio, fin, **filtros)
+            ocurrencias = ocurrencias_calendario(inicio, fin, **filtros)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        eventos, streaming = feed_calendario(filas, ocurrencias)
+        if streaming is not None:
+            return StreamingHttpResponse(streaming, content_type='application/json')
         return Response(eventos)
 
     @action(detail=False, methods=['post'], url_path='sincronizar-mantenciones')
     def sincronizar_mantenciones(self, request):
         """
-        Sincroniza las mantenciones programadas con el calendario
+        Sincroniza las mantenciones programadas con el calendario. Con
+        `equipo` también agenda los vencimientos de sus planes preventivos;
+        los de toda la flota los genera el comando programado
+        `sincronizar_agenda`, no cada llamada a la API.
         """
         try:
-            eventos_creados = []
-            
-            # Obtener órdenes de trabajo programadas que no tienen evento en agenda
-            ordenes_programadas = OrdenesTrabajo.objects.filter(
-                fechaejecucion__isnull=False,
-                idestadoot__nombreestadoot__in=['Abierta', 'En Progreso']
-            ).exclude(
-                idordentrabajo__in=Agendas.objects.values_list('idordentrabajo', flat=True)
-            )
-            
-            for orden in ordenes_programadas:
-                # Determinar el tipo de evento basado en el tipo de mantenimiento
-                tipo_evento = 'preventivo'
-                color_evento = '#3B82F6'  # Azul para preventivo
-                
-                if orden.idtipomantenimientoot.nombretipomantenimientoot == 'Correctivo':
-                    tipo_evento = 'correctivo'
-                    color_evento = '#F59E0B'  # Naranja para correctivo
-                elif orden.idtipomantenimientoot.nombretipomantenimientoot == 'Predictivo':
-                    tipo_evento = 'predictivo'
-                    color_evento = '#10B981'  # Verde para predictivo
-                
-                # Crear título descriptivo
-                titulo = f"Mantenimiento {orden.idtipomantenimientoot.nombretipomantenimientoot} - {orden.idequipo.nombreequipo}"
-                
-                # Crear descripción
-                descripcion = f"OT: {orden.numeroot}\n"
-                descripcion += f"Equipo: {orden.idequipo.nombreequipo}\n"
-                descripcion += f"Tipo: {orden.idtipomantenimientoot.nombretipomantenimientoot}\n"
-                descripcion += f"Prioridad: {orden.prioridad}\n"
-                if orden.descripcionproblemareportado:
-                    descripcion += f"Problema: {orden.descripcionproblemareportado}\n"
-                if orden.horometro:
-                    descripcion += f"Horómetro: {orden.horometro}h\n"
-                
-                # Calcular fechas de inicio y fin (asumiendo 4 horas de duración por defecto)
-                from datetime import datetime, time
-                fecha_inicio = timezone.make_aware(
-                    datetime.combine(orden.fechaejecucion, time(8, 0))  # 8:00 AM
-                )
-                fecha_fin = fecha_inicio + timezone.timedelta(hours=4)
-                
-                # Obtener o crear usuario por defecto para eventos automáticos
-                usuario_sistema, created = User.objects.get_or_create(
-                    username='sistema_agenda',
-                    defaults={
-                        'first_name': 'Sistema',
-                        'last_name': 'Agenda',
-                        'email': 'sistema@somacor.com',
-                        'is_active': True
-                    }
-                )
-                
-                # Crear evento en agenda
-                evento = Agendas.objects.create(
-                    tituloevento=titulo,
-                    fechahorainicio=fecha_inicio,
-                    fechahorafin=fecha_fin,
-                    descripcionevento=descripcion,
-                    tipoevento=tipo_evento,
-                    colorevento=color_evento,
-                    esdiacompleto=False,
-                    idequipo=orden.idequipo,
-                    idordentrabajo=orden,
-                    idusuarioasignado=orden.idtecnicoasignado,
-                    idusuariocreador=usuario_sistema
-                )
-                
-                eventos_creados.append({
-                    'id': evento.idagenda,
-                    'titulo': evento.tituloevento,
-                    'fecha': evento.fechahorainicio.isoformat(),
-                    'orden_trabajo': orden.numeroot,
-                    'equipo': orden.idequipo.nombreequipo
-                })
-            
-            # Sincronizar planes de mantenimiento próximos a vencer
-            self._sincronizar_planes_mantenimiento(eventos_creados)
-            
-            return Response({
-                'message': f'Se crearon {len(eventos_creados)} eventos de agenda',
-                'eventos': eventos_creados
-            })
-            
+            equipo_id = parametro_id(request.query_params, 'equipo')
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            resumen = sincronizar_agenda(equipo_id=equipo_id, planes=equipo_id is not None)
         except Exception as e:
             import traceback
             error_detail = traceback.format_exc()
@@ -657,113 +529,51 @@ class AgendaViewSet(viewsets.ModelViewSet):
                 'error': f'Error al sincronizar mantenciones: {str(e)}',
                 'detalle': error_detail
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    
-    def _sincronizar_planes_mantenimiento(self, eventos_creados):
+
+        total = len(resumen['eventos']) + resumen['eventos_plan_creados']
+        return Response({'message': f'Se crearon {total} eventos de agenda', **resumen})
+
+    @action(detail=True, methods=['get', 'post'], url_path='excepciones')
+    def excepciones(self, request, pk=None):
         """
-        Método auxiliar para sincronizar planes de mantenimiento próximos a vencer
+        Excepciones de un evento recurrente. POST cancela (`cancelada`) o
+        reemplaza (`fechahorainicio`, `fechahorafin`, `tituloevento`,
+        `descripcionevento`) la ocurrencia que empieza en `fechaocurrencia`;
+        si ya tenía una excepción, la reemplaza.
         """
-        try:
-            from datetime import datetime, timedelta
-            
-            # Obtener equipos con planes de mantenimiento activos
-            equipos_con_planes = Equipos.objects.filter(
-                planesmantenimiento__activo=True
-            ).distinct()
-            
-            for equipo in equipos_con_planes:
-                planes = PlanesMantenimiento.objects.filter(
-                    idequipo=equipo,
-                    activo=True
-                )
-                
-                for plan in planes:
-                    # Obtener detalles del plan ordenados por intervalo
-                    detalles = DetallesPlanMantenimiento.objects.filter(
-                        idplanmantenimiento=plan,
-                        activo=True
-                    ).order_by('intervalohorasoperacion')
-                    
-                    for detalle in detalles:
-                        # Calcular próxima fecha de mantenimiento basada en horómetro actual
-                        # (Esta es una lógica simplificada, se puede mejorar)
-                        horometro_actual = equipo.horometro if hasattr(equipo, 'horometro') else 0
-                        horas_hasta_mantenimiento = detalle.intervalohorasoperacion - (horometro_actual % detalle.intervalohorasoperacion)
-                        
-                        # Estimar fecha basada en uso promedio (asumiendo 8 horas/día)
-                        dias_hasta_mantenimiento = horas_hasta_mantenimiento / 8
-                        fecha_estimada = timezone.now().date() + timedelta(days=dias_hasta_mantenimiento)
-                        
-                        # Solo crear eventos para mantenciones en los próximos 30 días
-                        if dias_hasta_mantenimiento <= 30:
-                            # Verificar si ya existe un evento para esta tarea
-                            evento_existente = Agendas.objects.filter(
-                                idequipo=equipo,
-                                idplanmantenimiento=plan,
-                                tituloevento__icontains=detalle.idtareaestandar.nombretarea,
-                                fechahorainicio__date=fecha_estimada
-                            ).exists()
-                            
-                            if not evento_existente:
-                                titulo = f"Mantenimiento Preventivo - {equipo.nombreequipo} - {detalle.idtareaestandar.nombretarea}"
-                                descripcion = f"Plan: {plan.nombreplan}\n"
-                                descripcion += f"Tarea: {detalle.idtareaestandar.nombretarea}\n"
-                                descripcion += f"Intervalo: {detalle.intervalohorasoperacion}h\n"
-                                descripcion += f"Equipo: {equipo.nombreequipo}\n"
-                                descripcion += f"Horómetro estimado: {horometro_actual + horas_hasta_mantenimiento}h"
-                                
-                                fecha_inicio = timezone.datetime.combine(
-                                    fecha_estimada,
-                                    timezone.datetime.min.time().replace(hour=9)  # 9:00 AM
-                                )
-                                fecha_fin = fecha_inicio + timezone.timedelta(
-                                    minutes=detalle.idtareaestandar.tiempoestimadominutos or 120
-                                )
-                                
-                                # Obtener usuario sistema para eventos automáticos
-                                usuario_sistema, created = User.objects.get_or_create(
-                                    username='sistema_agenda',
-                                    defaults={
-                                        'first_name': 'Sistema',
-                                        'last_name': 'Agenda',
-                                        'email': 'sistema@somacor.com',
-                                        'is_active': True
-                                    }
-                                )
-                                
-                                evento = Agendas.objects.create(
-                                    tituloevento=titulo,
-                                    fechahorainicio=fecha_inicio,
-                                    fechahorafin=fecha_fin,
-                                    descripcionevento=descripcion,
-                                    tipoevento='preventivo',
-                                    colorevento='#3B82F6',  # Azul
-                                    esdiacompleto=False,
-                                    idequipo=equipo,
-                                    idplanmantenimiento=plan,
-                                    idusuariocreador=usuario_sistema
-                                )
-                                
-                                eventos_creados.append({
-                                    'id': evento.idagenda,
-                                    'titulo': evento.tituloevento,
-                                    'fecha': evento.fechahorainicio.isoformat(),
-                                    'plan': plan.nombreplan,
-                                    'equipo': equipo.nombreequipo
-                                })
-                                
-        except Exception as e:
-            print(f"Error en sincronización de planes: {str(e)}")  # Para debugging
+        evento = self.get_object()
+        if request.method == 'GET':
+            return Response(ExcepcionAgendaSerializer(evento.excepciones.order_by('fechaocurrencia'), many=True).data)
+
+        if not (evento.recursivo and evento.reglarecursividad):
+            return Response({'error': 'El evento no es recurrente'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = ExcepcionAgendaSerializer(data=request.data, context={'evento': evento})
+        serializer.is_valid(raise_exception=True)
+        datos = serializer.validated_data
+        excepcion, creada = ExcepcionesAgenda.objects.update_or_create(
+            idagenda=evento, fechaocurrencia=datos['fechaocurrencia'],
+            defaults={
+                campo: datos.get(campo)
+                for campo in ('fechahorainicio', 'fechahorafin', 'tituloevento', 'descripcionevento')
+            } | {'cancelada': datos.get('cancelada', False)}
+        )
+        return Response(
+            ExcepcionAgendaSerializer(excepcion).data,
+            status=status.HTTP_201_CREATED if creada else status.HTTP_200_OK
+        )
 
 
 # --- VIEWSET PARA EVIDENCIAS FOTOGRÁFICAS ---
 
-class EvidenciaOTViewSet(viewsets.ModelViewSet):
+class EvidenciaOTViewSet(SerializacionOptimizadaMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar evidencias fotográficas de órdenes de trabajo
     """
     queryset = EvidenciaOT.objects.all()
     serializer_class = EvidenciaOTSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = PaginacionCursor
+    orden_paginacion = ('-fecha_subida', '-idevidencia')
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -777,3 +587,98 @@ class EvidenciaOTViewSet(viewsets.ModelViewSet):
         context['request'] = self.request
         return context
 
+
+class ImagenBlobView(generics.GenericAPIView):
+    """
+    Entrega en streaming una imagen (o miniatura) del almacén de blobs.
+
+    Como la referencia es el sha256 del contenido, el recurso es inmutable:
+    se usa como ETag y se permite cachearlo indefinidamente. Soporta
+    If-None-Match (304) y un rango simple `Range: bytes=inicio-fin` (206).
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, ref):
+        if not almacen.existe(ref):
+            return Response({'error': 'Imagen no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+
+        ruta = almacen.ruta(ref)
+        tamano = ruta.stat().st_size
+        etag = quote_etag(ref)
+        headers = {
+            'ETag': etag,
+            'Cache-Control': 'public, max-age=31536000, immutable',
+            'Accept-Ranges': 'bytes',
+        }
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            respuesta = HttpResponseNotModified()
+            for nombre, valor in headers.items():
+                respuesta[nombre] = valor
+            return respuesta
+
+        archivo = almacen.abrir(ref)
+        with archivo:
+            mime = detectar_mime(archivo.read(16))
+
+        rango = request.headers.get('Range')
+        if_range = request.headers.get('If-Range')
+        if rango and (not if_range or if_range == etag):
+            limites = _interpretar_rango(rango, tamano)
+            if limites is None:
+                respuesta = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+                respuesta['Content-Range'] = f'bytes */{tamano}'
+                return respuesta
+            if limites != (0, tamano - 1):
+                inicio, fin = limites
+                respuesta = StreamingHttpResponse(
+                    _leer_rango(almacen.abrir(ref), inicio, fin - inicio + 1),
+                    status=status.HTTP_206_PARTIAL_CONTENT,
+                    content_type=mime
+                )
+                respuesta['Content-Range'] = f'bytes {inicio}-{fin}/{tamano}'
+                respuesta['Content-Length'] = str(fin - inicio + 1)
+                for nombre, valor in headers.items():
+                    respuesta[nombre] = valor
+                return respuesta
+
+        respuesta = FileResponse(almacen.abrir(ref), content_type=mime)
+        for nombre, valor in headers.items():
+            respuesta[nombre] = valor
+        return respuesta
+
+
+def _interpretar_rango(cabecera, tamano):
+    """
+    Interpreta un único rango `bytes=a-b`, `bytes=a-` o `bytes=-n`.
+    Retorna (inicio, fin) inclusivos, o None si el rango no es satisfacible.
+    Los rangos múltiples o malformados se ignoran sirviendo el archivo completo.
+    """
+    unidad, _, especificacion = cabecera.partition('=')
+    if unidad.strip() != 'bytes' or ',' in especificacion:
+        return (0, tamano - 1)
+    inicio, _, fin = especificacion.strip().partition('-')
+    try:
+        if inicio == '':
+            sufijo = int(fin)
+            if sufijo <= 0:
+                return None
+            return (max(tamano - sufijo, 0), tamano - 1)
+        inicio = int(inicio)
+        fin = int(fin) if fin else tamano - 1
+    except ValueError:
+        return (0, tamano - 1)
+    if inicio >= tamano or fin < inicio:
+        return None
+    return (inicio, min(fin, tamano - 1))
+
+
+def _leer_rango(archivo, inicio, longitud, tamano_bloque=64 * 1024):
+    with archivo:
+        archivo.seek(inicio)
+        while longitud > 0:
+            bloque = archivo.read(min(tamano_bloque, longitud))
+            if not bloque:
+                break
+            longitud -= len(bloque)
+            yield bloque
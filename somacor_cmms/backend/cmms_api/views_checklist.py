@@ -7,11 +7,40 @@ from rest_framework.decorators import action
 from django.utils import timezone
 from django.db import transaction
 from django.db.models import Q, Count
+from django.utils.cache import quote_etag
+from django.utils.http import parse_etags
 from .models import *
 from .serializers import *
+from .reportes_checklist import conformidad_por_equipo, top_elementos_fallidos
+from .reportes_mantenimiento import AGRUPACIONES
+from . import cache_plantillas
+from .catalogos import estados_ot, tipos_mantenimiento_ot
+from .secuencias_ot import numero_ot
+from .paginacion import pagina_keyset
+from .optimizacion_consultas import optimizar_queryset
 import datetime
+import hashlib
 import json # Importante añadir json
 
+LIMITE_ELEMENTOS_FALLIDOS = 20
+LIMITE_MAXIMO_ELEMENTOS_FALLIDOS = 100
+LIMITE_HISTORIAL_EQUIPO = 50
+LIMITE_MAXIMO_HISTORIAL_EQUIPO = 200
+ORDEN_HISTORIAL_EQUIPO = ('-fecha_inspeccion', '-id_instance')
+VALORES_BOOLEANOS = {'true': True, 'false': False}
+
+
+def parametro_id(params, nombre):
+    """ID numérico opcional de los parámetros de la petición. Lanza `ValueError` si no es un entero."""
+    valor = params.get(nombre)
+    if valor in (None, ''):
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise ValueError(f'{nombre} debe ser un ID numérico')
+
+
 class ChecklistWorkflowViewSet(viewsets.ViewSet):
     """
     ViewSet para manejar el flujo completo de checklists
@@ -21,26 +50,37 @@ class ChecklistWorkflowViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'], url_path='templates-por-equipo/(?P<equipo_id>[^/.]+)')
     def templates_por_equipo(self, request, equipo_id=None):
         """
-        Retorna las plantillas de checklist disponibles para un equipo específico
+        Retorna las plantillas de checklist disponibles para un equipo específico.
+        Las plantillas se sirven desde una caché versionada por tipo de equipo y
+        la respuesta soporta ETag / If-None-Match para devolver 304 a las tablets.
         """
         try:
-            equipo = Equipos.objects.get(idequipo=equipo_id)
-            templates = ChecklistTemplate.objects.filter(
-                tipo_equipo=equipo.idtipoequipo,
-                activo=True
-            ).prefetch_related('categories__items')
-            
-            return Response({
-                'equipo': EquipoSerializer(equipo).data,
-                'templates': ChecklistTemplateSerializer(templates, many=True).data
-            })
-            
+            equipo = Equipos.objects.select_related(
+                'idtipoequipo', 'idfaenaactual', 'idestadoactual'
+            ).get(idequipo=equipo_id)
         except Equipos.DoesNotExist:
             return Response(
                 {'error': 'Equipo no encontrado'}, 
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        snapshot = cache_plantillas.obtener_snapshot(equipo.idtipoequipo_id)
+        equipo_data = EquipoSerializer(equipo).data
+
+        # El ETag depende sólo de las plantillas y del equipo / tipo: las lecturas
+        # de horómetro cambian los datos del equipo pero no deben anular el 304
+        huella = f"{equipo.idequipo}:{equipo.idtipoequipo_id}:{snapshot['etag']}"
+        etag = quote_etag(hashlib.sha1(huella.encode('utf-8')).hexdigest())
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        return Response({
+            'equipo': equipo_data,
+            'templates': snapshot['templates']
+        }, headers=headers)
+
     @action(detail=False, methods=['post'], url_path='completar-checklist')
     def completar_checklist(self, request):
         """
@@ -48,8 +88,9 @@ class ChecklistWorkflowViewSet(viewsets.ViewSet):
         Ahora procesa multipart/form-data.
         """
         # --- INICIO DE LA CORRECCIÓN ---
-        # Copiamos los datos para poder modificarlos.
-        data = request.data.copy()
+        # Copiamos los datos para poder modificarlos. En multipart se usa dict()
+        # (copia superficial) para no duplicar en memoria los archivos subidos.
+        data = request.data.dict() if hasattr(request.data, 'dict') else request.data.copy()
 
         # El campo 'answers' viene como un string JSON, lo convertimos a un objeto Python.
         if 'answers' in data and isinstance(data['answers'], str):
@@ -63,13 +104,23 @@ class ChecklistWorkflowViewSet(viewsets.ViewSet):
 
         if serializer.is_valid():
             try:
+                # El número de la OT correctiva se reserva fuera de la transacción para
+                # aprovechar el bloque del proceso y no bloquear la secuencia hasta el commit
+                items = serializer._items_validados
+                numero = None
+                if any(
+                    answer.get('estado') == 'malo' and items[answer['item']].es_critico
+                    for answer in serializer.validated_data.get('answers', [])
+                ):
+                    numero = numero_ot('CHK', serializer.validated_data['equipo'])
+
                 with transaction.atomic():
                     instance = serializer.save()
                     # La lógica de análisis de respuestas y creación de OT sigue igual.
                     alertas = self._analizar_respuestas_criticas(instance)
                     
                     if alertas.get('elementos_criticos_malos'):
-                        ot_creada = self._crear_ot_correctiva_desde_checklist(instance, alertas)
+                        ot_creada = self._crear_ot_correctiva_desde_checklist(instance, alertas, numero)
                         alertas['ot_creada'] = ot_creada
                     
                     # Devolvemos la instancia serializada (incluirá la URL de la imagen si se subió).
@@ -83,6 +134,9 @@ class ChecklistWorkflowViewSet(viewsets.ViewSet):
                     {'error': f'Error al procesar checklist: {str(e)}'}, 
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
+            finally:
+                # Si falló antes de save(), la imagen sigue en un archivo temporal
+                serializer.descartar_blobs()
         else:
             # Si la validación falla, retornamos los errores para depuración.
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -91,7 +145,7 @@ class ChecklistWorkflowViewSet(viewsets.ViewSet):
         """
         Analiza las respuestas del checklist para identificar elementos críticos en mal estado
         """
-        respuestas_malas = instance.answers.filter(estado='malo')
+        respuestas_malas = instance.answers.filter(estado='malo').select_related('item__category')
         elementos_criticos_malos = []
         elementos_no_criticos_malos = []
         
@@ -116,21 +170,15 @@ class ChecklistWorkflowViewSet(viewsets.ViewSet):
             'total_elementos_malos': len(elementos_criticos_malos) + len(elementos_no_criticos_malos)
         }
 
-    def _crear_ot_correctiva_desde_checklist(self, instance, alertas):
+    def _crear_ot_correctiva_desde_checklist(self, instance, alertas, numero=None):
         """
-        Crea una orden de trabajo correctiva basada en los elementos críticos fallidos del checklist
+        Crea una orden de trabajo correctiva basada en los elementos críticos fallidos del checklist.
+        `numero` es el número de OT ya reservado; si no se entrega se reserva aquí.
         """
         try:
-            # Obtener tipos y estados necesarios
-            tipo_correctivo = TiposMantenimientoOT.objects.get_or_create(
-                nombretipomantenimientoot='Correctivo',
-                defaults={'descripcion': 'Mantenimiento por falla no planificada'}
-            )[0]
-            
-            estado_abierta = EstadosOrdenTrabajo.objects.get_or_create(
-                nombreestadoot='Abierta',
-                defaults={'descripcion': 'OT recién creada'}
-            )[0]
+            # Tipo y estado desde el registro de catálogos
+            tipo_correctivo = tipos_mantenimiento_ot.obtener('Correctivo')
+            estado_abierta = estados_ot.obtener('Abierta')
             
             # Crear descripción del problema
             elementos_criticos = [item['item'] for item in alertas['elementos_criticos_malos']]
@@ -144,7 +192,7 @@ class ChecklistWorkflowViewSet(viewsets.ViewSet):
             
             # Crear la OT
             ot = OrdenesTrabajo.objects.create(
-                numeroot=f"OT-CHK-{instance.equipo.codigointerno or instance.equipo.idequipo}-{timezone.now().strftime('%Y%m%d%H%M')}",
+                numeroot=numero or numero_ot('CHK', instance.equipo),
                 idequipo=instance.equipo,
                 idtipomantenimientoot=tipo_correctivo,
                 idestadoot=estado_abierta,
@@ -178,55 +226,82 @@ class ChecklistWorkflowViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'], url_path='historial-equipo/(?P<equipo_id>[^/.]+)')
     def historial_equipo(self, request, equipo_id=None):
         """
-        Retorna el historial de checklists de un equipo
+        Retorna el historial de checklists de un equipo, del más reciente al
+        más antiguo, paginado por cursor sobre (fecha_inspeccion, id_instance).
+
+        Parámetros: `fecha_inicio`, `fecha_fin`, `limite` (1 a 200, por
+        defecto 50) y `cursor` (el `siguiente` de la página anterior). Las
+        estadísticas del período se calculan con una sola consulta de
+        agregación condicional y sólo en la primera página; en las siguientes
+        `estadisticas` es null (las claves son las mismas en todas). Los
+        checklists se entregan en su forma de listado, sin el contenido de las
+        imágenes (se puede pedir más con `?expand=`).
         """
         try:
-            equipo = Equipos.objects.get(idequipo=equipo_id)
-            
-            # Parámetros de filtrado
-            fecha_inicio = request.query_params.get('fecha_inicio')
-            fecha_fin = request.query_params.get('fecha_fin')
-            
-            queryset = ChecklistInstance.objects.filter(equipo=equipo)
-            
-            if fecha_inicio:
-                queryset = queryset.filter(fecha_inspeccion__gte=fecha_inicio)
-            if fecha_fin:
-                queryset = queryset.filter(fecha_inspeccion__lte=fecha_fin)
-            
-            queryset = queryset.order_by('-fecha_inspeccion')
-            
-            # Estadísticas del período
-            total_checklists = queryset.count()
-            checklists_con_fallas = queryset.filter(
-                answers__estado='malo'
-            ).distinct().count()
-            
-            checklists_con_fallas_criticas = queryset.filter(
-                answers__estado='malo',
-                answers__item__es_critico=True
-            ).distinct().count()
-            
-            return Response({
-                'equipo': EquipoSerializer(equipo).data,
-                'estadisticas': {
-                    'total_checklists': total_checklists,
-                    'checklists_con_fallas': checklists_con_fallas,
-                    'checklists_con_fallas_criticas': checklists_con_fallas_criticas,
-                    'porcentaje_conformidad': round(
-                        ((total_checklists - checklists_con_fallas) / total_checklists * 100) 
-                        if total_checklists > 0 else 0, 2
-                    )
-                },
-                'historial': ChecklistInstanceSerializer(queryset[:50], many=True).data  # Últimos 50
-            })
-            
+            equipo = optimizar_queryset(Equipos.objects.all(), EquipoSerializer).get(idequipo=equipo_id)
         except Equipos.DoesNotExist:
             return Response(
                 {'error': 'Equipo no encontrado'}, 
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        # Parámetros de filtrado
+        fecha_inicio = request.query_params.get('fecha_inicio')
+        fecha_fin = request.query_params.get('fecha_fin')
+        cursor = request.query_params.get('cursor')
+        try:
+            if fecha_inicio:
+                fecha_inicio = datetime.date.fromisoformat(fecha_inicio)
+            if fecha_fin:
+                fecha_fin = datetime.date.fromisoformat(fecha_fin)
+            limite = int(request.query_params.get('limite', LIMITE_HISTORIAL_EQUIPO))
+        except ValueError:
+            return Response(
+                {'error': 'Fechas en formato AAAA-MM-DD y limite numérico'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not 1 <= limite <= LIMITE_MAXIMO_HISTORIAL_EQUIPO:
+            return Response(
+                {'error': f'limite debe estar entre 1 y {LIMITE_MAXIMO_HISTORIAL_EQUIPO}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = ChecklistInstance.objects.filter(equipo=equipo)
+        if fecha_inicio:
+            queryset = queryset.filter(fecha_inspeccion__gte=fecha_inicio)
+        if fecha_fin:
+            queryset = queryset.filter(fecha_inspeccion__lte=fecha_fin)
+
+        contexto = {'request': request, 'vista': 'lista'}
+        try:
+            filas, siguiente, _ = pagina_keyset(
+                optimizar_queryset(queryset, ChecklistInstanceSerializer(context=contexto)),
+                ORDEN_HISTORIAL_EQUIPO, cursor=cursor, tamano=limite
+            )
+        except ValueError:
+            return Response({'error': 'Cursor inválido'}, status=status.HTTP_400_BAD_REQUEST)
+
+        respuesta = {
+            'equipo': EquipoSerializer(equipo).data,
+            'estadisticas': None,
+            'historial': ChecklistInstanceSerializer(filas, many=True, context=contexto).data,
+            'siguiente': siguiente,
+        }
+        if not cursor:
+            # Estadísticas del período (sólo en la primera página)
+            estadisticas = queryset.order_by().aggregate(
+                total_checklists=Count('id_instance'),
+                checklists_con_fallas=Count('id_instance', filter=Q(respuestas_malas__gt=0)),
+                checklists_con_fallas_criticas=Count('id_instance', filter=Q(respuestas_criticas_malas__gt=0))
+            )
+            total_checklists = estadisticas['total_checklists']
+            estadisticas['porcentaje_conformidad'] = round(
+                ((total_checklists - estadisticas['checklists_con_fallas']) / total_checklists * 100)
+                if total_checklists > 0 else 0, 2
+            )
+            respuesta['estadisticas'] = estadisticas
+        return Response(respuesta)
+
     @action(detail=False, methods=['get'], url_path='reportes/conformidad')
     def reporte_conformidad(self, request):
         """
@@ -234,121 +309,98 @@ class ChecklistWorkflowViewSet(viewsets.ViewSet):
         """
         fecha_inicio = request.query_params.get('fecha_inicio')
         fecha_fin = request.query_params.get('fecha_fin')
-        tipo_equipo_id = request.query_params.get('tipo_equipo')
+        try:
+            tipo_equipo_id = parametro_id(request.query_params, 'tipo_equipo')
+            faena_id = parametro_id(request.query_params, 'faena')
+            template_id = parametro_id(request.query_params, 'template')
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         if not fecha_inicio or not fecha_fin:
             fecha_fin = timezone.now().date()
             fecha_inicio = fecha_fin - datetime.timedelta(days=30)
         
-        queryset = ChecklistInstance.objects.filter(
-            fecha_inspeccion__range=[fecha_inicio, fecha_fin]
+        # Conformidad por equipo (agregación agrupada, número constante de consultas)
+        total_checklists, conformidad_equipos = conformidad_por_equipo(
+            fecha_inicio,
+            fecha_fin,
+            tipo_equipo_id=tipo_equipo_id,
+            faena_id=faena_id,
+            template_id=template_id
         )
-        
-        if tipo_equipo_id:
-            queryset = queryset.filter(equipo__idtipoequipo_id=tipo_equipo_id)
-        
-        # Conformidad por equipo
-        conformidad_por_equipo = {}
-        for instance in queryset:
-            equipo_key = f"{instance.equipo.nombreequipo} ({instance.equipo.codigointerno})"
-            
-            if equipo_key not in conformidad_por_equipo:
-                conformidad_por_equipo[equipo_key] = {
-                    'total_checklists': 0,
-                    'checklists_conformes': 0,
-                    'fallas_criticas': 0,
-                    'fallas_no_criticas': 0
-                }
-            
-            conformidad_por_equipo[equipo_key]['total_checklists'] += 1
-            
-            # Verificar si tiene fallas
-            fallas_criticas = instance.answers.filter(
-                estado='malo', 
-                item__es_critico=True
-            ).count()
-            
-            fallas_no_criticas = instance.answers.filter(
-                estado='malo', 
-                item__es_critico=False
-            ).count()
-            
-            conformidad_por_equipo[equipo_key]['fallas_criticas'] += fallas_criticas
-            conformidad_por_equipo[equipo_key]['fallas_no_criticas'] += fallas_no_criticas
-            
-            # Si no tiene fallas críticas, se considera conforme
-            if fallas_criticas == 0:
-                conformidad_por_equipo[equipo_key]['checklists_conformes'] += 1
-        
-        # Calcular porcentajes
-        for equipo_data in conformidad_por_equipo.values():
-            total = equipo_data['total_checklists']
-            if total > 0:
-                equipo_data['porcentaje_conformidad'] = round(
-                    (equipo_data['checklists_conformes'] / total) * 100, 2
-                )
-            else:
-                equipo_data['porcentaje_conformidad'] = 0
 
         return Response({
             'periodo': {
                 'fecha_inicio': fecha_inicio,
                 'fecha_fin': fecha_fin
             },
-            'total_checklists_periodo': queryset.count(),
-            'conformidad_por_equipo': conformidad_por_equipo
+            'total_checklists_periodo': total_checklists,
+            'conformidad_por_equipo': conformidad_equipos
         })
 
     @action(detail=False, methods=['get'], url_path='elementos-mas-fallidos')
     def elementos_mas_fallidos(self, request):
         """
-        Retorna los elementos de checklist que más fallan
+        Retorna los elementos de checklist que más fallan, con los equipos
+        afectados y su serie de fallas por `agrupacion` (dia, semana o mes).
+        Parámetros: `fecha_inicio`, `fecha_fin`, `limite` (1 a 100, por
+        defecto 20), `critico` (true / false), `tipo_equipo` y `faena`.
         """
         fecha_inicio = request.query_params.get('fecha_inicio')
         fecha_fin = request.query_params.get('fecha_fin')
-        
-        if not fecha_inicio or not fecha_fin:
-            fecha_fin = timezone.now().date()
-            fecha_inicio = fecha_fin - datetime.timedelta(days=30)
-        
-        # Buscar respuestas "malo" en el período
-        respuestas_malas = ChecklistAnswer.objects.filter(
-            estado='malo',
-            instance__fecha_inspeccion__range=[fecha_inicio, fecha_fin]
-        ).select_related('item', 'item__category')
-        
-        # Agrupar por elemento
-        elementos_fallidos = {}
-        for respuesta in respuestas_malas:
-            item_key = f"{respuesta.item.category.nombre} - {respuesta.item.texto}"
-            
-            if item_key not in elementos_fallidos:
-                elementos_fallidos[item_key] = {
-                    'elemento': respuesta.item.texto,
-                    'categoria': respuesta.item.category.nombre,
-                    'es_critico': respuesta.item.es_critico,
-                    'cantidad_fallas': 0,
-                    'equipos_afectados': set()
-                }
-            
-            elementos_fallidos[item_key]['cantidad_fallas'] += 1
-            elementos_fallidos[item_key]['equipos_afectados'].add(
-                respuesta.instance.equipo.nombreequipo
+        agrupacion = request.query_params.get('agrupacion', 'semana')
+        critico = request.query_params.get('critico')
+        if critico and critico.lower() not in VALORES_BOOLEANOS:
+            return Response({'error': 'critico debe ser true o false'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            tipo_equipo_id = parametro_id(request.query_params, 'tipo_equipo')
+            faena_id = parametro_id(request.query_params, 'faena')
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            if fecha_inicio and fecha_fin:
+                fecha_inicio = datetime.date.fromisoformat(fecha_inicio)
+                fecha_fin = datetime.date.fromisoformat(fecha_fin)
+            else:
+                fecha_fin = timezone.localdate()
+                fecha_inicio = fecha_fin - datetime.timedelta(days=30)
+            limite = int(request.query_params.get('limite', LIMITE_ELEMENTOS_FALLIDOS))
+        except ValueError:
+            return Response(
+                {'error': 'Fechas en formato AAAA-MM-DD y limite numérico'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-        
-        # Convertir sets a listas y ordenar por cantidad de fallas
-        resultado = []
-        for item_data in elementos_fallidos.values():
-            item_data['equipos_afectados'] = list(item_data['equipos_afectados'])
-            item_data['cantidad_equipos_afectados'] = len(item_data['equipos_afectados'])
-            resultado.append(item_data)
-        
-        resultado.sort(key=lambda x: x['cantidad_fallas'], reverse=True)
-        
+        if not 1 <= limite <= LIMITE_MAXIMO_ELEMENTOS_FALLIDOS:
+            return Response(
+                {'error': f'limite debe estar entre 1 y {LIMITE_MAXIMO_ELEMENTOS_FALLIDOS}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if agrupacion not in AGRUPACIONES:
+            return Response(
+                {'error': f"agrupacion debe ser una de: {', '.join(AGRUPACIONES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        periodos, elementos = top_elementos_fallidos(
+            fecha_inicio,
+            fecha_fin,
+            limite=limite,
+            solo_criticos=VALORES_BOOLEANOS.get(critico.lower()) if critico else None,
+            tipo_equipo_id=tipo_equipo_id,
+            faena_id=faena_id,
+            agrupacion=agrupacion
+        )
+
         return Response({
             'periodo': {
                 'fecha_inicio': fecha_inicio,
                 'fecha_fin': fecha_fin
             },
-            'elementos_mas_fallidos': resultado[:20]  # Top 20
+            'tendencia': {
+                'agrupacion': agrupacion,
+                'periodos': periodos
+            },
+            'elementos_mas_fallidos': elementos
         })
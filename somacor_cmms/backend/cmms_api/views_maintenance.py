@@ -6,9 +6,15 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.utils import timezone
 from django.db import transaction
-from django.db.models import Q, Count, Avg
 from .models import *
 from .serializers import *
+from .catalogos import estados_ot, tipos_mantenimiento_ot
+from .secuencias_ot import numero_ot
+from .horometros import registrar_lectura
+from .dashboard import snapshot_dashboard
+from .indicadores import confiabilidad
+from .views_checklist import parametro_id
+from .reportes_mantenimiento import eficiencia_mantenimiento, AGRUPACIONES
 import datetime
 
 class MantenimientoWorkflowViewSet(viewsets.ViewSet):
@@ -20,54 +26,10 @@ class MantenimientoWorkflowViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'], url_path='dashboard')
     def dashboard(self, request):
         """
-        Retorna información del dashboard de mantenimiento
+        Retorna información del dashboard de mantenimiento (snapshot en caché,
+        ver dashboard.py)
         """
-        # Estadísticas generales
-        total_equipos = Equipos.objects.filter(activo=True).count()
-        equipos_operativos = Equipos.objects.filter(
-            activo=True, 
-            idestadoactual__nombreestado='Operativo'
-        ).count()
-        
-        # Órdenes de trabajo
-        ots_abiertas = OrdenesTrabajo.objects.filter(
-            idestadoot__nombreestadoot__in=['Abierta', 'Asignada']
-        ).count()
-        
-        ots_vencidas = OrdenesTrabajo.objects.filter(
-            fechaejecucion__lt=timezone.now().date(),
-            idestadoot__nombreestadoot__in=['Abierta', 'Asignada']
-        ).count()
-        
-        # Mantenimientos próximos (próximos 7 días)
-        fecha_limite = timezone.now().date() + datetime.timedelta(days=7)
-        mantenimientos_proximos = Agendas.objects.filter(
-            fechahorainicio__date__lte=fecha_limite,
-            fechahorainicio__date__gte=timezone.now().date(),
-            tipoevento='Mantenimiento Preventivo'
-        ).count()
-        
-        # Equipos por estado
-        equipos_por_estado = EstadosEquipo.objects.annotate(
-            cantidad=Count('equipos')
-        ).values('nombreestado', 'cantidad')
-        
-        # OTs por tipo de mantenimiento
-        ots_por_tipo = TiposMantenimientoOT.objects.annotate(
-            cantidad=Count('ordenestrabajo')
-        ).values('nombretipomantenimientoot', 'cantidad')
-
-        return Response({
-            'estadisticas_generales': {
-                'total_equipos': total_equipos,
-                'equipos_operativos': equipos_operativos,
-                'ots_abiertas': ots_abiertas,
-                'ots_vencidas': ots_vencidas,
-                'mantenimientos_proximos': mantenimientos_proximos
-            },
-            'equipos_por_estado': list(equipos_por_estado),
-            'ots_por_tipo': list(ots_por_tipo)
-        })
+        return Response(snapshot_dashboard())
 
     @action(detail=False, methods=['get'], url_path='equipos-criticos')
     def equipos_criticos(self, request):
@@ -128,10 +90,7 @@ class MantenimientoWorkflowViewSet(viewsets.ViewSet):
                 
                 if actividades_pendientes == 0:
                     # Marcar OT como completada
-                    estado_completada = EstadosOrdenTrabajo.objects.get_or_create(
-                        nombreestadoot='Completada',
-                        defaults={'descripcion': 'Orden de trabajo finalizada'}
-                    )[0]
+                    estado_completada = estados_ot.obtener('Completada')
                     
                     ot.idestadoot = estado_completada
                     ot.fechacompletado = timezone.now()
@@ -159,24 +118,33 @@ class MantenimientoWorkflowViewSet(viewsets.ViewSet):
         Actualiza el horómetro de un equipo
         """
         equipo_id = request.data.get('equipo_id')
-        nuevo_horometro = request.data.get('horometro')
         observaciones = request.data.get('observaciones', '')
 
+        try:
+            nuevo_horometro = int(request.data.get('horometro'))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'El horómetro debe ser un número entero'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         try:
             equipo = Equipos.objects.get(idequipo=equipo_id)
             horometro_anterior = equipo.horometroactual
-            
-            equipo.horometroactual = nuevo_horometro
-            equipo.save()
 
-            # Aquí se podría crear un registro de historial de horómetros
-            # HistorialHorometros.objects.create(...)
+            # La lectura queda en el historial, que recalcula horómetro y tasa de uso del equipo
+            registrar_lectura(
+                equipo.pk, nuevo_horometro, 'manual',
+                usuario_id=request.user.pk, observaciones=observaciones or None
+            )
+            equipo.refresh_from_db(fields=['horometroactual', 'tasausodiaria'])
 
             return Response({
                 'message': 'Horómetro actualizado exitosamente',
                 'equipo': equipo.nombreequipo,
                 'horometro_anterior': horometro_anterior,
-                'horometro_nuevo': nuevo_horometro
+                'horometro_nuevo': nuevo_horometro,
+                'tasa_uso_diaria': equipo.tasausodiaria
             })
 
         except Equipos.DoesNotExist:
@@ -193,46 +161,72 @@ class MantenimientoWorkflowViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'], url_path='reportes/eficiencia')
     def reporte_eficiencia(self, request):
         """
-        Genera reporte de eficiencia de mantenimiento
+        Genera reporte de eficiencia de mantenimiento: cantidad y tiempos de
+        resolución (promedio, p50, p90, total) por tipo, faena, técnico y
+        tipo de equipo, y la tendencia según `agrupacion` (dia, semana o mes).
+        """
+        fecha_inicio = request.query_params.get('fecha_inicio')
+        fecha_fin = request.query_params.get('fecha_fin')
+        agrupacion = request.query_params.get('agrupacion', 'semana')
+
+        try:
+            if fecha_inicio and fecha_fin:
+                fecha_inicio = datetime.date.fromisoformat(fecha_inicio)
+                fecha_fin = datetime.date.fromisoformat(fecha_fin)
+            else:
+                fecha_fin = timezone.localdate()
+                fecha_inicio = fecha_fin - datetime.timedelta(days=30)
+        except ValueError:
+            return Response(
+                {'error': 'fecha_inicio y fecha_fin deben tener el formato AAAA-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if agrupacion not in AGRUPACIONES:
+            return Response(
+                {'error': f"agrupacion debe ser una de: {', '.join(AGRUPACIONES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(eficiencia_mantenimiento(fecha_inicio, fecha_fin, agrupacion))
+
+    @action(detail=False, methods=['get'], url_path='reportes/confiabilidad')
+    def reporte_confiabilidad(self, request):
+        """
+        MTBF, MTTR y disponibilidad por equipo y de la flota en el período,
+        calculados desde los indicadores diarios (ver indicadores.py).
+        Parámetros: `fecha_inicio`, `fecha_fin` (por defecto los últimos 30
+        días), `equipo`, `faena` y `tipo_equipo`.
         """
         fecha_inicio = request.query_params.get('fecha_inicio')
         fecha_fin = request.query_params.get('fecha_fin')
-        
-        if not fecha_inicio or not fecha_fin:
-            fecha_fin = timezone.now().date()
-            fecha_inicio = fecha_fin - datetime.timedelta(days=30)
-        
-        # OTs completadas en el período
-        ots_completadas = OrdenesTrabajo.objects.filter(
-            fechacompletado__date__range=[fecha_inicio, fecha_fin],
-            idestadoot__nombreestadoot='Completada'
-        )
-        
-        # Tiempo promedio de resolución
-        tiempo_promedio = ots_completadas.aggregate(
-            promedio=Avg('tiempototalminutos')
-        )['promedio'] or 0
-        
-        # Eficiencia por tipo de mantenimiento
-        eficiencia_por_tipo = {}
-        for tipo in TiposMantenimientoOT.objects.all():
-            ots_tipo = ots_completadas.filter(idtipomantenimientoot=tipo)
-            eficiencia_por_tipo[tipo.nombretipomantenimientoot] = {
-                'total_ots': ots_tipo.count(),
-                'tiempo_promedio': ots_tipo.aggregate(
-                    promedio=Avg('tiempototalminutos')
-                )['promedio'] or 0
+
+        try:
+            if fecha_inicio and fecha_fin:
+                fecha_inicio = datetime.date.fromisoformat(fecha_inicio)
+                fecha_fin = datetime.date.fromisoformat(fecha_fin)
+            else:
+                fecha_fin = timezone.localdate()
+                fecha_inicio = fecha_fin - datetime.timedelta(days=30)
+        except ValueError:
+            return Response(
+                {'error': 'fecha_inicio y fecha_fin deben tener el formato AAAA-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if fecha_fin < fecha_inicio:
+            return Response(
+                {'error': 'fecha_fin debe ser igual o posterior a fecha_inicio'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            filtros = {
+                'equipo_id': parametro_id(request.query_params, 'equipo'),
+                'faena_id': parametro_id(request.query_params, 'faena'),
+                'tipo_equipo_id': parametro_id(request.query_params, 'tipo_equipo'),
             }
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response({
-            'periodo': {
-                'fecha_inicio': fecha_inicio,
-                'fecha_fin': fecha_fin
-            },
-            'total_ots_completadas': ots_completadas.count(),
-            'tiempo_promedio_resolucion': tiempo_promedio,
-            'eficiencia_por_tipo': eficiencia_por_tipo
-        })
+        return Response(confiabilidad(fecha_inicio, fecha_fin, **filtros))
 
 
     @action(detail=False, methods=['post'], url_path='crear-ot-planificada')
@@ -268,30 +262,15 @@ class MantenimientoWorkflowViewSet(viewsets.ViewSet):
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            # Obtener o crear estado y tipo de OT
-            try:
-                estado_inicial = EstadosOrdenTrabajo.objects.get(nombreestadoot='Abierta')
-            except EstadosOrdenTrabajo.DoesNotExist:
-                estado_inicial = EstadosOrdenTrabajo.objects.create(
-                    nombreestadoot='Abierta',
-                    descripcion='OT recién creada y pendiente de asignación'
-                )
-
-            try:
-                tipo_ot = TiposMantenimientoOT.objects.get(nombretipomantenimientoot='Preventivo')
-            except TiposMantenimientoOT.DoesNotExist:
-                tipo_ot = TiposMantenimientoOT.objects.create(
-                    nombretipomantenimientoot='Preventivo',
-                    descripcion='Mantenimiento planificado y programado'
-                )
+            # Estado y tipo de OT desde el registro de catálogos
+            estado_inicial = estados_ot.obtener('Abierta')
+            tipo_ot = tipos_mantenimiento_ot.obtener('Preventivo')
 
             # Crear la orden de trabajo
+            numero = numero_ot('PREV', equipo)
             with transaction.atomic():
-                # Generar número de OT único
-                numero_ot = f"OT-PREV-{equipo.codigointerno or equipo.idequipo}-{timezone.now().strftime('%Y%m%d%H%M')}"
-                
                 nueva_ot = OrdenesTrabajo.objects.create(
-                    numeroot=numero_ot,
+                    numeroot=numero,
                     idequipo=equipo,
                     idtipomantenimientoot=tipo_ot,
                     idestadoot=estado_inicial,
@@ -329,7 +308,7 @@ class MantenimientoWorkflowViewSet(viewsets.ViewSet):
                 # Crear evento en el calendario
                 Agendas.objects.create(
                     tituloevento=f"Mantenimiento Preventivo - {equipo.nombreequipo}",
-                    descripcionevento=f"OT: {numero_ot} - {plan_mantenimiento.nombreplan}",
+                    descripcionevento=f"OT: {numero} - {plan_mantenimiento.nombreplan}",
                     fechahorainicio=timezone.datetime.combine(
                         timezone.datetime.strptime(fechaejecucionprogramada, '%Y-%m-%d').date(),
                         timezone.datetime.min.time()
@@ -355,7 +334,7 @@ class MantenimientoWorkflowViewSet(viewsets.ViewSet):
                 'message': 'Orden de trabajo planificada creada exitosamente',
                 'orden_trabajo': serializer.data,
                 'actividades_creadas': len(actividades_creadas),
-                'numero_ot': numero_ot
+                'numero_ot': numero
             }, status=status.HTTP_201_CREATED)
 
         except Exception as e:
@@ -104,6 +104,39 @@ if os.environ.get('USE_MYSQL', 'False').lower() == 'true':
     }
 
 
+# Caché
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Por defecto se usa memoria local; en producción puede apuntarse a cualquier
+# backend compartido (Redis, Memcached, base de datos) con CACHE_BACKEND / CACHE_LOCATION.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'cmms-cache'),
+    }
+}
+
+# Tiempo de vida (segundos) de los snapshots de plantillas de checklist
+CACHE_PLANTILLAS_TIMEOUT = 60 * 60 * 24
+# Con LocMemCache (por proceso) el plazo se acorta a este, porque la invalidación no llega a los demás workers
+CACHE_PLANTILLAS_TIMEOUT_LOCAL = 60
+
+# Tiempo de vida (segundos) del rol resuelto de cada usuario en la caché de proceso
+CACHE_ROLES_TTL = 60
+
+# Caché LRU de tokens de autenticación (por proceso; se invalida entre procesos por la caché de Django,
+# que debe ser compartida si hay varios workers)
+CACHE_TOKENS_MAXIMO = 10000
+CACHE_TOKENS_TTL = 60 * 5
+# Con LocMemCache la revocación no llega a los demás workers: el TTL se acorta a este
+CACHE_TOKENS_TTL_LOCAL = 5
+
+# Tiempo de vida (segundos) de los catálogos de estados y tipos de OT en memoria
+CACHE_CATALOGOS_TTL = 60 * 5
+
+# Tiempo de vida (segundos) de cada sección del snapshot del dashboard de mantenimiento
+CACHE_DASHBOARD_TTL = 60
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -193,7 +226,7 @@ CORS_PREFLIGHT_MAX_AGE = 86400
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'cmms_api.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -190,7 +190,8 @@ export const checklistService = {
     if (fechaFin) params.append('fecha_fin', fechaFin);
     
     const response = await apiClient.get(`checklist-workflow/historial-equipo/${equipoId}/?${params}`);
-    return response.data;
+    // La respuesta trae { equipo, estadisticas, historial, siguiente }; el historial viene paginado por cursor
+    return response.data.historial;
   },
 
   async getReporteConformidad(fechaInicio?: string, fechaFin?: string): Promise<any> {